@@ -11,6 +11,7 @@ from scipy.sparse import coo_matrix
 import pyrl.layers
 import pyrl.optimizers
 import pyrl.prob as prob
+from pyrl.utils import report_casts
 
 
 class StateTable(object):
@@ -335,10 +336,10 @@ class DQN(Qfunc):
         self.states, self.action_values, self.model = self.arch_func()
         self.params = sum([layer.params for layer in self.model.values()], [])
 
-        self.fprop = theano.function(inputs=[self.states],
+        self.fprop = report_casts(theano.function(inputs=[self.states],
                                      outputs=self.action_values,
                                      name='fprop',
-                                     allow_input_downcast=True)
+                                     allow_input_downcast=True))
 
     def copy(self):
         import dill as pickle
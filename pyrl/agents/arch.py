@@ -53,6 +53,27 @@ def fully_connected(states, arch_list):
     return (final_output, model)
 
 
+def embedding_fully_connected(indices, arch_list):
+    '''
+    same as fully_connected, but the input is given as padded indices of the
+    nonzero entries of a binary state (e.g. GridWorld.curr_state_indices),
+    so the first layer costs O(nonzeros) instead of O(arch_list[0]).
+    '''
+    embedding = layers.Embedding(arch_list[0], arch_list[1], activation='relu')
+    model = [embedding]
+    for (li, layer) in enumerate(arch_list[2:-1]):
+        fc = layers.FullyConnected(arch_list[li+1], arch_list[li+2], activation='relu')
+        model.append(fc)
+    linear_layer = layers.FullyConnected(arch_list[-2], arch_list[-1], activation=None)
+    model.append(linear_layer)
+
+    # construct computational graph.
+    hidden = embedding(indices)
+    for fc in model[1:]:
+        hidden = fc(hidden)
+    return (hidden, model)
+
+
 def GridWorld_5x5_FCN(states, input_dim):
     params = []
     ## agent.
@@ -13,6 +13,7 @@ from pyrl.tasks.task import Task
 from pyrl.agents.agent import DQN
 from pyrl.agents.agent import TabularVfunc
 from pyrl.evaluate import reward_stochastic
+from pyrl.config import floatX
 
 class MetaModelTabular(object):
     def __init__(self, bonus=1., decay=0.9):
@@ -126,7 +127,7 @@ class DQCL_LocalEdit(object):
         states = [None] * self.minibatch_size
         next_states = [None] * self.minibatch_size
         actions = np.zeros(self.minibatch_size, dtype=int)
-        rewards = np.zeros(self.minibatch_size)
+        rewards = np.zeros(self.minibatch_size, dtype=floatX)
 
         # sample and process minibatch
         samples = random.sample(self.experience, self.minibatch_size)
@@ -145,8 +146,8 @@ class DQCL_LocalEdit(object):
                 terminals.append(idx)
 
         # convert states into tensor.
-        states = np.array(states)
-        next_states = np.array(next_states)
+        states = np.array(states, dtype=floatX)
+        next_states = np.array(next_states, dtype=floatX)
 
         # compute target reward + \gamma max_{a'} Q(ns, a')
         next_qvals = np.max(self.dqn.fprop(next_states), axis=1)
@@ -284,7 +285,7 @@ class DQCL_Rollout_Policy(object):
             return None
         else:
             from pyrl.tasks.pacman.game_mdp import PacmanTaskShifter
-            return PacmanTaskShifter.neighbors(task, ['del_ghost'])[0]
+            return next(PacmanTaskShifter.iter_neighbors(task, ['del_ghost']))
 
 class DQCL_Rollout(object):
     '''
@@ -376,7 +377,7 @@ class DQCL_Rollout(object):
         states = [None] * self.minibatch_size
         next_states = [None] * self.minibatch_size
         actions = np.zeros(self.minibatch_size, dtype=int)
-        rewards = np.zeros(self.minibatch_size)
+        rewards = np.zeros(self.minibatch_size, dtype=floatX)
 
         # sample and process minibatch
         samples = random.sample(self.experience, self.minibatch_size)
@@ -395,8 +396,8 @@ class DQCL_Rollout(object):
                 terminals.append(idx)
 
         # convert states into tensor.
-        states = np.array(states)
-        next_states = np.array(next_states)
+        states = np.array(states, dtype=floatX)
+        next_states = np.array(next_states, dtype=floatX)
 
         # compute target reward + \gamma max_{a'} Q(ns, a')
         next_qvals = np.max(self.dqn.fprop(next_states), axis=1)
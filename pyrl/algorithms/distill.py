@@ -7,6 +7,7 @@ import numpy as np
 import pyrl.optimizers as optimizers
 import pyrl.prob as prob
 from pyrl.layers import SoftMax
+from pyrl.config import floatX
 
 class DeepDistill(object):
     def __init__(self, dqn_mt, memory_size=128, lr=1e-3, l2_reg=0., minibatch_size=128):
@@ -133,9 +134,9 @@ class DeepDistill(object):
                 probs[idx] = p
 
             # convert into numpy array.
-            states = np.array(states)
-            is_valids = np.array(is_valids)
-            probs = np.array(probs)
+            states = np.array(states, dtype=floatX)
+            is_valids = np.array(is_valids, dtype=floatX)
+            probs = np.array(probs, dtype=floatX)
 
             error = self.bprop(states, probs, is_valids)
             print 'error', error
@@ -8,6 +8,7 @@ from pyrl.tasks.task import Task
 from pyrl.agents.agent import DQN
 from pyrl.agents.agent import TabularVfunc
 from pyrl.algorithms.valueiter import DeepQlearn
+from pyrl.config import floatX
 
 
 class DeepQMultigoal(object):
@@ -111,7 +112,7 @@ class DeepQMultigoal(object):
             next_states = [None] * self.minibatch_size
             next_phases = [None] * self.minibatch_size
             actions = np.zeros(self.minibatch_size, dtype=int)
-            rewards = np.zeros(self.minibatch_size)
+            rewards = np.zeros(self.minibatch_size, dtype=floatX)
             cross_phase_idx = []
             nvas = []
 
@@ -139,13 +140,13 @@ class DeepQMultigoal(object):
                     terminals.append(idx)
 
             # convert states into tensor.
-            states = np.array(states)
-            next_states = np.array(next_states)
+            states = np.array(states, dtype=floatX)
+            next_states = np.array(next_states, dtype=floatX)
 
             # compute target reward + \gamma max_{a'} Q(ns, a')
             # Ensure target = reward when NEXT_STATE is terminal
             next_qvals = self.dqn.fprop(next_states)
-            next_vs = np.zeros(self.minibatch_size)
+            next_vs = np.zeros(self.minibatch_size, dtype=floatX)
             for idx in range(self.minibatch_size):
                 if idx not in terminals:
                     if idx in cross_phase_idx:
@@ -12,6 +12,7 @@ import pyrl.prob as prob
 from pyrl.algorithms.valueiter import DeepQlearn
 from pyrl.agents.agent import eval_policy_reward
 from pyrl.evaluate import eval_dataset, expected_reward_tabular_normalized
+from pyrl.config import floatX
 
 class SingleLearnerSequential(object):
     def __init__(self, dqn, tasks, **kwargs):
@@ -349,7 +350,7 @@ class DeepQlearnMT(object):
             states = [None] * self.minibatch_size
             next_states = [None] * self.minibatch_size
             actions = np.zeros(self.minibatch_size, dtype=int)
-            rewards = np.zeros(self.minibatch_size)
+            rewards = np.zeros(self.minibatch_size, dtype=floatX)
             nvas = []
 
             # sample and process minibatch
@@ -372,13 +373,13 @@ class DeepQlearnMT(object):
                     terminals.append(idx)
 
             # convert states into tensor.
-            states = np.array(states)
-            next_states = np.array(next_states)
+            states = np.array(states, dtype=floatX)
+            next_states = np.array(next_states, dtype=floatX)
 
             # compute target reward + \gamma max_{a'} Q(ns, a')
             # Ensure target = reward when NEXT_STATE is terminal
             next_qvals = self.dqn.fprop(next_states)
-            next_vs = np.zeros(self.minibatch_size)
+            next_vs = np.zeros(self.minibatch_size, dtype=floatX)
             for idx in range(self.minibatch_size):
                 if idx not in terminals:
                     next_vs[idx] = np.max(next_qvals[idx, nvas[idx]])
@@ -573,7 +574,7 @@ class DeepQlearnMixed(object):
             states = [None] * self.minibatch_size
             next_states = [None] * self.minibatch_size
             actions = np.zeros(self.minibatch_size, dtype=int)
-            rewards = np.zeros(self.minibatch_size)
+            rewards = np.zeros(self.minibatch_size, dtype=floatX)
             nvas = []
 
             # sample and process minibatch
@@ -595,13 +596,13 @@ class DeepQlearnMixed(object):
                     terminals.append(idx)
 
             # convert states into tensor.
-            states = np.array(states)
-            next_states = np.array(next_states)
+            states = np.array(states, dtype=floatX)
+            next_states = np.array(next_states, dtype=floatX)
 
             # compute target reward + \gamma max_{a'} Q(ns, a')
             # Ensure target = reward when NEXT_STATE is terminal
             next_qvals = self.dqn.fprop(next_states)
-            next_vs = np.zeros(self.minibatch_size)
+            next_vs = np.zeros(self.minibatch_size, dtype=floatX)
             for idx in range(self.minibatch_size):
                 if idx not in terminals:
                     next_vs[idx] = np.max(next_qvals[idx, nvas[idx]])
@@ -757,9 +758,9 @@ class PolicyDistill(object):
                 targets.append(target)
                 actions[idx] = last_action
 
-            states = np.array(states)
-            targets = np.array(targets)
-            is_valids = np.array(is_valids)
+            states = np.array(states, dtype=floatX)
+            targets = np.array(targets, dtype=floatX)
+            is_valids = np.array(is_valids, dtype=floatX)
 
             score = self.bprop(states, actions, targets, is_valids)
 
@@ -0,0 +1,94 @@
+# experience replay buffers.
+from pyrl.common import *
+from pyrl.config import floatX
+
+
+class SequenceReplay(object):
+    '''
+    experience replay for recurrent learners.
+
+    instead of independent transitions, it samples fixed-length contiguous
+    sequences together with the hidden state the acting network had at the
+    start of each sequence, so truncated BPTT can resume from there.
+    '''
+    def __init__(self, memory_size, seq_len):
+        assert(seq_len < memory_size)
+        self.memory_size = memory_size
+        self.seq_len = seq_len
+        self.num_exp = 0
+        self.exp_idx = 0
+        self.total_exp = 0
+
+        # storage is allocated on the first add, once shapes are known.
+        self.states = None
+        self.hiddens = None
+        self.actions = np.zeros(memory_size, dtype=int)
+        self.rewards = np.zeros(memory_size, dtype=floatX)
+        self.ends = np.zeros(memory_size, dtype=bool)
+
+    def __len__(self):
+        return self.num_exp
+
+    def _allocate(self, state, hidden):
+        state = np.asarray(state)
+        self.states = np.zeros((self.memory_size,) + state.shape, dtype=floatX)
+        self.hiddens = [np.zeros((self.memory_size,) + np.shape(h), dtype=floatX)
+                        for h in hidden]
+
+    def add(self, state, action, reward, is_end, hidden):
+        '''
+        state: the state the action was taken in.
+        hidden: list of recurrent states *before* consuming state,
+                e.g. [h] for RNNLayer, [h, cell] for LSTMLayer.
+        is_end: whether the episode ended after this step.
+        '''
+        if self.states is None:
+            self._allocate(state, hidden)
+        idx = self.exp_idx
+        self.states[idx] = state
+        for (buf, h) in zip(self.hiddens, hidden):
+            buf[idx] = h
+        self.actions[idx] = action
+        self.rewards[idx] = reward
+        self.ends[idx] = is_end
+
+        self.exp_idx = (self.exp_idx + 1) % self.memory_size
+        self.num_exp = min(self.num_exp + 1, self.memory_size)
+        self.total_exp += 1
+
+    def can_sample(self):
+        return self.num_exp > self.seq_len
+
+    def sample(self, batch_size):
+        '''
+        sample batch_size sequences of seq_len steps (with replacement).
+
+        return a dict of time-major arrays:
+            states: (seq_len + 1, batch, ...), the last step is only used as next state.
+            actions, rewards, ends, mask: (seq_len, batch).
+            hiddens: list of (batch, ...) stored hidden states at the sequence start.
+
+        mask is zero for steps that belong to a later episode than the first step,
+        so losses should be weighted by it.
+        '''
+        assert(self.can_sample())
+        oldest = self.exp_idx if self.num_exp == self.memory_size else 0
+        # a window covers seq_len + 1 entries and must not wrap past the newest one.
+        starts = npr.randint(0, self.num_exp - self.seq_len, size=batch_size)
+        inds = (oldest + starts[np.newaxis, :]
+                + np.arange(self.seq_len + 1)[:, np.newaxis]) % self.memory_size
+        step_inds = inds[:-1]
+
+        ends = self.ends[step_inds]
+        # steps after the first episode end in the window are masked out.
+        crossed = np.cumsum(ends, axis=0) - ends
+        mask = (crossed == 0).astype(floatX)
+
+        return {
+            'states': self.states[inds],
+            'actions': self.actions[step_inds],
+            'rewards': self.rewards[step_inds],
+            'ends': ends,
+            'mask': mask,
+            'hiddens': [buf[inds[0]] for buf in self.hiddens]
+        }
@@ -0,0 +1,24 @@
+from pyrl.common import *
+from pyrl.algorithms.replay import SequenceReplay
+
+def test_sequence_replay():
+    replay = SequenceReplay(memory_size=10, seq_len=3)
+    for t in range(14):
+        replay.add(np.array([t, t]), action=t % 4, reward=float(t),
+                   is_end=(t % 5 == 4), hidden=[np.array([t])])
+    assert len(replay) == 10
+    batch = replay.sample(64)
+    assert batch['states'].shape == (4, 64, 2)
+    assert batch['actions'].shape == (3, 64)
+    # sequences are contiguous and never wrap past the newest entry.
+    diff = np.diff(batch['states'][:, :, 0], axis=0)
+    assert (diff == 1).all()
+    assert batch['states'].min() >= 4
+    # stored hidden state is the one at the sequence start.
+    assert (batch['hiddens'][0][:, 0] == batch['states'][0, :, 0]).all()
+    # steps after an episode end are masked.
+    for b in range(64):
+        ts = batch['states'][:-1, b, 0]
+        for t in range(3):
+            after_end = any(int(s) % 5 == 4 for s in ts[:t])
+            assert batch['mask'][t, b] == (0. if after_end else 1.)
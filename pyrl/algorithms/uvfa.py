@@ -13,6 +13,7 @@ from pyrl.utils import Timer
 from pyrl.tasks.task import Task
 
 from pyrl.layers import SoftMax
+from pyrl.config import floatX
 
 def factorize_value_matrix(valmat, rank_n = 3, num_iter = 10000):
     from optspace import optspace
@@ -137,7 +138,7 @@ class Horde(object):
                 states = [None] * self.minibatch_size
                 next_states = [None] * self.minibatch_size
                 actions = np.zeros(self.minibatch_size, dtype=int)
-                rewards = np.zeros(self.minibatch_size)
+                rewards = np.zeros(self.minibatch_size, dtype=floatX)
                 nvas = []
                 terminals = []
 
@@ -157,12 +158,12 @@ class Horde(object):
                     if reward > 0.:
                         terminals.append(idx)
 
-                states = np.array(states)
-                next_states = np.array(next_states)
+                states = np.array(states, dtype=floatX)
+                next_states = np.array(next_states, dtype=floatX)
 
                 # learn through backpropagation.
                 next_qvals = dqn.fprop(next_states)
-                next_vs = np.zeros(self.minibatch_size)
+                next_vs = np.zeros(self.minibatch_size, dtype=floatX)
                 for idx in range(self.minibatch_size):
                     if idx not in terminals:
                         next_vs[idx] = np.max(next_qvals[idx, nvas[idx]])
@@ -228,7 +229,7 @@ class AntiHorde(object):
                 states = [None] * self.minibatch_size
                 next_states = [None] * self.minibatch_size
                 actions = np.zeros(self.minibatch_size, dtype=int)
-                rewards = np.zeros(self.minibatch_size)
+                rewards = np.zeros(self.minibatch_size, dtype=floatX)
                 nvas = []
                 terminals = []
 
@@ -248,12 +249,12 @@ class AntiHorde(object):
                     if reward > 0.:
                         terminals.append(idx)
 
-                states = np.array(states)
-                next_states = np.array(next_states)
+                states = np.array(states, dtype=floatX)
+                next_states = np.array(next_states, dtype=floatX)
 
                 # learn through backpropagation.
                 next_qvals = dqn.fprop(next_states)
-                next_vs = np.zeros(self.minibatch_size)
+                next_vs = np.zeros(self.minibatch_size, dtype=floatX)
                 for idx in range(self.minibatch_size):
                     if idx not in terminals:
                         next_vs[idx] = np.max(next_qvals[idx, nvas[idx]])
@@ -375,9 +376,9 @@ class PolicyDistill(object):
                 targets.append(target)
                 actions[idx] = last_action
 
-            states = np.array(states)
-            targets = np.array(targets)
-            is_valids = np.array(is_valids)
+            states = np.array(states, dtype=floatX)
+            targets = np.array(targets, dtype=floatX)
+            is_valids = np.array(is_valids, dtype=floatX)
 
             score = self.bprop(states, actions, targets, is_valids)
 
@@ -446,7 +447,7 @@ class HordeShared(object):
                 states = [None] * self.minibatch_size
                 next_states = [None] * self.minibatch_size
                 actions = np.zeros(self.minibatch_size, dtype=int)
-                rewards = np.zeros(self.minibatch_size)
+                rewards = np.zeros(self.minibatch_size, dtype=floatX)
                 nvas = []
                 terminals = []
 
@@ -466,13 +467,13 @@ class HordeShared(object):
                     if reward > 0.:
                         terminals.append(idx)
 
-                states = np.array(states)
-                next_states = np.array(next_states)
+                states = np.array(states, dtype=floatX)
+                next_states = np.array(next_states, dtype=floatX)
 
                 # learn through backpropagation.
                 shared_values = dqn_mt.fprop(next_states)[range(len(actions)), actions]
                 next_qvals = dqn.fprop(next_states)
-                next_vs = np.zeros(self.minibatch_size)
+                next_vs = np.zeros(self.minibatch_size, dtype=floatX)
                 for idx in range(self.minibatch_size):
                     if idx not in terminals:
                         next_vs[idx] = np.max(next_qvals[idx, nvas[idx]])
@@ -4,8 +4,9 @@ from pyrl.common import *
 import pyrl.optimizers as optimizers
 import pyrl.layers as layers
 import pyrl.prob as prob
-from pyrl.utils import Timer
+from pyrl.utils import Timer, report_casts
 from pyrl.tasks.task import Task
+from pyrl.tasks.tabular import tabular_model
 from pyrl.agents.agent import DQN
 from pyrl.agents.agent import TabularVfunc
 from pyrl.config import floatX, debug_flag
@@ -48,35 +49,16 @@ class ValueIterationSolver(object):
         return best_action
 
     def learn(self):
-        ''' Performs value iteration on the MDP until convergence '''
-        while True:
-            # repeatedly perform the Bellman backup on each state
-            # V_{i+1}(s) = \max_{a} \sum_{s' \in NS} T(s, a, s')[R(s, a, s') + \gamma V(s')]
-            max_diff = 0.
-
-            # TODO: Add priority sweeping for state in xrange(self.num_states):
-            for state in self.task.env.get_valid_states():
-                poss_actions = self.task.get_allowed_actions(state)
-
-                best_val = 0.
-                for idx, action in enumerate(poss_actions):
-                    val = 0.
-                    ns_dist = self.task.next_state_distribution(state, action)
-                    for ns, prob in ns_dist:
-                        val += prob * (self.task.get_reward(state, action, ns) +
-                                       self.gamma * self.vfunc(ns))
-
-                    if(idx == 0 or val > best_val):
-                        best_val = val
-
-                diff = abs(self.vfunc(state) - best_val)
-                self.vfunc.update(state, best_val)
-
-                if diff > max_diff:
-                    max_diff = diff
-
-            if max_diff < self.tol:
-                break
+        '''
+        Performs value iteration on the MDP until convergence, as Bellman backups
+        V_{i+1}(s) = \max_{a} \sum_{s' \in NS} T(s, a, s')[R(s, a, s') + \gamma V(s')]
+        on the task's tabular model.
+        '''
+        model = tabular_model(self.task)
+        V = [self.vfunc(state) for state in xrange(self.num_states)]
+        V = model.value_iteration(self.gamma, self.tol, V=V)
+        for state in self.task.env.get_valid_states():
+            self.vfunc.update(state, V[state])
 
 
 class Qlearn(object):
@@ -406,10 +388,10 @@ class DeepQlearn(object):
         updates = optimizers.Adam(cost, params, alpha=self.lr)
 
         td_errors = T.sqrt(mse)
-        self.bprop = theano.function(inputs=[states, last_actions, targets] + reg_vs,
+        self.bprop = report_casts(theano.function(inputs=[states, last_actions, targets] + reg_vs,
                                      outputs=td_errors, updates=updates,
                                      allow_input_downcast=True,
-                                     on_unused_input='ignore')
+                                     on_unused_input='ignore'), name='bprop')
 
     def _add_to_experience(self, s, a, ns, r, meta):
         # TODO: improve experience replay mechanism by making it harder to
@@ -444,7 +426,7 @@ class DeepQlearn(object):
             states = [None] * self.minibatch_size
             next_states = [None] * self.minibatch_size
             actions = np.zeros(self.minibatch_size, dtype=int)
-            rewards = np.zeros(self.minibatch_size)
+            rewards = np.zeros(self.minibatch_size, dtype=floatX)
             nvas = []
 
             # sample and process minibatch
@@ -467,8 +449,8 @@ class DeepQlearn(object):
                     terminals.append(idx)
 
             # convert states into tensor.
-            states = np.array(states).astype(floatX)
-            next_states = np.array(next_states).astype(floatX)
+            states = np.array(states, dtype=floatX)
+            next_states = np.array(next_states, dtype=floatX)
 
             # compute target reward + \gamma max_{a'} Q(ns, a')
             # Ensure target = reward when NEXT_STATE is terminal
@@ -478,7 +460,7 @@ class DeepQlearn(object):
                 next_qvals = self.dqn.fprop(next_states)
 
             use_DDQN = False
-            next_vs = np.zeros(self.minibatch_size).astype(floatX)
+            next_vs = np.zeros(self.minibatch_size, dtype=floatX)
             if use_DDQN: # double DQN.
                 next_qvals_unfrozen = self.dqn.fprop(next_states)
                 for idx in range(self.minibatch_size):
@@ -1,14 +1,8 @@
 import os
-import numpy as np
 import theano
+from pyrl.dtype import floatX, floatX_name, debug_dtype_flag
 
-floatX_name = os.environ.get('floatX')
-if floatX_name and floatX_name == 'float64':
-    floatX = np.float64
-    theano.config.floatX = floatX_name
-else:
-    floatX = np.float32
-    theano.config.floatX = 'float32'
+theano.config.floatX = floatX_name
 
 try:
     debug_flag = bool(os.environ['debug'])
@@ -0,0 +1,16 @@
+# the float dtype of pyrl arrays, without importing theano, so that
+# numpy-only code (tasks, preprocessing) can use it.
+import os
+import numpy as np
+
+if os.environ.get('floatX') == 'float64':
+    floatX = np.float64
+else:
+    floatX = np.float32
+floatX_name = np.dtype(floatX).name
+
+# report inputs that theano functions have to cast (see utils.report_casts).
+try:
+    debug_dtype_flag = bool(os.environ['debug_dtype'])
+except:
+    debug_dtype_flag = False
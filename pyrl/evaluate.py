@@ -3,6 +3,7 @@ from pyrl.tasks.task import Task, task_breakpoint
 from pyrl.prob import choice
 from pyrl.utils import get_val
 from pyrl.algorithms.valueiter import compute_tabular_value
+from pyrl.tasks.tabular import tabular_model
 
 
 def estimate_temperature(policy, states, valid_actions, entropy = 0.3, tol=1e-1):
@@ -296,40 +297,19 @@ def reward_tabular(policy, task, tol=1e-4):
     compute exactly expected rewards averaged over start states.
     '''
     policy.task = task # configure the policy task in the multi-task setting.
-    V = np.zeros(task.get_num_states())
-    while True:
-        # repeatedly perform reward bootstrapping on each state
-        # given actions produced from the policy.
-        max_diff = 0.
-
-        # TODO: Add priority sweeping for state in xrange(self.num_states):
-        for state in task.get_valid_states():
-            if not policy.is_tabular():
-                state_vector = task.wrap_stateid(state)
-                poss_actions = policy.get_action_distribution(state_vector, method='eps-greedy', epsilon=0.01)
-                # poss_actions = policy.get_action_distribution(state_vector, method='softmax', temperature=5e-2)
-            else:
-                poss_actions = policy.get_action_distribution(state)
-
-
-            total_val = 0.
-            for action, action_prob in poss_actions.items():
-                val = 0.
-                ns_dist = task.next_state_distribution(state, action)
-                for ns, prob in ns_dist:
-                    val += prob * (task.get_reward(state, action, ns) +
-                                    task.gamma * V[ns])
-                total_val += action_prob * val
-
-            diff = abs(V[state] - total_val)
-            V[state] = total_val
-
-            if diff > max_diff:
-                max_diff = diff
-
-        if max_diff < tol:
-            break
-    return V
+    model = tabular_model(task)
+    # the policy is fixed, its action distribution is queried once per state.
+    pi = np.zeros((model.num_states, model.num_actions))
+    for state in task.get_valid_states():
+        if not policy.is_tabular():
+            state_vector = task.wrap_stateid(state)
+            poss_actions = policy.get_action_distribution(state_vector, method='eps-greedy', epsilon=0.01)
+            # poss_actions = policy.get_action_distribution(state_vector, method='softmax', temperature=5e-2)
+        else:
+            poss_actions = policy.get_action_distribution(state)
+        for action, action_prob in poss_actions.items():
+            pi[state, action] = action_prob
+    return model.evaluate(pi, task.gamma, tol)
 
 def expected_reward_tabular(policy, task, tol=1e-4):
     '''
@@ -0,0 +1,97 @@
+# fork workers from a warmed-up template process.
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+import os
+import signal
+import sys
+import traceback
+
+
+def _serve(conn, prepare, args, kwargs):
+    try:
+        template = prepare(*args, **kwargs)
+    except Exception:
+        conn.send(traceback.format_exc())
+        return
+    # workers are reaped by the kernel, nobody waits for them here.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # SDL turns SIGTERM into a quit event if prepare initialized pygame.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    conn.send(None)
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if request is None:
+            return
+        (target, args, address, authkey) = request
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(conn, template, target, args, address, authkey)
+        conn.send(pid)
+
+
+def _run_worker(server_conn, template, target, args, address, authkey):
+    status = 0
+    try:
+        server_conn.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        conn = Client(address, authkey=authkey)
+        target(template, conn, *args)
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status) # never return into the server loop.
+
+
+class ForkServer(object):
+    '''
+    a template process that does the expensive initialization once:
+    importing theano, compiling functions, initializing pygame, loading
+    game assets. workers are then forked from it in milliseconds and
+    start with all of that in (copy-on-write) memory.
+
+    the template runs template = prepare(*args, **kwargs). prepare is
+    called in a child of this process, so neither it nor its arguments need
+    be picklable. fork(target,
+    *args) starts a worker running target(template, conn, *args), where
+    conn is a Connection to the caller, which fork returns. target and
+    args are sent to the template, so they must pickle (module-level
+    functions, plain data).
+
+    the template should not hold running threads when forking, e.g.
+    close() simulators stepped with reset/step before returning them.
+    compiled theano functions survive the fork on the cpu, gpu contexts
+    do not.
+    '''
+    def __init__(self, prepare, *args, **kwargs):
+        self.authkey = os.urandom(16)
+        self.listener = Listener(family='AF_UNIX', authkey=self.authkey)
+        (self.conn, server_conn) = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(server_conn, prepare, args, kwargs))
+        self.process.daemon = True
+        self.process.start()
+        error = self.conn.recv()
+        if error:
+            raise RuntimeError('fork server template failed:\n' + error)
+
+
+    def fork(self, target, *args):
+        '''
+        return (pid, conn) of a new worker running target(template, conn, *args).
+        '''
+        self.conn.send((target, args, self.listener.address, self.authkey))
+        pid = self.conn.recv()
+        return (pid, self.listener.accept())
+
+
+    def close(self):
+        ''' stop the template process, running workers are not affected. '''
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join()
+        self.listener.close()
@@ -59,6 +59,82 @@ class FullyConnected(object):
             p.set_value(params[p.name], borrow=True)
 
 
+class Embedding(object):
+    '''
+    sparse input layer.
+
+    equivalent to a FullyConnected layer applied to a binary input, but the
+    input is given as the integer positions of its nonzero entries.
+    the forward pass gathers and sums the corresponding rows of W, and the
+    gradient w.r.t. W is a scatter-add into those rows only.
+
+    indices is a (batch, k) integer matrix; entries < 0 are padding
+    (see pad_indices). parameters are named and shaped like FullyConnected,
+    so the two layers can load each other's params.
+    '''
+    def __init__(self, input_dim, output_dim, activation='relu'):
+        if activation is None:
+            self.act = lambda x: x
+        elif activation is 'relu':
+            self.act = lambda x: T.maximum(x, 0)
+        elif activation is 'tanh':
+            self.act = lambda x: T.tanh(x)
+        else:
+            raise NotImplementedError()
+
+        # same initialization as FullyConnected.
+        std_dev = np.sqrt(0.2 / input_dim)
+        W_init = std_dev * np.random.randn(input_dim, output_dim).astype(floatX)
+        W = theano.shared(value=W_init, name='W')
+
+        b_init = np.zeros((1, output_dim)).astype(floatX)
+        b = theano.shared(value=b_init, name='b', broadcastable=(True, False))
+
+        self.W = W
+        self.b = b
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.params = [self.W, self.b]
+
+    def __call__(self, indices):
+        mask = T.cast(T.ge(indices, 0), theano.config.floatX)
+        rows = self.W[T.maximum(indices, 0)] # (batch, k, output_dim)
+        return self.act((rows * mask.dimshuffle(0, 1, 'x')).sum(axis=1) + self.b)
+
+    def get_params(self):
+        params = {}
+        for p in self.params:
+            params[p.name] = p.get_value()
+        return params
+
+    def set_params(self, params):
+        for p in self.params:
+            p.set_value(params[p.name], borrow=True)
+
+
+def pad_indices(index_lists, pad=-1):
+    '''
+        Stack variable-length index arrays into a (batch, k) int matrix
+        for Embedding, padding short rows with *pad*.
+    '''
+    k = max([len(inds) for inds in index_lists])
+    res = np.empty((len(index_lists), max(k, 1)), dtype=np.int64)
+    res.fill(pad)
+    for (ni, inds) in enumerate(index_lists):
+        res[ni, :len(inds)] = inds
+    return res
+
+
+def dense_to_indices(states, pad=-1):
+    '''
+        Convert a batch of binary (one-hot / multi-hot) states of any shape
+        into padded flat indices of their nonzero entries.
+    '''
+    states = np.asarray(states)
+    flat = states.reshape(states.shape[0], -1)
+    return pad_indices([np.flatnonzero(row) for row in flat], pad=pad)
+
+
 class Conv2D(object):
     '''
     convolution layers.
@@ -197,24 +273,28 @@ class RNNLayer(object):
         self.output_activation = output_activation
         init_scale = 0.001
 
+        self.input_dim = input_dim
+        self.hidden_dim = hidden_dim
+        self.output_dim = output_dim
+
         # input to hidden layer weight matrix
-        W_x_init = np.random.rand(input_dim, hidden_dim) * 2 * init_scale - init_scale
+        W_x_init = (np.random.rand(input_dim, hidden_dim) * 2 * init_scale - init_scale).astype(floatX)
         self.W_x = theano.shared(value=W_x_init, name='W_x')
 
         # hidden layer to output matrix
-        W_o_init = np.random.rand(hidden_dim, output_dim) * 2 * init_scale - init_scale
+        W_o_init = (np.random.rand(hidden_dim, output_dim) * 2 * init_scale - init_scale).astype(floatX)
         self.W_o = theano.shared(value=W_o_init, name='W_o')
 
         # hidden layer to hidden layer matrix
-        W_h_init = orth(np.random.rand(hidden_dim, hidden_dim) * 2 * init_scale - init_scale)
+        W_h_init = orth(np.random.rand(hidden_dim, hidden_dim) * 2 * init_scale - init_scale).astype(floatX)
         self.W_h = theano.shared(value=W_h_init, name='W_h')
 
         # biases
-        b_h_init = np.zeros((1, hidden_dim))
+        b_h_init = np.zeros((1, hidden_dim)).astype(floatX)
         self.b_h = theano.shared(value=b_h_init, name='b_h',
                                  broadcastable=(True, False))
 
-        b_o_init = np.zeros((1, output_dim))
+        b_o_init = np.zeros((1, output_dim)).astype(floatX)
         self.b_o = theano.shared(value=b_o_init, name='b_o',
                                  broadcastable=(True, False))
 
@@ -247,6 +327,32 @@ class RNNLayer(object):
 
         return [new_h, output]
 
+    def scan(self, xs, h0, truncate_gradient=-1):
+        '''
+            Run the RNN over a whole sequence with theano.scan.
+
+            xs is a (time, batch, input_dim) tensor and h0 the (batch, hidden_dim)
+            initial hidden state. The input projection is computed for all
+            time steps at once, so the loop only carries the recurrent term.
+            Gradients flow back at most truncate_gradient steps (-1 for full BPTT).
+
+            Return the hidden states and outputs at every time step.
+        '''
+        xs_proj = T.dot(xs, self.W_x) + self.b_h
+
+        def _step(x_proj, h):
+            new_h = self._apply_nonlinearity(x_proj + h.dot(self.W_h),
+                                             self.hidden_activation)
+            return new_h
+
+        hs, _ = theano.scan(_step, sequences=xs_proj, outputs_info=[h0],
+                            truncate_gradient=truncate_gradient)
+
+        outputs = self._apply_nonlinearity(T.dot(hs, self.W_o) + self.b_o,
+                                           self.output_activation)
+
+        return [hs, outputs]
+
     def get_params(self):
         params = {}
         for p in self.params:
@@ -278,12 +384,12 @@ class LSTMLayer(object):
         init_scale = 0.001
 
         # initial hidden params
-        memory_cell_init = np.zeros((1, hidden_dim))
+        memory_cell_init = np.zeros((1, hidden_dim)).astype(floatX)
         cell_0 = theano.shared(value=memory_cell_init, name='mc_0')
         h0 = theano.shared(value=np.tanh(cell_0.get_value()), name='h0')
 
         # memory cell weights
-        W_x_init = np.random.rand(input_dim, 4 * hidden_dim) * 2 * init_scale - init_scale
+        W_x_init = (np.random.rand(input_dim, 4 * hidden_dim) * 2 * init_scale - init_scale).astype(floatX)
         W_x = theano.shared(value=W_x_init, name='W_x')
 
         def recurrent_matrix(dim):
@@ -292,11 +398,11 @@ class LSTMLayer(object):
         U_h_init = np.concatenate([recurrent_matrix(hidden_dim),
                                    recurrent_matrix(hidden_dim),
                                    recurrent_matrix(hidden_dim),
-                                   recurrent_matrix(hidden_dim)], axis=1)
+                                   recurrent_matrix(hidden_dim)], axis=1).astype(floatX)
 
         U_h = theano.shared(value=U_h_init, name='U_h')
 
-        b_init = np.zeros((1, 4 * hidden_dim))
+        b_init = np.zeros((1, 4 * hidden_dim)).astype(floatX)
         b = theano.shared(value=b_init, name='b', broadcastable=(True, False))
 
         # mapping from memory cell unit to slice
@@ -311,9 +417,10 @@ class LSTMLayer(object):
         self.b = b
         self.params = [self.W_x, self.U_h, self.b, self.cell_0]
 
-    def __call__(self, x, h, prev_cell):
-        z = x.dot(self.W_x) + h.dot(self.U_h) + self.b
-
+    def _cell(self, z, prev_cell):
+        '''
+            Apply the gates given the pre-activations z of all units.
+        '''
         def _get_unit(matrix, unit, dim):
             slice_num = self.units[unit]
             # assume all slices have the same dimension
@@ -337,6 +444,30 @@ class LSTMLayer(object):
 
         return [next_cell, h]
 
+    def __call__(self, x, h, prev_cell):
+        z = x.dot(self.W_x) + h.dot(self.U_h) + self.b
+        return self._cell(z, prev_cell)
+
+    def scan(self, xs, h0, cell0, truncate_gradient=-1):
+        '''
+            Run the LSTM over a whole sequence with theano.scan.
+
+            xs is a (time, batch, input_dim) tensor, h0 and cell0 are the
+            (batch, hidden_dim) initial hidden state and memory cell.
+            Gradients flow back at most truncate_gradient steps (-1 for full BPTT).
+
+            Return the memory cells and hidden states at every time step.
+        '''
+        xs_proj = T.dot(xs, self.W_x) + self.b
+
+        def _step(x_proj, prev_cell, h):
+            return self._cell(x_proj + h.dot(self.U_h), prev_cell)
+
+        (cells, hs), _ = theano.scan(_step, sequences=xs_proj,
+                                     outputs_info=[cell0, h0],
+                                     truncate_gradient=truncate_gradient)
+        return [cells, hs]
+
     def reset(self, h, cell):
         '''
             Resets these shared variables to their default values
@@ -1,25 +1,26 @@
 # an Arcade Learning Environment (ALE) wrapper.
-from pyrl.common import *
+from pyrl.dtype import floatX
 from pyrl.tasks.task import Task
-from pyrl.utils import rgb2yuv
+from pyrl.tasks.preprocess import Downsampler, BlockMax, FrameStack
 from pyrl.prob import choice
-from pyrl.config import floatX
-from scipy.misc import imresize
-from scipy.ndimage.filters import gaussian_filter
+import numpy as np
 import sys
 
-from theano.tensor.signal.downsample import max_pool_2d
-import theano.tensor as T
-import theano
-
-from ale_python_interface import ALEInterface
-
 class AtariGame(Task):
     ''' RL task based on Arcade Game.
     '''
 
-    def __init__(self, rom_path, num_frames=4, live=False, skip_frame=0, mode='normal'):
-        self.ale = ALEInterface()
+    def __init__(self, rom_path, num_frames=4, live=False, skip_frame=0, mode='normal',
+                 frames_per_action=1, ale=None):
+        '''
+        frames_per_action: every step repeats the action this many frames,
+                           and observes the pixel-wise max of the last two.
+        ale: the ALEInterface to play, e.g. a ScriptedALE to run without roms.
+        '''
+        if ale is None:
+            from ale_python_interface import ALEInterface
+            ale = ALEInterface()
+        self.ale = ale
         if live:
             USE_SDL = True
             if USE_SDL:
@@ -34,17 +35,24 @@ class AtariGame(Task):
         self.live = live
         self.ale.loadROM(rom_path)
         self.num_frames = num_frames
-        self.frames = []
         self.frame_id = 0
         self.cum_reward = 0
         self.skip_frame = skip_frame
+        self.frames_per_action = frames_per_action
+        self._valid_actions = self.ale.getLegalActionSet()
+        # screens are fetched into two preallocated buffers, the last two
+        # frames of an action, and preprocessed from there without copies.
+        (width, height) = self.ale.getScreenDims()
         if mode == 'small':
-            img = T.matrix('img')
-            self.max_pool = theano.function([img], max_pool_2d(img, [4, 4]))
-            self.img_shape = (16, 16)
+            self._screens = np.empty((2, height, width, 1), dtype=np.uint8)
+            self.preprocess = BlockMax((height, width), (16, 16), normalize='minmax')
         else:
-            self.img_shape = (84, 84) # image shape according to DQN Nature paper.
-        while len(self.frames) < 4:
+            self._screens = np.empty((2, height, width, 3), dtype=np.uint8)
+            # image shape according to DQN Nature paper.
+            self.preprocess = Downsampler((height, width), (84, 84), normalize='minmax')
+        self.img_shape = self.preprocess.out_shape
+        self.frames = FrameStack(num_frames, self.img_shape, dtype=np.uint8)
+        while len(self.frames) < num_frames:
             self.step(choice(self.valid_actions, 1)[0])
         self.reset()
 
@@ -63,15 +71,32 @@ class AtariGame(Task):
                 self.step(choice(self.valid_actions, 1)[0])
 
 
+    def _fetch_screen(self, out):
+        if self.mode == 'small':
+            self.ale.getScreenGrayscale(out)
+        else:
+            self.ale.getScreenRGB(out)
+
+
+    def _observe(self):
+        '''
+        preprocess the current screen, or the max of the last two when
+        actions span several frames, into the frame stack.
+        '''
+        screen = self._screens[1]
+        if self.frames_per_action > 1:
+            np.maximum(self._screens[0], screen, out=screen)
+        if self.mode == 'small':
+            screen = screen[:, :, 0]
+        pos = (self.frames.pos + 1) % self.num_frames
+        self.preprocess(screen, out=self.frames.buf[pos])
+        self.frames.push(self.frames.buf[pos])
+
+
     @property
     def _curr_frame(self):
-        img = self.ale.getScreenRGB()
-        img = rgb2yuv(img)[:, :, 0] # get Y channel, according to Nature paper.
-        # print 'RAM', self.ale.getRAM()
-        if self.mode == 'small':
-            img = self.max_pool(img)
-        img = imresize(img, self.img_shape, interp='bicubic')
-        return  img
+        ''' the last observed frame, preprocessed. '''
+        return self.frames.buf[self.frames.pos]
 
 
     @property
@@ -79,7 +104,7 @@ class AtariGame(Task):
         '''
         return raw pixels.
         '''
-        return np.array(self.frames, dtype=floatX) / floatX(255.) # normalize
+        return np.multiply(self.frames.stack(), floatX(1. / 255), dtype=floatX) # normalize
 
 
     @property
@@ -94,14 +119,17 @@ class AtariGame(Task):
 
     @property
     def valid_actions(self):
-        return self.ale.getLegalActionSet()
+        return self._valid_actions
 
 
     def step(self, action):
-        reward = self.ale.act(action)
-        if len(self.frames) == self.num_frames:
-            self.frames = self.frames[1:]
-        self.frames.append(self._curr_frame)
+        reward = 0
+        first_kept = self.frames_per_action - 2
+        for frame_i in xrange(self.frames_per_action):
+            reward += self.ale.act(action)
+            if frame_i >= first_kept:
+                self._fetch_screen(self._screens[frame_i - first_kept])
+        self._observe()
         self.frame_id += 1
         #print 'frame_id', self.frame_id
         self.cum_reward += reward
@@ -127,3 +155,86 @@ class AtariGame(Task):
             plt.show()
         return res
 
+
+
+class ScriptedALE(object):
+    '''
+    stand-in for ALEInterface playing a scripted game, to test and
+    benchmark AtariGame without roms or the ale library.
+
+    a ball bounces around the screen and a paddle on the left moves up
+    (action 2) and down (action 5). every reward_every-th frame scores 1,
+    and the game is over after episode_frames frames.
+    '''
+    # (rgb, grayscale) of the background, ball and paddle.
+    COLORS = [((144, 72, 17), 74), ((236, 236, 236), 236), ((92, 186, 92), 147)]
+
+    def __init__(self, screen_dims=(160, 210), episode_frames=1000, reward_every=None):
+        (self.width, self.height) = screen_dims
+        self.episode_frames = episode_frames
+        self.reward_every = reward_every
+        self.reset_game()
+
+
+    def setBool(self, key, value):
+        pass
+
+
+    def setInt(self, key, value):
+        pass
+
+
+    def loadROM(self, rom_path):
+        pass
+
+
+    def getScreenDims(self):
+        return (self.width, self.height)
+
+
+    def getLegalActionSet(self):
+        return np.arange(18)
+
+
+    def reset_game(self):
+        self.frame = 0
+        self.paddle = self.height // 2
+
+
+    def game_over(self):
+        return self.frame >= self.episode_frames
+
+
+    def act(self, action):
+        if self.game_over():
+            return 0
+        self.frame += 1
+        self.paddle += {2: -4, 5: 4}.get(action, 0)
+        self.paddle = min(max(self.paddle, 0), self.height - 16)
+        return int(self.reward_every is not None and self.frame % self.reward_every == 0)
+
+
+    def _bounce(self, speed, size):
+        pos = (self.frame * speed) % (2 * size)
+        return pos if pos < size else 2 * size - pos
+
+
+    def _draw(self, screen, channel):
+        (background, ball, paddle) = [color[channel] for color in self.COLORS]
+        screen[...] = background
+        (row, col) = (self._bounce(3, self.height - 4), self._bounce(2, self.width - 2))
+        screen[row:row + 4, col:col + 2] = ball
+        screen[self.paddle:self.paddle + 16, 8:12] = paddle
+        return screen
+
+
+    def getScreenRGB(self, screen_data=None):
+        if screen_data is None:
+            screen_data = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        return self._draw(screen_data, 0)
+
+
+    def getScreenGrayscale(self, screen_data=None):
+        if screen_data is None:
+            screen_data = np.empty((self.height, self.width, 1), dtype=np.uint8)
+        return self._draw(screen_data, 1)
@@ -1,4 +1,5 @@
-from pyrl.tasks.task import Task
+from pyrl.tasks.task import Task, shallow_copy
+from pyrl.dtype import floatX
 
 import random
 import numpy as np
@@ -8,7 +9,7 @@ class CliffWalk(Task):
     actions = [0, 1]
 
     def __init__(self, start_pos, size, state_type=np.ndarray):
-        self.state_1d = np.zeros(size)
+        self.state_1d = np.zeros(size, dtype=floatX)
         self.curr_pos = 0
         self.start_pos = start_pos
         self.size = size
@@ -22,6 +23,15 @@ class CliffWalk(Task):
         self.state_1d[self.curr_pos] = 1.
         self.dead = False
 
+    def copy(self):
+        task = shallow_copy(self)
+        task.state_1d = np.array(self.state_1d)
+        return task
+
+    @property
+    def state_key(self):
+        return (self.curr_pos, self.dead)
+
     @property
     def curr_state(self):
         if self.state_type == np.ndarray:
@@ -1,9 +1,35 @@
-from pyrl.tasks.task import Task
+from pyrl.tasks.task import Task, shallow_copy
+from pyrl.dtype import floatX
+from pyrl.utils import LRUCache
 
 import random
 import numpy as np
+import numpy.random as npr
 import matplotlib.pyplot as plt
-import dill as pickle
+
+# layout data shared by all tasks with the same grid, keyed by its contents,
+# for the most recently used grids.
+_layout_cache = LRUCache(64)
+
+def grid_layout(grid):
+    '''
+    return the cached layout of a grid: a read-only floatX wall plane,
+    and the flat indices of walls and free cells.
+    '''
+    grid = np.asarray(grid)
+    key = (grid.shape, grid.dtype.str, grid.tobytes())
+    layout = _layout_cache.get(key)
+    if layout is None:
+        wall_plane = np.array(grid, dtype=floatX)
+        wall_plane.flags.writeable = False
+        layout = {
+            'wall_plane': wall_plane,
+            'wall_indices': np.flatnonzero(grid),
+            'free_indices': np.flatnonzero(grid == 0.)
+        }
+        _layout_cache[key] = layout
+    return layout
+
 
 class GridWorld(Task):
     ''' RL variant of gridworld where the dynamics and reward function are not
@@ -31,7 +57,9 @@ class GridWorld(Task):
         self.action_stoch = action_stoch
         self.state_type = state_type
         self.goal = dict(goal)
+        self.layout = grid_layout(grid)
         self.free_pos = self._free_pos()
+        self.wall_indices = 2 * grid.size + self.layout['wall_indices']
         self.curr_pos = random.choice(self.free_pos)
         self.hit_wall = False
 
@@ -49,23 +77,36 @@ class GridWorld(Task):
 
 
     def copy(self):
-        return pickle.loads(pickle.dumps(self))
+        '''
+        layout data (grid, free cells, initial goals) is immutable and shared,
+        only the episode state is duplicated.
+        '''
+        task = shallow_copy(self)
+        task._copy_goals(self)
+        return task
+
+
+    def _copy_goals(self, task):
+        # goal and rewards may be the same dict, see GridWorldMultiGoal.
+        self.goal = dict(task.goal)
+        if task.rewards is task.goal:
+            self.rewards = self.goal
+        else:
+            self.rewards = dict(task.rewards)
 
 
     def _free_pos(self):
-        pos = []
-        self.state_id = {}
-        self.state_pos = {}
-        state_num = 0
-        w, h = self.grid.shape
-        for i in xrange(w):
-            for j in xrange(h):
-                self.state_id[(i, j)] = state_num
-                if self.grid[i][j] == 0. and (i, j) not in self.goal:
-                    pos.append((i, j))
-                self.state_pos[state_num] = (i, j)
-                state_num += 1
-        return pos
+        '''
+        free cells that are not goals, as a list of (i, j).
+        their flat indices i * W + j are kept in self.free_indices.
+        '''
+        (h, w) = self.grid.shape
+        free = self.layout['free_indices']
+        goal_indices = [pos[0] * w + pos[1] for pos in self.goal]
+        if goal_indices:
+            free = free[~np.in1d(free, goal_indices)]
+        self.free_indices = free
+        return zip((free // w).tolist(), (free % w).tolist())
 
     def reset(self):
         # history.
@@ -79,61 +120,101 @@ class GridWorld(Task):
         self.curr_pos = random.choice(self.free_pos)
         self.goal = dict(self.init_goal)
         self.rewards = dict(self.init_rewards)
-        (h, w) = self.grid.shape
-        self.state_3d = np.zeros((3, h, w))
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
-        for pos in self.goal:
-            self.state_3d[1, pos[0], pos[1]] = 1.
-        self.state_3d[2, :, :] = self.grid
+        self._state_snapshot = None
 
 
     def set_to(self, task):
-        # history.
+        # history. last_state is a read-only snapshot, safe to share.
         self.last_action = task.last_action
-        self.last_state = np.array(task.last_state)
+        self.last_state = task.last_state
         self.num_steps = task.num_steps
         self.cum_reward = task.cum_reward
 
         # state.
         self.hit_wall = task.hit_wall
         self.curr_pos = task.curr_pos
-        self.goal = dict(task.init_goal)
-        self.rewards = dict(task.init_rewards)
-        self.state_3d = np.array(task.state_3d)
+        self._copy_goals(task)
+        self._state_snapshot = None
+
+
+    def all_states(self, start=0, stop=None):
+        '''
+        materialize the states with the agent on each free cell as one batch.
+        start/stop select a slice of self.free_pos, to bound memory on large grids.
+
+        return (positions, states): a K x 2 array of (i, j) and a K x 3 x H x W tensor.
+        '''
+        (h, w) = self.grid.shape
+        free = self.free_indices[start:stop]
+        states = np.zeros((len(free), 3, h, w), dtype=floatX)
+        states.reshape(len(free), 3, h * w)[np.arange(len(free)), 0, free] = 1.
+        states[:, 1, :, :] = self.state_3d[1]
+        states[:, 2, :, :] = self.layout['wall_plane']
+        positions = np.array([free // w, free % w]).T
+        return (positions, states)
 
 
-    def yield_all_states(self, state_type=np.ndarray):
+    def yield_all_states(self, state_type=np.ndarray, batch_size=1024):
         '''
         generate all possible states
         '''
         (h, w) = self.grid.shape
-        for pos in self._free_pos():
-            if state_type == np.ndarray:
-                state_3d = np.zeros((3, h, w))
-                state_3d[0, pos[0], pos[1]] = 1.
-                for goal_pos in self.goal:
-                    state_3d[1, goal_pos[0], goal_pos[1]] = 1.
-                state_3d[2, :, :] = self.grid
-                yield (pos, state_3d)
-            elif state_type == str: # TODO: encode grid.
+        if state_type == np.ndarray:
+            for start in xrange(0, len(self.free_pos), batch_size):
+                (positions, states) = self.all_states(start, start + batch_size)
+                for (pos, state_3d) in zip(self.free_pos[start:start + batch_size], states):
+                    yield (pos, state_3d)
+            return
+        for pos in self.free_pos:
+            if state_type == str: # TODO: encode grid.
                 yield 'p' + str(pos) + 'g[' + ','.join([str(goal_pos) for
                             goal_pos in self.goal]) + ']'
             elif state_type == int:
                 yield pos[0] * w + pos[1]
 
 
+    @property
+    def state_3d(self):
+        '''
+        the 3xHxW tensor [state, goal, wall], built from curr_pos, goal and the
+        layout when first needed after a change. it is read-only and shared by
+        all callers until the state changes.
+        '''
+        if self._state_snapshot is None:
+            (h, w) = self.grid.shape
+            state_3d = np.zeros((3, h, w), dtype=floatX)
+            state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
+            for pos in self.goal:
+                state_3d[1, pos[0], pos[1]] = 1.
+            state_3d[2, :, :] = self.layout['wall_plane']
+            state_3d.flags.writeable = False
+            self._state_snapshot = state_3d
+        return self._state_snapshot
+
+
     @property
     def curr_state(self):
         '''
         state is a 3xHxW tensor [state, goal, wall]
-        should deep copy the state as it will go into the experience buffer.
         '''
         if self.state_type == np.ndarray:
-            return np.array(self.state_3d) # important: state_3d is mutable!
+            return self.state_3d
         else:
             return self.curr_state_id
 
 
+    @property
+    def curr_state_indices(self):
+        '''
+        flat indices of the nonzero entries of the 3xHxW state tensor
+        [agent, goals, walls], as consumed by layers.Embedding.
+        '''
+        (h, w) = self.grid.shape
+        agent = [self.curr_pos[0] * w + self.curr_pos[1]]
+        goals = [h * w + pos[0] * w + pos[1] for pos in sorted(self.goal)]
+        return np.concatenate([agent, goals, self.wall_indices]).astype(np.int64)
+
+
     @property
     def curr_state_dict(self):
         '''
@@ -154,7 +235,7 @@ class GridWorld(Task):
         '''
         return the id of the state representation
         '''
-        return self.state_id[self.curr_pos]
+        return self.curr_pos[0] * self.grid.shape[1] + self.curr_pos[1]
 
     @property
     def num_states(self):
@@ -163,7 +244,7 @@ class GridWorld(Task):
 
     @property
     def state_shape(self):
-        return self.state_3d.shape
+        return (3,) + self.grid.shape
 
     @property
     def shape(self):
@@ -185,9 +266,30 @@ class GridWorld(Task):
             or state[1] >= self.grid.shape[1]
 
     def _hit_wall(self, state):
-        return self.state_3d[2, state[0], state[1]]
+        return self.layout['wall_plane'][state[0], state[1]]
 
-    def step(self, action):
+    @property
+    def state_key(self):
+        '''
+        hashable state for tabular models: position, remaining goals, and the
+        wall hit when hitting walls ends the episode.
+        '''
+        return (self.curr_pos, tuple(sorted(self.goal.items())),
+                tuple(sorted(self.rewards.items())),
+                self.wall_penalty == 'death' and self.hit_wall)
+
+    def step_outcomes(self, action):
+        # the intended move, or with probability action_stoch a random one.
+        outcomes = [(1. - self.action_stoch, {'move': self.actions[action]})]
+        if self.action_stoch > 0:
+            prob = self.action_stoch / len(self.actions)
+            outcomes.extend([(prob, {'move': move}) for move in self.actions])
+        return outcomes
+
+    def step(self, action, move=None):
+        '''
+        move: the move made, sampled according to action_stoch by default.
+        '''
         # record history.
         self.last_action = action
         self.last_state = self.curr_state
@@ -195,27 +297,21 @@ class GridWorld(Task):
         # run step.
         reward = self.time_penalty
 
-        # update state_3d matrix
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 0.
-
         # compute new coordinate.
-        if random.random() < self.action_stoch:
-            tmp = self._move(self.curr_pos, random.choice(self.actions))
-        else:
-            tmp = self._move(self.curr_pos, self.actions[action])
+        if move is None:
+            if random.random() < self.action_stoch:
+                move = random.choice(self.actions)
+            else:
+                move = self.actions[action]
+        tmp = self._move(self.curr_pos, move)
         if not self._out_of_bounds(tmp):
             if self._hit_wall(tmp):
                 self.hit_wall = True
             else:
                 self.curr_pos = tmp
 
-
-        # update state_3d matrix.
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
-
         # update goal.
         if self.curr_pos in self.goal:
-            self.state_3d[1, self.curr_pos[0], self.curr_pos[1]] = 0.
             reward += float(self.rewards[self.curr_pos])
             if id(self.goal) != id(self.rewards):
                 del self.goal[self.curr_pos]
@@ -223,6 +319,7 @@ class GridWorld(Task):
 
         self.cum_reward += reward
         self.num_steps += 1
+        self._state_snapshot = None
         return reward
 
     def is_end(self):
@@ -284,9 +381,8 @@ class GridWorldFixedStart(GridWorld):
 
     def reset(self):
         GridWorld.reset(self)
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 0.
         self.curr_pos = self.start_pos
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
+        self._state_snapshot = None
 
     def __repr__(self):
         return str(self.start_pos) + ' -> ' + ','.join([str(key) for key in self.goal.keys()])
@@ -316,24 +412,31 @@ class GridWorldMultiGoal(GridWorld):
         self.goal_tuple = self.goals[self.start_phase]
         self.phase = self.start_phase
         GridWorld.reset(self)
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 0.
         self.curr_pos = self.start_pos
-        self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
+        self._state_snapshot = None
+
+    @property
+    def state_key(self):
+        return (self.phase,) + GridWorld.state_key.fget(self)
 
-    def step(self, action):
-        local_reward = GridWorld.step(self, action)
-        if local_reward == 1.: # get to a goal.
+    def step(self, action, move=None):
+        GridWorld.step(self, action, move)
+        if not self.goal: # get to a goal.
             if self.phase == len(self.goals) - 1:
                 return 1.
             else:
-                self.state_3d[1, self.goal_tuple[0], self.goal_tuple[1]] = 0.
                 self.phase += 1
                 self.goal_tuple = self.goals[self.phase]
                 self.goal = {self.goal_tuple: 1.}
                 self.rewards = self.goal
-                self.state_3d[1, self.goal_tuple[0], self.goal_tuple[1]] = 1.
+                self._state_snapshot = None
         return 0.
 
+    def set_to(self, task):
+        GridWorld.set_to(self, task)
+        self.phase = task.phase
+        self.goal_tuple = task.goal_tuple
+
     def visualize(self, fig=1, fname=None, format='png'):
         if fname == None:
             print 'phase = ', self.phase
@@ -343,3 +446,192 @@ class GridWorldMultiGoal(GridWorld):
     def num_phases(self):
         return len(self.goals)
 
+
+
+class BatchGridWorld(object):
+    '''
+    steps N independent GridWorld episodes at once with array operations.
+
+    built from a list of GridWorld tasks (GridWorld, GridWorldFixedStart or
+    GridWorldMultiGoal, freely mixed) that share the same grid shape. each
+    episode follows the dynamics, rewards and termination rule of its task,
+    including action_stoch, wall_penalty='death' and time_penalty. random
+    draws come from numpy instead of the random module, so trajectories
+    agree with the single-task version in distribution.
+
+    positions are flat cell indices i * W + j, which coincide with
+    GridWorld.curr_state_id.
+    '''
+    actions = np.array(GridWorld.actions)
+
+    def __init__(self, tasks, auto_reset=True):
+        shape = tasks[0].grid.shape
+        assert(all([task.grid.shape == shape for task in tasks]))
+        (h, w) = shape
+        N = len(tasks)
+        self.tasks = tasks
+        self.num_envs = N
+        self.shape = shape
+        self.auto_reset = auto_reset
+        self._envs = np.arange(N)
+
+        flat = lambda pos: pos[0] * w + pos[1]
+
+        self.walls = np.array([task.grid.reshape(-1) != 0 for task in tasks])
+        self.action_stoch = np.array([task.action_stoch for task in tasks], dtype=floatX)
+        self.time_penalty = np.array([task.time_penalty for task in tasks], dtype=floatX)
+        self.death = np.array([task.wall_penalty == 'death' for task in tasks])
+
+        # start positions: fixed, or uniform over the free cells of each task.
+        self.fixed_start = np.array([hasattr(task, 'start_pos') for task in tasks])
+        self.start_pos = np.array([flat(task.start_pos) if hasattr(task, 'start_pos') else 0
+                                   for task in tasks])
+        self.free_count = np.array([len(task.free_pos) for task in tasks])
+        self.free_pos = np.zeros((N, max(1, self.free_count.max())), dtype=int)
+        for (ni, task) in enumerate(tasks):
+            self.free_pos[ni, :len(task.free_pos)] = [flat(pos) for pos in task.free_pos]
+
+        # goals present at the start of an episode.
+        self.multigoal = np.array([isinstance(task, GridWorldMultiGoal) for task in tasks])
+        self.init_goal_rewards = np.zeros((N, h * w), dtype=floatX)
+        self.init_goal_active = np.zeros((N, h * w), dtype=bool)
+        self.start_phase = np.zeros(N, dtype=int)
+        self.num_phases = np.ones(N, dtype=int)
+        max_phases = max([len(task.goals) if isinstance(task, GridWorldMultiGoal) else 1
+                          for task in tasks])
+        self.goal_seq = np.zeros((N, max_phases), dtype=int)
+        for (ni, task) in enumerate(tasks):
+            if self.multigoal[ni]:
+                self.start_phase[ni] = task.start_phase
+                self.num_phases[ni] = len(task.goals)
+                self.goal_seq[ni, :len(task.goals)] = [flat(pos) for pos in task.goals]
+                init_goal = {task.goals[task.start_phase]: 1.}
+            else:
+                init_goal = {pos: task.init_rewards.get(pos, 0.) for pos in task.init_goal}
+            for (pos, reward) in init_goal.items():
+                self.init_goal_active[ni, flat(pos)] = True
+                self.init_goal_rewards[ni, flat(pos)] = reward
+        self.init_remaining = self.init_goal_active.sum(axis=1)
+
+        # episode state.
+        self.pos = np.zeros(N, dtype=int)
+        self.phase = np.zeros(N, dtype=int)
+        self.hit_wall = np.zeros(N, dtype=bool)
+        self.goal_rewards = np.zeros((N, h * w), dtype=floatX)
+        self.goal_active = np.zeros((N, h * w), dtype=bool)
+        self.remaining = np.zeros(N, dtype=int)
+        self.state_3d = np.zeros((N, 3, h * w), dtype=floatX)
+        self.state_3d[:, 2, :] = self.walls
+
+        self.reset()
+
+
+    def reset(self, mask=None):
+        '''
+        start new episodes for all environments, or those where mask is True.
+        '''
+        inds = self._envs if mask is None else np.flatnonzero(mask)
+        if not len(inds):
+            return
+        rand_pos = self.free_pos[inds, (npr.rand(len(inds)) * self.free_count[inds]).astype(int)]
+        pos = np.where(self.fixed_start[inds], self.start_pos[inds], rand_pos)
+
+        self.state_3d[inds, 0, self.pos[inds]] = 0.
+        self.state_3d[inds, 0, pos] = 1.
+        self.pos[inds] = pos
+        self.phase[inds] = self.start_phase[inds]
+        self.hit_wall[inds] = False
+        self.goal_rewards[inds] = self.init_goal_rewards[inds]
+        self.goal_active[inds] = self.init_goal_active[inds]
+        self.state_3d[inds, 1, :] = self.init_goal_active[inds]
+        self.remaining[inds] = self.init_remaining[inds]
+
+
+    def step(self, actions):
+        '''
+        take one action in every environment.
+
+        return (states, rewards, dones). with auto_reset, finished episodes are
+        restarted before returning, so states already belong to the new episodes.
+        '''
+        envs = self._envs
+        (h, w) = self.shape
+        actions = np.asarray(actions)
+
+        # stochastic slips.
+        slip = npr.rand(self.num_envs) < self.action_stoch
+        actions = np.where(slip, npr.randint(len(self.actions), size=self.num_envs), actions)
+
+        # move unless out of bounds or into a wall.
+        (di, dj) = self.actions[actions].T
+        ni = self.pos // w + di
+        nj = self.pos % w + dj
+        inbound = (ni >= 0) & (ni < h) & (nj >= 0) & (nj < w)
+        next_pos = np.where(inbound, ni * w + nj, self.pos)
+        wall = inbound & self.walls[envs, next_pos]
+        self.hit_wall |= wall
+        next_pos = np.where(wall, self.pos, next_pos)
+
+        self.state_3d[envs, 0, self.pos] = 0.
+        self.state_3d[envs, 0, next_pos] = 1.
+        self.pos = next_pos
+
+        # collect goals.
+        at_goal = self.goal_active[envs, next_pos]
+        rewards = self.time_penalty + np.where(at_goal, self.goal_rewards[envs, next_pos], 0.)
+        reached = np.flatnonzero(at_goal)
+        self.goal_active[reached, next_pos[reached]] = False
+        self.state_3d[reached, 1, next_pos[reached]] = 0.
+        self.remaining -= at_goal
+
+        # multi-goal tasks reward only the last goal, and move on to the next one.
+        if self.multigoal.any():
+            at_goal = at_goal & self.multigoal
+            last = at_goal & (self.phase == self.num_phases - 1)
+            rewards[self.multigoal] = 0.
+            rewards[last] = 1.
+            advance = np.flatnonzero(at_goal & ~last)
+            self.phase[advance] += 1
+            goal_pos = self.goal_seq[advance, self.phase[advance]]
+            self.goal_active[advance, goal_pos] = True
+            self.goal_rewards[advance, goal_pos] = 1.
+            self.state_3d[advance, 1, goal_pos] = 1.
+            self.remaining[advance] += 1
+
+        rewards = rewards.astype(floatX)
+        dones = (self.death & self.hit_wall) | (self.remaining == 0)
+        if self.auto_reset:
+            self.reset(dones)
+        return (self.curr_state, rewards, dones)
+
+
+    def is_end(self):
+        return (self.death & self.hit_wall) | (self.remaining == 0)
+
+
+    @property
+    def curr_state(self):
+        '''
+        N x 3 x H x W tensor [state, goal, wall], copied like GridWorld.curr_state.
+        '''
+        return self.state_3d.reshape((self.num_envs, 3) + self.shape).copy()
+
+
+    @property
+    def curr_state_id(self):
+        return self.pos.copy()
+
+
+    @property
+    def state_shape(self):
+        return (3,) + self.shape
+
+
+    @property
+    def num_actions(self):
+        return len(self.actions)
+
+
+    @property
+    def valid_actions(self):
+        return range(len(self.actions))
@@ -9,6 +9,8 @@
 "Feature extractors for Pacman game states"
 
 from game import Directions, Actions
+from collections import deque
+import layout
 import util
 
 class FeatureExtractor:  
@@ -31,10 +33,14 @@ def closestFood(pos, food, walls):
   closestFood -- this is similar to the function that we have
   worked on in the search project; here its all in one place
   """
-  fringe = [(pos[0], pos[1], 0)]
+  compiled = layout.getCompiledLayout(walls)
+  if compiled.getIndex(pos) >= 0:
+    return compiled.closest(pos, food)
+  # not on a free cell: search from its neighbours.
+  fringe = deque([(pos[0], pos[1], 0)])
   expanded = set()
   while fringe:
-    pos_x, pos_y, dist = fringe.pop(0)
+    pos_x, pos_y, dist = fringe.popleft()
     if (pos_x, pos_y) in expanded:
       continue
     expanded.add((pos_x, pos_y))
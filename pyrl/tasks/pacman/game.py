@@ -10,6 +10,7 @@ from util import *
 import time, os
 import traceback
 import numpy as np
+from pyrl.dtype import floatX
 
 #######################
 # Parts worth reading #
@@ -377,6 +378,12 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+        self.clearChanges()
+
+    def clearChanges( self ):
+        """
+        Resets the per-move bookkeeping, as for a freshly copied successor.
+        """
         self._foodEaten = None
         self._capsuleEaten = None
         self._agentMoved = None
@@ -454,7 +461,7 @@ class GameStateData:
         return an array representation of the state data.
         """
         width, height = self.layout.width, self.layout.height
-        pacman_array = np.zeros((width, height, 4))
+        pacman_array = np.zeros((width, height, 4), dtype=floatX)
         agent_array_list = []
         for agentState in self.agentStates:
             if agentState == None: continue
@@ -464,14 +471,14 @@ class GameStateData:
             if agentState.isPacman:
                 pacman_array[x, y, :] = self._dirEncoding(agent_dir)
             else:
-                agent_array = np.zeros((width, height, 4))
+                agent_array = np.zeros((width, height, 4), dtype=floatX)
                 agent_array[x, y, :] = self._dirEncoding(agent_dir)
                 agent_array_list.append(agent_array)
         return {
-            'food': np.array(self.food.data, dtype=float),
-            'wall': np.array(self.layout.walls.data, dtype=float),
+            'food': np.array(self.food.data, dtype=floatX),
+            'wall': np.array(self.layout.walls.data, dtype=floatX),
             'pacman': pacman_array,
-            'ghosts': np.array(agent_array_list)
+            'ghosts': np.array(agent_array_list, dtype=floatX)
         }
 
     def _foodWallStr( self, hasFood, hasWall ):
@@ -714,6 +721,43 @@ class Game:
                 boinc.set_fraction_done(self.getProgress())
 
 
+    def run_one_trusted(self, undo=None):
+        """
+        Same moves as run_one for trusted agents in a headless game: agents
+        see the live state instead of a deep copy, successors are generated
+        in place, and there is no muting, timeout or crash handling.
+        Agents must not keep or modify the states they are given.
+
+        If undo is a list, the GameState.makeMove record of each move is
+        appended to it.
+        """
+        numAgents = len( self.agents )
+
+        for agentIndex in range(self.startingIndex, self.startingIndex + numAgents):
+            if self.gameOver:
+                break
+            agentIndex = agentIndex % numAgents
+            agent = self.agents[agentIndex]
+            if 'observationFunction' in dir( agent ):
+                observation = agent.observationFunction(self.state)
+            else:
+                observation = self.state
+            action = agent.getAction(observation)
+
+            # Execute the action
+            self.moveHistory.append( (agentIndex, action) )
+            if undo is None:
+                self.state.generateSuccessorInPlace( agentIndex, action )
+            else:
+                undo.append( self.state.makeMove( agentIndex, action ) )
+
+            self.display.update( self.state.data )
+            self.rules.process(self.state, self)
+            if agentIndex == numAgents + 1: self.numMoves += 1
+
+            if _BOINC_ENABLED:
+                boinc.set_fraction_done(self.getProgress())
+
     def init(self):
         self.display.initialize(self.state.data)
         self.numMoves = 0
@@ -2,11 +2,15 @@ import pyrl
 from pyrl.tasks.task import Task
 from util import *
 from pacman import GameState, ClassicGameRules, loadAgent
-from game import Game, Directions, Actions, Agent, AgentState, Configuration
-from pyrl.tasks.pacman.ghostAgents import DirectionalGhost
+from pacman import SCARED_TIME, COLLISION_TOLERANCE, TIME_PENALTY
+from game import Game, GameStateData, Directions, Actions, Agent, AgentState, Configuration
+from textDisplay import NullGraphics
+from pyrl.tasks.pacman.ghostAgents import DirectionalGhost, RandomGhost
 import layout
 import numpy as np
+import numpy.random as npr
 import cStringIO
+from pyrl.dtype import floatX
 from threading import Thread, Event
 
 class GameWaitAgent(Agent):
@@ -52,14 +56,79 @@ class GameNoWaitAgent(Agent):
         agent.next_action = self.next_action
         return agent
 
+class PacmanStateTensor(object):
+    '''
+    the 'stack' state [food, wall, pacman x 4 directions, ghosts x 4 directions]
+    of a game. after the first build it is updated from the cells that changed
+    in a move, instead of going through GameStateData.array() every step.
+    walls come from the per-layout cache Layout.wallArray().
+    '''
+    def __init__(self, game):
+        self.game = game
+        data = game.state.data
+        self.stack = np.zeros((10, data.layout.width, data.layout.height), dtype=floatX)
+        self.stack[0] = data.food.data
+        self.stack[1] = data.layout.wallArray()
+        self._draw_agents(data)
+
+    @staticmethod
+    def _agent_cells(data):
+        for agentState in data.agentStates:
+            if agentState == None: continue
+            if agentState.configuration == None: continue
+            (x, y) = [int(i) for i in nearestPoint(agentState.configuration.pos)]
+            yield (agentState, x, y)
+
+    def _draw_agents(self, data):
+        self.agent_cells = []
+        for (agentState, x, y) in self._agent_cells(data):
+            encoding = data._dirEncoding(agentState.configuration.direction)
+            if agentState.isPacman:
+                self.stack[2:6, x, y] = encoding
+            else:
+                self.stack[6:10, x, y] += encoding
+            self.agent_cells.append((x, y))
+
+    def update(self, food_cells=()):
+        '''
+        apply the last moves of self.game. only pacman eats, so food can only
+        have changed where pacman stands now, or in the given food_cells.
+        '''
+        data = self.game.state.data
+        for (x, y) in self.agent_cells:
+            self.stack[2:, x, y] = 0.
+        for (agentState, x, y) in self._agent_cells(data):
+            if agentState.isPacman:
+                self.stack[0, x, y] = data.food[x][y]
+        for (x, y) in food_cells:
+            self.stack[0, x, y] = data.food[x][y]
+        self._draw_agents(data)
+
+    def frame(self):
+        '''
+        the k-frames descriptor [food, wall, pacman, ghost 1, ..., ghost n]
+        where agents are marked without their directions.
+        '''
+        ghosts = [(x, y) for (agentState, x, y) in self._agent_cells(self.game.state.data)
+                  if not agentState.isPacman]
+        frame = np.zeros((3 + len(ghosts),) + self.stack.shape[1:], dtype=floatX)
+        frame[:2] = self.stack[:2]
+        frame[2] = np.sum(self.stack[2:6], axis=0)
+        for (gi, (x, y)) in enumerate(ghosts):
+            frame[3 + gi, x, y] = 1.
+        return frame
+
+
 class PacmanTask(Task):
     def __init__(self, layout, agents, display, state_repr='stack',
-                 muteAgents=False, catchExceptions=False):
+                 muteAgents=False, catchExceptions=False, fast_step=True):
         '''
         state_repr: state representation, possible values ['stack', 'k-frames', 'dict']
             'stack' - stack walls, food, ghost and pacman representation into a 4D tensor.
             'dict' - return the raw dict representation keys=['walls', 'food', 'ghost', 'pacman'], values are matrix/tensor.
             'k-frames' - instead of directional descriptors for pacman and ghost, use static descriptors and capture past k frames.
+        fast_step: step with Game.run_one_trusted (no state copies) when the game is
+            headless and neither muted nor catching exceptions. the trajectories are the same.
         '''
         # parse state representation.
         self.state_repr = state_repr
@@ -68,11 +137,18 @@ class PacmanTask(Task):
         self.display = display
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.fast_step = fast_step
+        self._trusted = (fast_step and not muteAgents and not catchExceptions
+                         and isinstance(display, NullGraphics))
 
         if self.state_repr.endswith('frames'):
             bar_pos = self.state_repr.rfind('frames')
             self.state_k = int(self.state_repr[:bar_pos-1])
-            self.state_history = []
+            # ring buffer of the past state_k frames, newest at history_pos - 1.
+            self.state_history = None
+            self.history_len = 0
+            self.history_pos = 0
+        self._tensor = None
         self.init_state = GameState()
         self.init_state.initialize(layout, len(agents))
         self.game_rule = ClassicGameRules(timeout=100)
@@ -99,7 +175,8 @@ class PacmanTask(Task):
 
     def deep_copy(self):
         agents = list(self.agents)
-        task = PacmanTask(self.layout, agents, self.display, self.state_repr, self.muteAgents, self.catchExceptions)
+        task = PacmanTask(self.layout, agents, self.display, self.state_repr, self.muteAgents, self.catchExceptions,
+                          self.fast_step)
         task.game = self.game.deepCopy()
         task.myagent = self.myagent # TODO: agents not deep copy.
         return task
@@ -108,56 +185,55 @@ class PacmanTask(Task):
     def curr_state_dict(self):
         return self.game.state.data.array()
 
+    def _state_tensor(self):
+        # rebuilt from scratch whenever the game object is replaced (reset, edits).
+        if self._tensor is None or self._tensor.game is not self.game:
+            self._tensor = PacmanStateTensor(self.game)
+        return self._tensor
+
+    def _push_frame(self, frame):
+        '''
+        return what _pop_frame needs to undo the push.
+        '''
+        if self.state_history is None or self.state_history.shape[1:] != frame.shape:
+            self.state_history = np.zeros((self.state_k,) + frame.shape, dtype=floatX)
+            self.history_len = 0
+            self.history_pos = 0
+        overwritten = None
+        if self.history_len == self.state_k:
+            overwritten = np.array(self.state_history[self.history_pos])
+        undo = (self.history_len, overwritten)
+        self.state_history[self.history_pos] = frame
+        self.history_pos = (self.history_pos + 1) % self.state_k
+        self.history_len = min(self.history_len + 1, self.state_k)
+        return undo
+
+    def _pop_frame(self, undo):
+        (self.history_len, overwritten) = undo
+        self.history_pos = (self.history_pos - 1) % self.state_k
+        if overwritten is not None:
+            self.state_history[self.history_pos] = overwritten
+
+    def _update_tensor(self, food_cells=()):
+        if self._tensor is not None and self._tensor.game is self.game:
+            self._tensor.update(food_cells)
+
     @property
     def curr_state(self):
         if self.state_repr == 'dict':
             return self.curr_state_dict
         elif self.state_repr == 'stack':
-            state_dict = self.curr_state_dict
-            if len(state_dict.get('ghosts')) == 0:
-                ghost_stacked = np.zeros_like(state_dict['pacman'])
-            else:
-                ghost_stacked = np.sum(state_dict['ghosts'], axis=0)
-            state = np.array(
-                [
-                    state_dict['food'],
-                    state_dict['wall']
-                ]
-                +
-                [
-                    state_dict['pacman'][:, :, i] for i in range(4)
-                ]
-                +
-                [
-                    ghost_stacked[:, :, i] for i in range(4)
-                ]
-            )
-            return state
+            return np.array(self._state_tensor().stack)
         elif hasattr(self, 'state_k'):
-            state_history = self.state_history + [self.curr_state_dict]
-            def stack_direction(state_agent):
-                return np.sum(state_agent, axis=2)
-            state = []
-            k = 0
-            for hist_dict in state_history[::-1]:
-                state.extend([
-                        hist_dict['food'],
-                        hist_dict['wall'],
-                        stack_direction(hist_dict['pacman'])
-
-                    ]
-                        +
-                    sum(
-                        [
-                                [stack_direction(ghost) for ghost in hist_dict['ghosts']]
-                        ], []
-                    )
-                )
-                k += 1
-            state = np.array(state)
-            frame_dim = state.shape[0] / k
-            for ki in range(k, self.state_k + 1):
-                state = np.concatenate((state, np.zeros_like(state[:frame_dim, :, :])), axis=0)
+            # current frame, then past frames from newest to oldest, zero padded.
+            frame = self._state_tensor().frame()
+            frame_dim = frame.shape[0]
+            state = np.zeros(((self.state_k + 1) * frame_dim,) + frame.shape[1:], dtype=floatX)
+            state[:frame_dim] = frame
+            if self.state_history is not None and self.state_history.shape[1:] == frame.shape:
+                for ki in range(self.history_len):
+                    slot = (self.history_pos - 1 - ki) % self.state_k
+                    state[(ki + 1) * frame_dim:(ki + 2) * frame_dim] = self.state_history[slot]
             return state
 
     def is_end(self):
@@ -174,9 +250,7 @@ class PacmanTask(Task):
 
     def step(self, action):
         if hasattr(self, 'state_k'): # if we use past frames.
-            self.state_history.append(self.curr_state_dict)
-            if len(self.state_history) > self.state_k:
-                self.state_history = self.state_history[-self.state_k:]
+            self._push_frame(self._state_tensor().frame())
 
         if action not in self.valid_actions: # TODO: hack.
             action = self.dir_to_action[Directions.STOP]
@@ -187,7 +261,11 @@ class PacmanTask(Task):
 
         # run the game using the direction.
         self.myagent.next_action = direction
-        self.game.run_one()
+        if self._trusted:
+            self.game.run_one_trusted()
+        else:
+            self.game.run_one()
+        self._update_tensor()
         new_score = self.game.state.data.score
         reward = new_score - old_score
 
@@ -196,6 +274,51 @@ class PacmanTask(Task):
 
         return reward
 
+    def make_move(self, action):
+        '''
+        step in place, recording what unmake_move needs to rewind the move.
+        lets a search (e.g. MCTS) branch from a state without deep_copy.
+        the game is run headless, and the ghosts' random draws are not rewound.
+
+        return (reward, undo).
+        '''
+        game = self.game
+        undo = {
+            'moves': [],
+            'game_over': game.gameOver,
+            'num_history': len(game.moveHistory),
+            'num_moves': game.numMoves,
+            'frame': None
+        }
+        if hasattr(self, 'state_k'):
+            undo['frame'] = self._push_frame(self._state_tensor().frame())
+
+        if action not in self.valid_actions: # TODO: hack.
+            action = self.dir_to_action[Directions.STOP]
+
+        old_score = game.state.data.score
+        self.myagent.next_action = self.action_to_dir[action]
+        game.run_one_trusted(undo['moves'])
+        self._update_tensor()
+        return (game.state.data.score - old_score, undo)
+
+    def unmake_move(self, undo):
+        '''
+        rewind a make_move. moves must be unmade in reverse order.
+        '''
+        game = self.game
+        # food can only be restored where pacman moved to.
+        pacman = GameEditor._find_pacman(game.state.data)
+        food_cells = [tuple([int(i) for i in nearestPoint(pacman.getPosition())])]
+        for move in reversed(undo['moves']):
+            game.state.unmakeMove(move)
+        game.gameOver = undo['game_over']
+        del game.moveHistory[undo['num_history']:]
+        game.numMoves = undo['num_moves']
+        if undo['frame'] is not None:
+            self._pop_frame(undo['frame'])
+        self._update_tensor(food_cells)
+
     def reset(self):
         self.start_game()
 
@@ -210,19 +333,42 @@ class PacmanTask(Task):
         return str(self.game.state)
 
 
+class GameEdit(object):
+    """
+    a single edit of a game (e.g. move pacman to a cell), kept as a small
+    diff until it is applied to a copy of the game.
+    """
+    def __init__(self, op, *args):
+        self.op = op
+        self.args = args
+
+    def apply(self, game):
+        new_game = game.deepCopy()
+        getattr(GameEditor, '_apply_' + self.op)(new_game, *self.args)
+        return new_game
+
+    def __repr__(self):
+        return '%s%s' % (self.op, str(self.args))
+
+
 class GameEditor(object):
     """
     provide primitive edit functions to game state data.
+
+    each edit has a generator *_edits(game) of GameEdit diffs, and a function
+    of the same name returning the list of edited games.
     """
     @staticmethod
     def _find_free_pos(data):
-        config = data.array()
+        ghost_pos = set()
+        for agentState in data.agentStates:
+            if agentState == None or agentState.configuration == None: continue
+            if not agentState.isPacman:
+                ghost_pos.add(tuple([int(i) for i in nearestPoint(agentState.configuration.pos)]))
         width, height = data.layout.width, data.layout.height
         for x in range(width):
             for y in range(height):
-                if (config['wall'][x, y] == 1 or
-                    config['food'][x, y] == 1 or
-                    any(map(lambda ghost: ghost[x, y].any() == 1, config['ghosts']))):
+                if data.layout.walls[x][y] or data.food[x][y] or (x, y) in ghost_pos:
                     continue
                 else:
                     yield (x, y)
@@ -239,121 +385,136 @@ class GameEditor(object):
         return pacmanState
 
     @staticmethod
-    def move_pacman(game):
+    def _remove_agent(game, ind):
+        rm_ind = lambda xs: [x for (xi, x) in enumerate(xs) if xi != ind]
+        game.state.data.agentStates = rm_ind(game.state.data.agentStates)
+        game.agents = rm_ind(game.agents)
+        game.totalAgentTimes = rm_ind(game.totalAgentTimes)
+        game.totalAgentTimeWarnings = rm_ind(game.totalAgentTimeWarnings)
+        game.agentOutput = rm_ind(game.agentOutput)
+
+    @staticmethod
+    def _apply_move_pacman(game, x, y, dir):
+        pacmanState = GameEditor._find_pacman(game.state.data)
+        pacmanState.configuration.pos = (x, y) # change the state.
+        pacmanState.configuration.direction = dir
+
+    @staticmethod
+    def _apply_del_ghost(game, ind):
+        GameEditor._remove_agent(game, ind)
+
+    @staticmethod
+    def _apply_add_ghost(game, x, y, dir, ghost_type):
+        agentState = AgentState(Configuration((x, y), dir), isPacman=False)
+        game.state.data.agentStates.append(agentState)
+        game.agents.append(ghost_type(len(game.agents)))
+        game.totalAgentTimes.append(0.)
+        game.totalAgentTimeWarnings.append(0.)
+        game.agentOutput.append(cStringIO.StringIO())
+
+    @staticmethod
+    def _apply_move_ghost(game, ghost_index, x, y, dir):
+        ghostState = game.state.data.agentStates[ghost_index]
+        ghostState.configuration.pos = (x, y) # change the state.
+        ghostState.configuration.direction = dir
+
+    @staticmethod
+    def _apply_del_food(game, x, y):
+        game.state.data.food[x][y] = 0
+
+    @staticmethod
+    def move_pacman_edits(game):
         '''
         move pacman to any free pos on the map.
         '''
-        data = game.state.data
+        for (x, y) in GameEditor._find_free_pos(game.state.data):
+            yield GameEdit('move_pacman', x, y, Directions.ALL[0]) # use one direction.
 
-        # create all valid modifications of pacman.
-        game_nb = []
-        for (x, y) in GameEditor._find_free_pos(data):
-                for dir in Directions.ALL:
-                    new_data = data.deepCopy()
-                    pacmanState = GameEditor._find_pacman(new_data)
-                    pacmanState.configuration.pos = (x, y) # change the state.
-                    pacmanState.configuration.direction = dir
-                    new_game = game.deepCopy()
-                    new_game.state.data = new_data
-                    game_nb.append(new_game)
-                    break
-        return game_nb
+    @staticmethod
+    def del_ghost_edits(game):
+        # try to delete one of the ghosts.
+        for ind in range(1, len(game.state.data.agentStates)): # TODO: abusing variable naming convention here, CS188 and pyrl use different conventions.
+            yield GameEdit('del_ghost', ind)
+
+    @staticmethod
+    def add_ghost_edits(game, ghost_type=DirectionalGhost):
+        for (x, y) in GameEditor._find_free_pos(game.state.data):
+            yield GameEdit('add_ghost', x, y, Directions.ALL[0], ghost_type) # use one direction.
+            break
+
+    @staticmethod
+    def move_ghost_edits(game, ghost_index=1):
+        for (x, y) in GameEditor._find_free_pos(game.state.data):
+            for dir in Directions.ALL:
+                yield GameEdit('move_ghost', ghost_index, x, y, dir)
+
+    @staticmethod
+    def move_ghosts_edits(game):
+        for ghost_index in range(1, len(game.agents)):
+            for edit in GameEditor.move_ghost_edits(game, ghost_index):
+                yield edit
+
+    @staticmethod
+    def del_food_edits(game):
+        food = game.state.data.food
+        for x in range(food.width):
+            for y in range(food.height):
+                if food[x][y]:
+                    yield GameEdit('del_food', x, y)
+
+    @staticmethod
+    def move_pacman(game):
+        return [edit.apply(game) for edit in GameEditor.move_pacman_edits(game)]
 
     @staticmethod
     def del_ghost(game):
-        data = game.state.data
-        game_nb = []
-        if len(data.agentStates) == 1:
-            return game_nb
-        # try to delete one of the ghosts.
-        for ind in range(1, len(data.agentStates)): # TODO: abusing variable naming convention here, CS188 and pyrl use different conventions.
-            if ind == 0:
-                continue
-            new_game = game.deepCopy()
-            rm_ind = lambda xs: [x for (xi, x) in enumerate(xs) if xi != ind]
-            new_game.state.data.agentStates = rm_ind(data.agentStates)
-            new_game.agents = rm_ind(game.agents)
-            new_game.totalAgentTimes = rm_ind(game.totalAgentTimes)
-            new_game.totalAgentTimeWarnings = rm_ind(game.totalAgentTimeWarnings)
-            new_game.agentOutput = rm_ind(game.agentOutput)
-            game_nb.append(new_game)
-        return game_nb
+        return [edit.apply(game) for edit in GameEditor.del_ghost_edits(game)]
 
     @staticmethod
     def add_ghost(game, ghost_type=DirectionalGhost):
-        data = game.state.data
-        game_nb = []
-        for (x, y) in GameEditor._find_free_pos(data):
-            for dir in Directions.ALL:
-                agentState = AgentState(Configuration((x, y), dir), isPacman=False)
-                new_game = game.deepCopy()
-                new_game.state.data.agentStates.append(agentState)
-                new_game.agents.append(ghost_type(len(new_game.agents)))
-                new_game.totalAgentTimes.append(0.)
-                new_game.totalAgentTimeWarnings.append(0.)
-                new_game.agentOutput.append(cStringIO.StringIO())
-                game_nb.append(new_game)
-                break # use one direction.
-            break
-        return game_nb
+        return [edit.apply(game) for edit in GameEditor.add_ghost_edits(game, ghost_type)]
 
     @staticmethod
     def move_ghost(game, ghost_index=1):
-        data = game.state.data
-        # create all valid modifications of pacman.
-        game_nb = []
-        for (x, y) in GameEditor._find_free_pos(data):
-                for dir in Directions.ALL:
-                    new_data = data.deepCopy()
-                    ghostState =  data.agentStates[ghost_index]
-                    ghostState.configuration.pos = (x, y) # change the state.
-                    ghostState.configuration.direction = dir
-                    new_game = game.deepCopy()
-                    new_game.state.data = new_data
-                    game_nb.append(new_game)
-        return game_nb
+        return [edit.apply(game) for edit in GameEditor.move_ghost_edits(game, ghost_index)]
 
     @staticmethod
     def move_ghosts(game):
-        game_nb = []
-        for ghost_index in range(1, len(game.agents)):
-            game_nb.extend(GameEditor.move_ghost(game, ghost_index))
-        return game_nb
+        return [edit.apply(game) for edit in GameEditor.move_ghosts_edits(game)]
 
     @staticmethod
     def del_food(game):
-        data = game.state.data
-        config = data.array()
-        width, height = data.layout.width, data.layout.height
-        game_nb = []
-        for x in range(width):
-            for y in range(height):
-                if config['food'][x, y] == 1:
-                    new_data = data.deepCopy()
-                    new_data.food[x][y] = 0
-                    new_game = game.deepCopy()
-                    new_game.state.data = new_data
-                    game_nb.append(new_game)
-        return game_nb
+        return [edit.apply(game) for edit in GameEditor.del_food_edits(game)]
 
 class PacmanTaskShifter(object):
     """
     creates local edits to a PacmanTask
+
+    neighbors are edits of the task's initial game. neighbor_edits yields them
+    as GameEdit diffs and iter_neighbors materializes one task at a time, so
+    only the neighbors actually consumed are copied.
     """
     @staticmethod
-    def neighbors(task, axis=['move_pacman']):
-        task.reset()
-        game = task.game
-        game_nb = []
+    def neighbor_edits(task, axis=['move_pacman']):
         for ax in axis:
-            game_nb += getattr(GameEditor, ax)(game)
-        task_nb = []
-        for new_game in game_nb:
-            new_task = task.deep_copy()
-            new_task.init_game = new_game
-            new_task.reset()
-            task_nb.append(new_task)
-        return task_nb
+            for edit in getattr(GameEditor, ax + '_edits')(task.init_game):
+                yield edit
+
+    @staticmethod
+    def apply(task, edit):
+        new_task = task.deep_copy()
+        new_task.init_game = edit.apply(task.init_game)
+        new_task.reset()
+        return new_task
+
+    @staticmethod
+    def iter_neighbors(task, axis=['move_pacman']):
+        for edit in PacmanTaskShifter.neighbor_edits(task, axis):
+            yield PacmanTaskShifter.apply(task, edit)
+
+    @staticmethod
+    def neighbors(task, axis=['move_pacman']):
+        return list(PacmanTaskShifter.iter_neighbors(task, axis))
 
 class PacmanTaskFeature(object):
     '''
@@ -373,7 +534,7 @@ class PacmanTaskDistance(object):
 
     @staticmethod
     def dist_food(task_a, task_b):
-        get_food = lambda task: task.game.state.data.array()['food']
+        get_food = lambda task: np.array(task.game.state.data.food.data, dtype=floatX)
         return float(np.sum(np.abs(get_food(task_a) - get_food(task_b))))
 
     @staticmethod
@@ -382,3 +543,266 @@ class PacmanTaskDistance(object):
         (xb, yb) = GameEditor._find_pacman(task_b.game.state.data).configuration.pos
         return float(abs(xa - xb) + abs(ya - yb))
 
+
+
+class BatchPacmanTask(object):
+    '''
+    advances N Pacman games on the same layout in lockstep with array operations.
+
+    built from a PacmanTask whose initial game is used as the start of every
+    episode. one step is one round as in PacmanTask.step: pacman moves, then
+    each ghost, and a game stops as soon as it is won or lost. it follows the
+    classic rules for food, capsules, scared timers, half-speed scared ghosts
+    and collisions. ghosts may be RandomGhost or DirectionalGhost. their moves
+    are drawn with numpy, so games agree with PacmanTask in distribution.
+
+    ghost positions are kept in half cells, so that scared ghosts stay on
+    integer coordinates.
+    '''
+    def __init__(self, task, num_envs, auto_reset=True):
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.scared_time = SCARED_TIME
+        self.time_penalty = TIME_PENALTY
+        self.collision_dist = int(2 * COLLISION_TOLERANCE)
+        self._envs = np.arange(num_envs)
+
+        # actions are indexed as in PacmanTask.
+        self.directions = list(task.all_actions)
+        self.num_actions = len(self.directions)
+        self.stop = self.directions.index(Directions.STOP)
+        self.vectors = np.array([Actions._directions[d] for d in self.directions], dtype=int)
+        self.reverse = np.array([self.directions.index(Actions.reverseDirection(d))
+                                 for d in self.directions])
+        encoding = GameStateData()._dirEncoding
+        self.encoding = np.array([encoding(d) for d in self.directions], dtype=floatX)
+
+        data = task.init_game.state.data
+        (w, h) = (data.layout.width, data.layout.height)
+        self.shape = (w, h)
+        self.walls = np.array(data.layout.walls.data, dtype=bool)
+        # legal moves from each cell; staying is legal on any free cell.
+        self.legal = np.zeros((w, h, self.num_actions), dtype=bool)
+        for (ai, (dx, dy)) in enumerate(self.vectors):
+            for x in range(w):
+                for y in range(h):
+                    if 0 <= x + dx < w and 0 <= y + dy < h:
+                        self.legal[x, y, ai] = not self.walls[x + dx, y + dy]
+
+        # initial game.
+        pacman = data.agentStates[0]
+        ghosts = data.agentStates[1:]
+        self.num_ghosts = len(ghosts)
+        self.init_food = np.array(data.food.data, dtype=bool)
+        self.init_capsules = np.zeros((w, h), dtype=bool)
+        for (x, y) in data.capsules:
+            self.init_capsules[x, y] = True
+        self.init_pac_pos = np.array(pacman.configuration.pos, dtype=int)
+        self.init_pac_dir = self.directions.index(pacman.configuration.direction)
+        self.init_ghost_pos = np.array([np.multiply(2, ghost.configuration.pos) for ghost in ghosts],
+                                       dtype=int).reshape(-1, 2)
+        self.init_ghost_dir = np.array([self.directions.index(ghost.configuration.direction)
+                                        for ghost in ghosts], dtype=int)
+        self.init_ghost_timer = np.array([ghost.scaredTimer for ghost in ghosts], dtype=int)
+        self.start_ghost_pos = np.array([np.multiply(2, ghost.start.pos) for ghost in ghosts],
+                                        dtype=int).reshape(-1, 2)
+        self.start_ghost_dir = np.array([self.directions.index(ghost.start.direction)
+                                         for ghost in ghosts], dtype=int)
+
+        # ghost policies: prob_attack/prob_flee of a DirectionalGhost, None for RandomGhost.
+        self.ghost_policy = []
+        for agent in task.init_game.agents[1:self.num_ghosts + 1]:
+            if isinstance(agent, DirectionalGhost):
+                self.ghost_policy.append((agent.prob_attack, agent.prob_scaredFlee))
+            elif isinstance(agent, RandomGhost):
+                self.ghost_policy.append(None)
+            else:
+                raise NotImplementedError('BatchPacmanTask only supports RandomGhost and DirectionalGhost')
+
+        # episode state.
+        N = num_envs
+        self.food = np.zeros((N, w, h), dtype=bool)
+        self.num_food = np.zeros(N, dtype=int)
+        self.capsules = np.zeros((N, w, h), dtype=bool)
+        self.pac_pos = np.zeros((N, 2), dtype=int)
+        self.pac_dir = np.zeros(N, dtype=int)
+        self.ghost_pos = np.zeros((N, self.num_ghosts, 2), dtype=int)
+        self.ghost_dir = np.zeros((N, self.num_ghosts), dtype=int)
+        self.ghost_timer = np.zeros((N, self.num_ghosts), dtype=int)
+        self.score = np.zeros(N, dtype=floatX)
+        self.win = np.zeros(N, dtype=bool)
+        self.lose = np.zeros(N, dtype=bool)
+
+        self.reset()
+
+
+    def reset(self, mask=None):
+        '''
+        start new games for all environments, or those where mask is True.
+        '''
+        inds = self._envs if mask is None else np.flatnonzero(mask)
+        self.food[inds] = self.init_food
+        self.num_food[inds] = self.init_food.sum()
+        self.capsules[inds] = self.init_capsules
+        self.pac_pos[inds] = self.init_pac_pos
+        self.pac_dir[inds] = self.init_pac_dir
+        self.ghost_pos[inds] = self.init_ghost_pos
+        self.ghost_dir[inds] = self.init_ghost_dir
+        self.ghost_timer[inds] = self.init_ghost_timer
+        self.score[inds] = 0.
+        self.win[inds] = False
+        self.lose[inds] = False
+
+
+    def is_end(self):
+        return self.win | self.lose
+
+
+    def _collide(self, envs, gi):
+        '''
+        resolve collisions of ghost gi with pacman in envs.
+        '''
+        dist = np.abs(2 * self.pac_pos[envs] - self.ghost_pos[envs, gi]).sum(axis=1)
+        hit = envs[dist <= self.collision_dist]
+        is_scared = self.ghost_timer[hit, gi] > 0
+        scared = hit[is_scared]
+        killer = hit[~is_scared & ~self.win[hit]]
+        self._score_change[scared] += 200
+        self.ghost_pos[scared, gi] = self.start_ghost_pos[gi]
+        self.ghost_dir[scared, gi] = self.start_ghost_dir[gi]
+        self.ghost_timer[scared, gi] = 0
+        self._score_change[killer] -= 500
+        self.lose[killer] = True
+
+
+    def _move_pacman(self, envs, actions):
+        legal = self.legal[self.pac_pos[envs, 0], self.pac_pos[envs, 1], actions]
+        actions = np.where(legal, actions, self.stop)
+        self.pac_pos[envs] += self.vectors[actions]
+        self.pac_dir[envs] = np.where(actions == self.stop, self.pac_dir[envs], actions)
+
+        # eat.
+        (x, y) = (self.pac_pos[envs, 0], self.pac_pos[envs, 1])
+        eat = envs[self.food[envs, x, y]]
+        self.food[eat, self.pac_pos[eat, 0], self.pac_pos[eat, 1]] = False
+        self.num_food[eat] -= 1
+        self._score_change[eat] += 10
+        cleared = eat[self.num_food[eat] == 0]
+        self._score_change[cleared] += 500
+        self.win[cleared] = True
+        capsule = envs[self.capsules[envs, x, y]]
+        self.capsules[capsule, self.pac_pos[capsule, 0], self.pac_pos[capsule, 1]] = False
+        self.ghost_timer[capsule] = self.scared_time
+
+        self._score_change[envs] -= self.time_penalty
+        for gi in range(self.num_ghosts):
+            self._collide(envs, gi)
+
+
+    def ghost_distribution(self, gi, envs=None):
+        '''
+        the probabilities of each action for ghost gi, as its getDistribution
+        would give. return an (len(envs), num_actions) array.
+        '''
+        envs = self._envs if envs is None else envs
+        pos = self.ghost_pos[envs, gi]
+        on_grid = (pos % 2 == 0).all(axis=1)
+        cell = pos // 2
+        legal = self.legal[cell[:, 0], cell[:, 1]] & on_grid[:, np.newaxis]
+        legal[:, self.stop] = False
+        reverse = self.reverse[self.ghost_dir[envs, gi]]
+        can_turn = legal.sum(axis=1) > 1
+        legal[can_turn, reverse[can_turn]] = False
+        # between grid points, ghosts keep going.
+        legal[~on_grid, self.ghost_dir[envs[~on_grid], gi]] = True
+        legal[~legal.any(axis=1), self.stop] = True
+
+        probs = legal.astype(floatX)
+        policy = self.ghost_policy[gi]
+        if policy is not None:
+            (prob_attack, prob_flee) = policy
+            scared = self.ghost_timer[envs, gi] > 0
+            step = np.where(scared, 1, 2)
+            next_pos = pos[:, np.newaxis, :] + self.vectors[np.newaxis, :, :] * step[:, np.newaxis, np.newaxis]
+            dist = np.abs(next_pos - 2 * self.pac_pos[envs, np.newaxis, :]).sum(axis=2)
+            big = np.iinfo(dist.dtype).max
+            best_score = np.where(scared, np.where(legal, dist, -1).max(axis=1),
+                                  np.where(legal, dist, big).min(axis=1))
+            best = legal & (dist == best_score[:, np.newaxis])
+            best_prob = np.where(scared, prob_flee, prob_attack)[:, np.newaxis]
+            probs = (best * best_prob / best.sum(axis=1, keepdims=True)
+                     + legal * (1 - best_prob) / legal.sum(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs
+
+
+    def _move_ghost(self, envs, gi, actions=None):
+        if actions is None:
+            cum = np.cumsum(self.ghost_distribution(gi, envs), axis=1)
+            actions = (npr.rand(len(envs), 1) > cum).sum(axis=1)
+            actions = np.minimum(actions, self.num_actions - 1)
+        step = np.where(self.ghost_timer[envs, gi] > 0, 1, 2)
+        self.ghost_pos[envs, gi] += self.vectors[actions] * step[:, np.newaxis]
+        self.ghost_dir[envs, gi] = actions
+
+        # scared timer runs out on the nearest grid point.
+        snap = envs[self.ghost_timer[envs, gi] == 1]
+        self.ghost_pos[snap, gi] = (self.ghost_pos[snap, gi] + 1) // 2 * 2
+        self.ghost_timer[envs, gi] = np.maximum(0, self.ghost_timer[envs, gi] - 1)
+        self._collide(envs, gi)
+
+
+    def step(self, actions, ghost_actions=None):
+        '''
+        actions: pacman action index of each game, illegal ones mean stop.
+        ghost_actions: optional (N, num_ghosts) action indices to use instead of
+            sampling the ghost policies.
+
+        return (rewards, dones). games that end are reset if auto_reset.
+        '''
+        actions = np.asarray(actions)
+        old_score = np.array(self.score)
+        active = self._envs[~self.is_end()]
+
+        self._score_change = np.zeros(self.num_envs, dtype=floatX)
+        self._move_pacman(active, actions[active])
+        self.score += self._score_change
+        for gi in range(self.num_ghosts):
+            active = active[~self.is_end()[active]]
+            self._score_change = np.zeros(self.num_envs, dtype=floatX)
+            if ghost_actions is None:
+                self._move_ghost(active, gi)
+            else:
+                self._move_ghost(active, gi, np.asarray(ghost_actions)[active, gi])
+            self.score += self._score_change
+
+        rewards = self.score - old_score
+        dones = self.is_end()
+        if self.auto_reset and dones.any():
+            self.reset(dones)
+        return (rewards, dones)
+
+
+    @property
+    def valid_actions(self):
+        '''
+        (N, num_actions) mask of the legal pacman actions.
+        '''
+        return self.legal[self.pac_pos[:, 0], self.pac_pos[:, 1]]
+
+
+    @property
+    def curr_state(self):
+        '''
+        the 'stack' states of PacmanTask, as an (N, 10, W, H) tensor.
+        '''
+        N = self.num_envs
+        state = np.zeros((N, 10) + self.shape, dtype=floatX)
+        state[:, 0] = self.food
+        state[:, 1] = self.walls
+        state[self._envs, 2:6, self.pac_pos[:, 0], self.pac_pos[:, 1]] = self.encoding[self.pac_dir]
+        cell = (self.ghost_pos + 1) // 2
+        for gi in range(self.num_ghosts):
+            np.add.at(state, (self._envs, slice(6, 10), cell[:, gi, 0], cell[:, gi, 1]),
+                      self.encoding[self.ghost_dir[:, gi]])
+        return state
@@ -8,10 +8,14 @@
 
 from util import manhattanDistance
 from game import Grid
+from pyrl.dtype import floatX
+import numpy as np
 import os
 import random
 
 VISIBILITY_MATRIX_CACHE = {}
+WALL_ARRAY_CACHE = {}
+COMPILED_LAYOUT_CACHE = {}
 
 class Layout:
     """
@@ -54,6 +58,24 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def wallArray(self):
+        """
+        A read-only (width, height) array of the walls, shared by all layouts
+        with the same text.
+        """
+        key = "\n".join(self.layoutText)
+        if key not in WALL_ARRAY_CACHE:
+            walls = np.array(self.walls.data, dtype=floatX)
+            walls.flags.writeable = False
+            WALL_ARRAY_CACHE[key] = walls
+        return WALL_ARRAY_CACHE[key]
+
+    def compiled(self):
+        """
+        The CompiledLayout of the walls, see getCompiledLayout.
+        """
+        return getCompiledLayout(self.walls)
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -121,6 +143,96 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+class CompiledLayout:
+    """
+    Static structure of a maze: a wall mask, an index of the free cells,
+    their adjacency and the all-pairs maze distances between them.
+    Built once per wall configuration by getCompiledLayout.
+    """
+    MOVES = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+    def __init__(self, walls):
+        self.width, self.height = walls.width, walls.height
+        self.wallMask = np.array(walls.data, dtype=bool)
+        self.cells = np.argwhere(~self.wallMask)
+        numCells = len(self.cells)
+        self.cellIndex = -np.ones((self.width, self.height), dtype=int)
+        self.cellIndex[self.cells[:, 0], self.cells[:, 1]] = np.arange(numCells)
+
+        # neighbor cell index for each move, -1 if blocked.
+        self.neighbors = -np.ones((numCells, len(self.MOVES)), dtype=int)
+        for (mi, (dx, dy)) in enumerate(self.MOVES):
+            x, y = self.cells[:, 0] + dx, self.cells[:, 1] + dy
+            inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+            self.neighbors[inside, mi] = self.cellIndex[x[inside], y[inside]]
+
+        # breadth first search from all cells at once, -1 if unreachable.
+        distances = -np.ones((numCells, numCells), dtype=np.int32)
+        distances[np.arange(numCells), np.arange(numCells)] = 0
+        frontier = np.eye(numCells, dtype=bool)
+        dist = 0
+        while frontier.any():
+            dist += 1
+            reached = np.zeros_like(frontier)
+            for mi in range(len(self.MOVES)):
+                valid = self.neighbors[:, mi] >= 0
+                reached[:, valid] |= frontier[:, self.neighbors[valid, mi]]
+            frontier = reached & (distances < 0)
+            distances[frontier] = dist
+        self.distances = distances
+        # cells sorted by distance from each cell, unreachable ones last.
+        self.byDistance = np.argsort(np.where(distances < 0, numCells, distances),
+                                     axis=1, kind='mergesort').astype(np.int32)
+        for array in [self.wallMask, self.cells, self.cellIndex, self.neighbors,
+                      self.distances, self.byDistance]:
+            array.flags.writeable = False
+
+    def getIndex(self, pos):
+        """
+        Index of the free cell at an integer position, or -1.
+        """
+        x, y = pos
+        if x < 0 or x >= self.width or y < 0 or y >= self.height: return -1
+        return self.cellIndex[x, y]
+
+    def getDistance(self, pos1, pos2):
+        """
+        Maze distance between two free cells, None if one is not free or
+        they are not connected.
+        """
+        i, j = self.getIndex(pos1), self.getIndex(pos2)
+        if i < 0 or j < 0: return None
+        dist = self.distances[i, j]
+        if dist < 0: return None
+        return int(dist)
+
+    def closest(self, pos, grid):
+        """
+        Maze distance from a free cell to the closest cell set in grid
+        (e.g. food), None if there is none reachable.
+        """
+        i = self.getIndex(pos)
+        distances = self.distances[i]
+        for j in self.byDistance[i]:
+            if distances[j] < 0: break
+            x, y = self.cells[j]
+            if grid[x][y]: return int(distances[j])
+        return None
+
+def getCompiledLayout(walls):
+    """
+    The CompiledLayout of a wall grid, shared by all grids with the same walls
+    and remembered on the grid itself.
+    """
+    compiled = getattr(walls, '_compiled', None)
+    if compiled is None:
+        key = str(walls)
+        if key not in COMPILED_LAYOUT_CACHE:
+            COMPILED_LAYOUT_CACHE[key] = CompiledLayout(walls)
+        compiled = COMPILED_LAYOUT_CACHE[key]
+        walls._compiled = compiled
+    return compiled
+
 def getLayout(name, back = 2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
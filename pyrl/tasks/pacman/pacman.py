@@ -93,27 +93,68 @@ class GameState:
 
         # Copy current state
         state = GameState(self)
+        state._applyMove( agentIndex, action )
+        return state
 
+    def generateSuccessorInPlace( self, agentIndex, action ):
+        """
+        Same as generateSuccessor, but edits this state instead of copying it.
+        Only safe if nobody keeps a reference to this state or its agent states
+        (see Game.run_one_trusted).
+        """
+        if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
+
+        self.data.clearChanges()
+        self._applyMove( agentIndex, action )
+        return self
+
+    def makeMove( self, agentIndex, action ):
+        """
+        Applies a move in place like generateSuccessorInPlace, and returns
+        what unmakeMove needs to take it back.
+        """
+        data = self.data
+        undo = (agentIndex,
+                [agentState.configuration for agentState in data.agentStates],
+                [agentState.scaredTimer for agentState in data.agentStates],
+                data.food, data.capsules[:], data._eaten[:], data.score, data.scoreChange,
+                data._foodEaten, data._capsuleEaten, data._agentMoved, data._lose, data._win)
+        self.generateSuccessorInPlace( agentIndex, action )
+        return undo
+
+    def unmakeMove( self, undo ):
+        """
+        Restores the state from before the makeMove that returned undo.
+        Moves must be unmade in reverse order.
+        """
+        data = self.data
+        (agentIndex, configurations, scaredTimers,
+            data.food, data.capsules, data._eaten, data.score, data.scoreChange,
+            data._foodEaten, data._capsuleEaten, data._agentMoved, data._lose, data._win) = undo
+        for (agentState, configuration, scaredTimer) in zip(data.agentStates, configurations, scaredTimers):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+
+    def _applyMove( self, agentIndex, action ):
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction( state, action )
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction( self, action )
         else:                # A ghost is moving
-            GhostRules.applyAction( state, action, agentIndex )
+            GhostRules.applyAction( self, action, agentIndex )
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( self.data.agentStates[agentIndex] )
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath( state, agentIndex )
+        GhostRules.checkDeath( self, agentIndex )
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
 
     def getLegalPacmanActions( self ):
         return self.getLegalActions( 0 )
@@ -197,6 +238,13 @@ class GameState:
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
 
+    def getMazeDistance(self, pos1, pos2):
+        """
+        Shortest path length between two free cells, looked up in the
+        compiled layout. None if they are not connected.
+        """
+        return layout.getCompiledLayout(self.data.layout.walls).getDistance(pos1, pos2)
+
     def isLose( self ):
         return self.data._lose
 
@@ -1,7 +1,7 @@
 # Playroom game from Singh et al. 04
 # http://www-anw.cs.umass.edu/pubs/2004/singh_bc_NIPS04.pdf
 
-from pyrl.tasks.task import Task
+from pyrl.tasks.task import Task, shallow_copy
 from pyrl.utils import to_string
 import pyrl.prob as prob
 
@@ -48,6 +48,23 @@ class Playroom(Task):
         self.size = size
 
 
+    def copy(self):
+        task = shallow_copy(self)
+        task.state = {key: list(val) if isinstance(val, list) else val
+                      for (key, val) in self.state.items()}
+        return task
+
+
+    @property
+    def state_key(self):
+        return self.curr_state
+
+
+    def is_end(self):
+        # the playroom is not episodic.
+        return False
+
+
     @property
     def state_shape(self):
         return 1
@@ -163,14 +180,25 @@ class Playroom(Task):
         return ''
 
 
-    def step(self, actionid):
+    def step_outcomes(self, actionid):
+        if self.ACTIONS[actionid] == 'move eye to a random object':
+            prob = 1. / len(self.object_pos)
+            return [(prob, {'eye_target': pos}) for pos in self.object_pos]
+        return [(1., {})]
+
+
+    def step(self, actionid, eye_target=None):
+        '''
+        eye_target: the object 'move eye to a random object' picks, at random by default.
+        '''
         assert(actionid >= 0 and actionid < self.num_actions)
         action = self.ACTIONS[actionid]
 
+        # positions are copied when assigned, moving the eye must not move the hand.
         if action == 'move eye to hand':
-            self.state['eye_pos'] = self.state['hand_pos']
+            self.state['eye_pos'] = list(self.state['hand_pos'])
         elif action == 'move eye to marker':
-            self.state['eye_pos'] = self.state['mark_pos']
+            self.state['eye_pos'] = list(self.state['mark_pos'])
         elif action == 'move eye north':
             if self.state['eye_pos'][0] > 0:
                 self.state['eye_pos'][0] -= 1
@@ -184,12 +212,13 @@ class Playroom(Task):
             if self.state['eye_pos'][1] < self.size - 1:
                 self.state['eye_pos'][1] += 1
         elif action == 'move eye to a random object':
-            pos = prob.choice(self.object_pos, 1)[0]
-            self.state['eye_pos'] = pos
+            if eye_target is None:
+                eye_target = prob.choice(self.object_pos, 1)[0]
+            self.state['eye_pos'] = list(eye_target)
         elif action == 'move hand to eye':
-            self.state['hand_pos'] = self.state['eye_pos']
+            self.state['hand_pos'] = list(self.state['eye_pos'])
         elif action == 'move marker to eye':
-            self.state['mark_pos'] = self.state['eye_pos']
+            self.state['mark_pos'] = list(self.state['eye_pos'])
         elif action == 'touch object' and self._can_touch_object():
             if self.state['eye_pos'] == self.state['red_button_pos']:
                 self.state['music'] = False
@@ -201,7 +230,7 @@ class Playroom(Task):
                   and (self.state['mark_pos'][0] == self.state['ball_pos'][0]
                        or self.state['mark_pos'][1] == self.state['ball_pos'][1])
                   ): # kick the ball if ball and mark are on a straight line.
-                self.state['ball_pos'] = self.state['mark_pos']
+                self.state['ball_pos'] = list(self.state['mark_pos'])
 
         return 0.
 
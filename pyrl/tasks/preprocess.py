@@ -0,0 +1,269 @@
+# observation preprocessing for pixel-based tasks (ALE, pygame).
+from pyrl.dtype import floatX
+import numpy as np
+import scipy.sparse as sp
+
+# BT.601 luma weights scaled by 256, the Y channel of utils.rgb2yuv.
+LUMA_WEIGHTS = (77, 150, 29)
+
+
+def luma(rgb, out=None, scratch=None):
+    '''
+    integer luma of a (..., 3) uint8 image: (77 R + 150 G + 29 B + 128) >> 8.
+
+    out: uint8 output buffer of shape rgb.shape[:-1].
+    scratch: uint16 buffer of shape (2,) + rgb.shape[:-1], to avoid temporaries.
+    '''
+    shape = rgb.shape[:-1]
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    if scratch is None:
+        scratch = np.empty((2,) + shape, dtype=np.uint16)
+    (acc, tmp) = scratch
+    (wr, wg, wb) = LUMA_WEIGHTS
+    np.multiply(rgb[..., 0], wr, out=acc, dtype=np.uint16)
+    np.multiply(rgb[..., 1], wg, out=tmp, dtype=np.uint16)
+    np.add(acc, tmp, out=acc)
+    np.multiply(rgb[..., 2], wb, out=tmp, dtype=np.uint16)
+    np.add(acc, tmp, out=acc)
+    np.add(acc, 128, out=acc, casting='unsafe')
+    np.right_shift(acc, 8, out=out, casting='unsafe')
+    return out
+
+
+def area_matrix(n_in, n_out):
+    '''
+    (n_out, n_in) CSR matrix whose rows average the input cells covered
+    by each output cell, weighted by the covered fraction.
+    '''
+    scale = n_in / float(n_out)
+    (rows, cols, vals) = ([], [], [])
+    for i in xrange(n_out):
+        (lo, hi) = (i * scale, (i + 1) * scale)
+        for j in xrange(int(np.floor(lo)), min(int(np.ceil(hi)), n_in)):
+            overlap = min(hi, j + 1) - max(lo, j)
+            if overlap > 0:
+                rows.append(i)
+                cols.append(j)
+                vals.append(overlap / scale)
+    return sp.csr_matrix((vals, (rows, cols)), shape=(n_out, n_in), dtype=floatX)
+
+
+def sample_indices(n_in, n_out, taps):
+    '''
+    input indices of taps evenly spaced sample points inside each of
+    the n_out output cells, flattened to length n_out * taps.
+    '''
+    scale = n_in / float(n_out)
+    pos = (np.arange(n_out)[:, np.newaxis] + (np.arange(taps) + 0.5) / taps) * scale
+    return np.minimum(pos.astype(int), n_in - 1).ravel()
+
+
+def _ragged_arange(starts, lengths):
+    '''
+    concatenation of arange(start, start + length) over starts, lengths.
+    '''
+    ends = np.cumsum(lengths)
+    offsets = np.repeat(starts - ends + lengths, lengths)
+    return np.arange(ends[-1] if len(ends) else 0) + offsets
+
+
+def rasterize_boxes(shape, boxes, out=None):
+    '''
+    binary image of shape (channels, rows, cols) with the boxes filled in.
+
+    boxes: (k, 5) integer array of channel, row0, col0, row1, col1 per
+           box, filling [row0, row1) x [col0, col1). boxes are clipped to
+           the image. the cells of all boxes are enumerated with a few
+           array operations and set in one scatter, instead of a python
+           loop over the boxes.
+    '''
+    (channels, rows, cols) = shape
+    if out is None:
+        out = np.empty(shape, dtype=floatX)
+    out.fill(0.)
+    boxes = np.asarray(boxes, dtype=int).reshape(-1, 5)
+    lo = np.maximum(boxes[:, 1:3], 0)
+    (heights, widths) = np.maximum(np.minimum(boxes[:, 3:5], (rows, cols)) - lo, 0).T
+    # one entry per row of each box, then one per cell of each row.
+    row_box = np.repeat(np.arange(len(boxes)), heights)
+    row_starts = (boxes[row_box, 0] * rows + _ragged_arange(lo[:, 0], heights)) * cols + lo[row_box, 1]
+    out.reshape(-1)[_ragged_arange(row_starts, widths[row_box])] = 1.
+    return out
+
+
+class Downsampler(object):
+    '''
+    luma + downsampling of (rows, cols, 3) uint8 frames to uint8 images.
+
+    taps=None averages every input pixel an output pixel covers, with
+    precomputed sparse resampling matrices. taps=k averages a k x k grid
+    of sample points per output pixel and reads only those pixels, which
+    is far cheaper when the frame is several times larger than out_shape.
+
+    normalize='minmax' stretches each frame to 0..255 the way
+    scipy.misc.imresize does for float images, which the previous
+    rgb2yuv + imresize pipeline relied on. against that pipeline (bicubic)
+    on pong / defender / london screens, taps=2 with 'minmax' stays within
+    a mean absolute difference of 4 / 255; differences concentrate on
+    object edges.
+    '''
+    def __init__(self, in_shape, out_shape=(84, 84), taps=2, normalize=None):
+        assert(normalize in (None, 'minmax'))
+        self.in_shape = tuple(in_shape[:2])
+        self.out_shape = tuple(out_shape)
+        self.taps = taps
+        self.normalize = normalize
+        self.out = np.empty(self.out_shape, dtype=np.uint8)
+        self._small = np.empty(self.out_shape, dtype=floatX)
+        if taps is None:
+            self.row_matrix = area_matrix(self.in_shape[0], self.out_shape[0])
+            self.col_matrix = area_matrix(self.in_shape[1], self.out_shape[1])
+            self._luma = np.empty(self.in_shape, dtype=np.uint8)
+            self._scratch = np.empty((2,) + self.in_shape, dtype=np.uint16)
+        else:
+            (h, w) = self.out_shape
+            # tap-major order, so the i-th taps of all output rows form one block.
+            self.row_idx = sample_indices(self.in_shape[0], h, taps).reshape(h, taps).T.ravel()
+            self.col_idx = sample_indices(self.in_shape[1], w, taps).reshape(w, taps).T.ravel()
+            self._rows = np.empty((taps * h, self.in_shape[1], 3), dtype=np.uint8)
+            self._pixels = np.empty((taps * h, taps * w, 3), dtype=np.uint8)
+            self._sums = np.empty((h, w, 3), dtype=np.uint16)
+            self._fsums = np.empty((h, w, 3), dtype=floatX)
+            # luma weights folded with the 1 / k^2 tap average.
+            self._weights = np.array(LUMA_WEIGHTS, dtype=floatX) / floatX(256. * taps * taps)
+
+
+    def _downsample(self, rgb):
+        small = self._small
+        if self.taps is None:
+            luma(rgb, out=self._luma, scratch=self._scratch)
+            rows = self.row_matrix.dot(self._luma)
+            small[:] = self.col_matrix.dot(rows.T).T
+        else:
+            np.take(rgb, self.row_idx, axis=0, out=self._rows)
+            np.take(self._rows, self.col_idx, axis=1, out=self._pixels)
+            # sum the taps per channel first, luma is linear.
+            (k, (h, w), sums) = (self.taps, self.out_shape, self._sums)
+            blocks = self._pixels.reshape(k, h, k, w, 3)
+            sums[...] = blocks[0, :, 0]
+            for i in xrange(k):
+                for j in xrange(k):
+                    if i or j:
+                        np.add(sums, blocks[i, :, j], out=sums)
+            self._fsums[...] = sums
+            np.dot(self._fsums.reshape(-1, 3), self._weights, out=small.reshape(-1))
+        return small
+
+
+    def __call__(self, rgb, out=None):
+        '''
+        rgb: (rows, cols, 3) uint8 frame of in_shape.
+        out: uint8 buffer of out_shape, defaults to self.out (overwritten on every call).
+        '''
+        assert(rgb.shape[:2] == self.in_shape)
+        if out is None:
+            out = self.out
+        small = self._downsample(rgb)
+        if self.normalize == 'minmax':
+            (lo, hi) = (small.min(), small.max())
+            small -= lo
+            if hi > lo:
+                small *= floatX(255. / (hi - lo))
+        small += floatX(0.5)
+        np.clip(small, 0, 255, out=small)
+        out[...] = small
+        return out
+
+
+class BlockMax(object):
+    '''
+    max pooling of (rows, cols) uint8 frames to uint8 images of out_shape,
+    over the blocks of an even split of the rows and columns. unlike
+    averaging, it keeps thin objects such as balls and bullets.
+
+    normalize='minmax' stretches each frame to 0..255, as Downsampler does.
+    '''
+    def __init__(self, in_shape, out_shape=(16, 16), normalize=None):
+        assert(normalize in (None, 'minmax'))
+        self.in_shape = tuple(in_shape[:2])
+        self.out_shape = tuple(out_shape)
+        self.normalize = normalize
+        self.row_starts = np.arange(self.out_shape[0]) * self.in_shape[0] // self.out_shape[0]
+        self.col_starts = np.arange(self.out_shape[1]) * self.in_shape[1] // self.out_shape[1]
+        self.out = np.empty(self.out_shape, dtype=np.uint8)
+        self._rows = np.empty((self.out_shape[0], self.in_shape[1]), dtype=np.uint8)
+        self._small = np.empty(self.out_shape, dtype=floatX)
+
+
+    def __call__(self, img, out=None):
+        '''
+        img: (rows, cols) uint8 frame of in_shape.
+        out: uint8 buffer of out_shape, defaults to self.out (overwritten on every call).
+        '''
+        assert(img.shape == self.in_shape)
+        if out is None:
+            out = self.out
+        np.maximum.reduceat(img, self.row_starts, axis=0, out=self._rows)
+        np.maximum.reduceat(self._rows, self.col_starts, axis=1, out=out)
+        if self.normalize == 'minmax':
+            (lo, hi) = (out.min(), out.max())
+            if hi > lo:
+                small = self._small
+                np.subtract(out, lo, out=small)
+                small *= floatX(255. / (hi - lo))
+                small += floatX(0.5)
+                out[...] = small
+            else:
+                out.fill(0)
+        return out
+
+
+class FrameStack(object):
+    '''
+    circular buffer holding the last num_frames observation frames.
+
+    frames are written in place, each one twice (at slot i and
+    i + num_frames), so the current stack is always the contiguous view
+    buf[pos + 1:pos + 1 + num_frames], oldest frame first. pushing and
+    reading never allocate, and reset is O(1).
+    scale: optional factor applied while copying a frame in,
+           e.g. 1 / 255. to store uint8 screens as floats.
+    '''
+    def __init__(self, num_frames, frame_shape, dtype=floatX, scale=None):
+        self.num_frames = num_frames
+        self.frame_shape = tuple(frame_shape)
+        self.scale = scale
+        self.buf = np.zeros((2 * num_frames,) + self.frame_shape, dtype=dtype)
+        self.pos = num_frames - 1
+        self.count = 0
+
+
+    def __len__(self):
+        return min(self.count, self.num_frames)
+
+
+    def reset(self):
+        self.count = 0
+
+
+    def push(self, frame):
+        pos = (self.pos + 1) % self.num_frames
+        slot = self.buf[pos]
+        if self.scale is None:
+            slot[...] = frame
+        else:
+            np.multiply(frame, self.scale, out=slot, casting='unsafe')
+        self.buf[pos + self.num_frames] = slot
+        self.pos = pos
+        self.count += 1
+
+
+    def stack(self):
+        '''
+        view of the last num_frames frames, oldest first.
+        it is overwritten by later pushes, copy it to keep it. slots not
+        yet filled since the last reset hold stale frames.
+        '''
+        start = self.pos + 1
+        return self.buf[start:start + self.num_frames]
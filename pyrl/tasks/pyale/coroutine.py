@@ -0,0 +1,90 @@
+# coroutines on top of threads, for code that owns its main loop.
+import sys
+import threading
+
+
+class CoroutineExit(BaseException):
+    ''' raised inside a coroutine at its suspension point by close(). '''
+    pass
+
+
+class Coroutine(object):
+    '''
+    runs func(*args) as a coroutine backed by a thread.
+
+    resume(value) transfers control into the coroutine until it calls
+    suspend(result), which returns result to the resumer, or until func
+    returns, which raises StopIteration. suspend(result) in turn returns
+    the value of the next resume. exactly one side runs at any time, so
+    the coroutine may touch the same global state (pygame, game modules)
+    as the caller without locking. exceptions raised by func propagate
+    to resume.
+
+    the thread is a daemon, an abandoned coroutine does not keep the
+    process alive. close() unwinds it by raising CoroutineExit at its
+    suspension point.
+    '''
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+        self.started = False
+        self.finished = False
+        self._closing = False
+        self._value = None
+        self._error = None
+        self._to_coroutine = threading.Semaphore(0)
+        self._to_caller = threading.Semaphore(0)
+        self._thread = threading.Thread(target=self._main)
+        self._thread.daemon = True
+
+
+    def _main(self):
+        self._to_coroutine.acquire()
+        try:
+            if not self._closing:
+                self._value = self.func(*self.args)
+        except CoroutineExit:
+            pass
+        except BaseException:
+            self._error = sys.exc_info()
+        self.finished = True
+        self._to_caller.release()
+
+
+    def resume(self, value=None):
+        if self.finished:
+            raise StopIteration()
+        if not self.started:
+            self.started = True
+            self._thread.start()
+        self._value = value
+        self._to_coroutine.release()
+        self._to_caller.acquire()
+        if self._error:
+            (error, self._error) = (self._error, None)
+            raise error[0], error[1], error[2]
+        if self.finished:
+            raise StopIteration()
+        return self._value
+
+
+    def suspend(self, value=None):
+        ''' called from inside the coroutine. '''
+        self._value = value
+        self._to_caller.release()
+        self._to_coroutine.acquire()
+        if self._closing:
+            raise CoroutineExit()
+        return self._value
+
+
+    def close(self):
+        if self.finished:
+            return
+        self._closing = True
+        if not self.started:
+            self.finished = True
+            return
+        self._to_coroutine.release()
+        self._to_caller.acquire()
+        self._error = None
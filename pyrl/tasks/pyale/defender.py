@@ -1,10 +1,12 @@
 ''' warning: defender simulator should be singleton, as it changes pygame behavior '''
 from pyrl.common import *
 from pyrl.tasks.pyale import PygameSimulator, function_intercept
+from pyrl.tasks.preprocess import rasterize_boxes
 from pyrl.evaluate import DrunkLearner
 from pygame.locals import *
-from pyrl.config import floatX
+from pyrl.dtype import floatX
 from pyrl.utils import Timer, get_val
+from itertools import chain
 import os
 import time
 import pygame
@@ -19,9 +21,13 @@ pygame.image.load = lambda path: old_image_load(os.path.join(os.path.dirname(__f
 
 
 class DefenderSimulator(PygameSimulator):
-    def __init__(self, state_type='pixel'):
+    snapshot_env = ('SHIELD_SHIP',) # the ship is built when lib.ship is imported.
+
+    def __init__(self, state_type='pixel', headless=None, frame_ms=16, seed=None, pool_frames=1,
+                 skip_draw=True, share_state=False):
         PygameSimulator.__init__(self, 'defender', [K_DOWN, K_UP, K_LEFT, K_RIGHT, K_SPACE],
-                state_type=state_type)
+                state_type=state_type, headless=headless, frame_ms=frame_ms, seed=seed,
+                pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def is_end(self):
@@ -40,8 +46,10 @@ class DefenderSimulator(PygameSimulator):
 
 
 class DefenderRAMSimulator(DefenderSimulator):
-    def __init__(self):
-        DefenderSimulator.__init__(self, state_type='ram')
+    def __init__(self, headless=None, frame_ms=16, seed=None, pool_frames=1, skip_draw=True,
+                 share_state=False):
+        DefenderSimulator.__init__(self, state_type='ram', headless=headless, frame_ms=frame_ms, seed=seed,
+                                   pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def _get_ram_state(self):
@@ -79,14 +87,15 @@ class DefenderRAMSimulator(DefenderSimulator):
 
 
 class Defender1HotSimulator(DefenderSimulator):
-    def __init__(self):
-        DefenderSimulator.__init__(self, state_type='1hot')
+    def __init__(self, headless=None, frame_ms=16, seed=None, pool_frames=1, skip_draw=True,
+                 share_state=False):
+        DefenderSimulator.__init__(self, state_type='1hot', headless=headless, frame_ms=frame_ms, seed=seed,
+                                   pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
         self.TW = self.TH = 84
 
 
     def _get_1hot_state(self):
         (TW, TH) = (self.TW, self.TH)
-        ram = np.zeros((4, TH, TW), dtype=floatX) # ship, enemy, shipshot, enemyshot
         W = 400.
         H = 600.
         ship = self._get_attr('ship')
@@ -94,24 +103,19 @@ class Defender1HotSimulator(DefenderSimulator):
         shotami = self._get_attr('shotami')
         shotenemi = self._get_attr('shotenemi')
 
-        ceil = lambda x: int(np.ceil(x))
-        ram[0,
-            int(ship.topleft[1] / H * TH) : ceil((ship.topleft[1] + ship.rect.bottom - ship.rect.top) / H * TH),
-            int(ship.topleft[0] / W * TW) : ceil((ship.topleft[0] + ship.rect.right - ship.rect.left) / W * TW)] = 1.
-
-        for (i, e) in enumerate(enemi):
-            ram[1, int(e.top / H * TH): ceil((e.top + e.height) / H * TH),
-                    int(e.left / W * TW): ceil((e.left + e.width) / W * TW)] = 1.
-
-        for (i, e) in enumerate(shotami):
-            ram[2, int(e.top / H * TH): ceil((e.top + e.height) / H * TH),
-                    int(e.left / W * TW): ceil((e.left + e.width) / W * TW)] = 1.
-
-        for (i, e) in enumerate(shotenemi):
-            ram[3, int(e.top / H * TH): ceil((e.top + e.height) / H * TH),
-                    int(e.left / W * TW): ceil((e.left + e.width) / W * TW)] = 1.
-
-        return ram
+        # (left, top, width, height) of the ship, enemies, ship shots, enemy shots.
+        channels = [[ship.topleft + (ship.rect.right - ship.rect.left, ship.rect.bottom - ship.rect.top)],
+                    enemi, shotami, shotenemi]
+        num_sprites = sum(len(sprites) for sprites in channels)
+        rects = np.fromiter(chain.from_iterable(chain(*channels)), float, 4 * num_sprites).reshape(-1, 4)
+        rects[:, 2:] += rects[:, :2]
+        rects /= (W, H, W, H)
+        rects *= (TW, TH, TW, TH)
+        boxes = np.empty((len(rects), 5), dtype=int)
+        boxes[:, 0] = np.repeat(np.arange(4), [len(sprites) for sprites in channels])
+        boxes[:, [2, 1]] = np.floor(rects[:, :2])
+        boxes[:, [4, 3]] = np.ceil(rects[:, 2:])
+        return rasterize_boxes((4, TH, TW), boxes)
 
 
     @property
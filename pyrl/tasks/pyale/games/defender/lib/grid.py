@@ -0,0 +1,23 @@
+# uniform grid over a list of rects, so that a rect is only tested
+# against the rects in the cells it touches.
+
+class Grid(object):
+    
+    def __init__(self,rects,size=64):
+        self.size  = size
+        self.cells = {}
+        for e,r in enumerate(rects):
+            for cell in self.touched(r):
+                self.cells.setdefault(cell,[]).append(e)
+    
+    def touched(self,r):
+        # edges included, so that the cells cover every rect r can collide with.
+        s = self.size
+        return [(x,y) for x in xrange(r.left//s,r.right//s+1) for y in xrange(r.top//s,r.bottom//s+1)]
+    
+    def candidates(self,r):
+        # indices of the rects that may collide with r, in list order.
+        found = set()
+        for cell in self.touched(r):
+            found.update(self.cells.get(cell,()))
+        return sorted(found)
@@ -1,11 +1,14 @@
 
 from .enemi import enemi
+from .grid import Grid
 from pygame import display
 scr = display.get_surface()
 scrrect = scr.get_rect()
 
-def collidelist(bullet,lstenemi):
-    for e,i in enumerate(lstenemi):
+def collidelist(bullet,lstenemi,grid=None):
+    # the first enemy bullet hits, tested only against enemies near it with a grid of lstenemi.
+    for e in (xrange(len(lstenemi)) if grid is None else grid.candidates(bullet)):
+        i = lstenemi[e]
         if bullet.colliderect(i):
             sx,sy = i.x-bullet.x,i.y-bullet.y
             if bullet.msk.overlap(i.msk,(sx,sy)):
@@ -15,9 +18,10 @@ def collidelist(bullet,lstenemi):
 class Shotami(list,object):
     
     def update(self):
+        grid = Grid(enemi) # enemies do not move while bullets are updated.
         for f in self[:]:
             f.update()
-            i = collidelist(f,enemi)
+            i = collidelist(f,enemi,grid)
             if i>-1:
                 enemi[i].shield -= f.pow
                 f.pow = 0
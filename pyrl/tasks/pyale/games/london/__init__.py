@@ -23,8 +23,7 @@ class StateHandler:
 
 	def update(self):
 		self.data.input.get(self.data, (self.gameHandler is not None and not self.gameHandler.gameOver))
-		#self.data.dt = self.data.FPSClock.tick(self.data.FPS) / 100.0
-                self.data.dt = 0.8
+		self.data.dt = self.data.FPSClock.tick(self.data.FPS) / 100.0
 
 		# update game/menu objs
 		if self.gameHandler:
@@ -62,9 +61,11 @@ class Data:
 		self.scoreValues = {'shoot bomb': 20, 'shoot superBomb': 30, 'destroy bomber': 200}
                 self.score = 0
 
-		self.bombs = pygame.sprite.Group()
-		self.superBombs = pygame.sprite.Group()
-		self.bullets = pygame.sprite.Group()
+		# ordered groups: plain Groups iterate by sprite address, which makes
+		# update order (and so every random draw) differ from run to run
+		self.bombs = pygame.sprite.OrderedUpdates()
+		self.superBombs = pygame.sprite.OrderedUpdates()
+		self.bullets = pygame.sprite.OrderedUpdates()
 
 
 	def newGame(self):
@@ -74,24 +75,24 @@ class Data:
 		self.gameSurf = pygame.Surface((self.WINDOWWIDTH, self.WINDOWHEIGHT))
 		self.gameSurf.convert()
 
-		self.destroyableEntities = pygame.sprite.Group() # any objects destroyable by bombs
-		self.bomberTargetedEntities = pygame.sprite.Group()  # any objects that bombers will try and drop bombs on
-		self.bulletproofEntities = pygame.sprite.Group() # bullets bounce straight of these
-		self.superbombableEntities = pygame.sprite.Group() # any objects destroyed by floating super bombs
+		self.destroyableEntities = pygame.sprite.OrderedUpdates() # any objects destroyable by bombs
+		self.bomberTargetedEntities = pygame.sprite.OrderedUpdates()  # any objects that bombers will try and drop bombs on
+		self.bulletproofEntities = pygame.sprite.OrderedUpdates() # bullets bounce straight of these
+		self.superbombableEntities = pygame.sprite.OrderedUpdates() # any objects destroyed by floating super bombs
 
-		self.particles = pygame.sprite.Group()
-		self.particleSpawners = pygame.sprite.Group()
+		self.particles = pygame.sprite.OrderedUpdates()
+		self.particleSpawners = pygame.sprite.OrderedUpdates()
 
-		self.buildings = pygame.sprite.Group()
-		self.standingBuildings = pygame.sprite.Group()
+		self.buildings = pygame.sprite.OrderedUpdates()
+		self.standingBuildings = pygame.sprite.OrderedUpdates()
 
-		self.bombers = pygame.sprite.Group()
-		self.bombs = pygame.sprite.Group()
-		self.superBombs = pygame.sprite.Group()
+		self.bombers = pygame.sprite.OrderedUpdates()
+		self.bombs = pygame.sprite.OrderedUpdates()
+		self.superBombs = pygame.sprite.OrderedUpdates()
 
-		self.AAguns = pygame.sprite.Group()
+		self.AAguns = pygame.sprite.OrderedUpdates()
 
-		self.spotlights = pygame.sprite.Group()
+		self.spotlights = pygame.sprite.OrderedUpdates()
 
 
 	def shakeScreen(self, intensity):
@@ -3,7 +3,7 @@ from pyrl.common import *
 from pyrl.tasks.pyale import PygameSimulator, function_intercept
 from pyrl.evaluate import DrunkLearner
 from pygame.locals import *
-from pyrl.config import floatX
+from pyrl.dtype import floatX
 import time
 import pygame
 
@@ -18,9 +18,12 @@ pygame.font._old_Font = pygame.font.Font
 pygame.font.Font = lambda path, size: pygame.font._old_Font(os.path.join(path_prefix, path), size)
 
 class LondonSimulator(PygameSimulator):
-    def __init__(self, state_type='pixel'):
+    # the game moves by dt = FPSClock.tick() / 100. per frame, 0.8 at 80ms.
+    def __init__(self, state_type='pixel', headless=None, frame_ms=80, seed=None, pool_frames=1,
+                 skip_draw=True, share_state=False):
         PygameSimulator.__init__(self, 'london', [chr(ord('0') + k) for k in range(30)],
-                state_type=state_type)
+                state_type=state_type, headless=headless, frame_ms=frame_ms, seed=seed,
+                pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def is_end(self):
@@ -38,8 +41,10 @@ class LondonSimulator(PygameSimulator):
 
 
 class LondonRAMSimulator(LondonSimulator):
-    def __init__(self):
-        LondonSimulator.__init__(self, state_type='ram')
+    def __init__(self, headless=None, frame_ms=80, seed=None, pool_frames=1, skip_draw=True,
+                 share_state=False):
+        LondonSimulator.__init__(self, state_type='ram', headless=headless, frame_ms=frame_ms, seed=seed,
+                                 pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def _get_ram_state(self):
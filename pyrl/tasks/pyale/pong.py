@@ -1,14 +1,17 @@
 from pyrl.tasks.pyale import PygameSimulator
-from pyrl.config import floatX
+from pyrl.dtype import floatX
 from pygame.locals import *
 import numpy as np
 
 WINNING_SCORE = 1
 
 class PongSimulator(PygameSimulator):
-    def __init__(self):
+    def __init__(self, headless=None, frame_ms=30, seed=None, pool_frames=1, skip_draw=True,
+                 share_state=False):
+        # the game advances 30ms per frame whatever the clock says.
         PygameSimulator.__init__(self, 'pong', [K_DOWN, K_UP],
-                state_type='pixel')
+                state_type='pixel', headless=headless, frame_ms=frame_ms, seed=seed,
+                pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def is_end(self):
@@ -27,9 +30,11 @@ class PongSimulator(PygameSimulator):
 
 
 class PongRAMSimulator(PongSimulator):
-    def __init__(self):
+    def __init__(self, headless=None, frame_ms=30, seed=None, pool_frames=1, skip_draw=True,
+                 share_state=False):
         PygameSimulator.__init__(self, 'pong', [K_DOWN, K_UP],
-                state_type='ram')
+                state_type='ram', headless=headless, frame_ms=frame_ms, seed=seed,
+                pool_frames=pool_frames, skip_draw=skip_draw, share_state=share_state)
 
 
     def _get_ram_state(self):
@@ -40,5 +45,3 @@ class PongRAMSimulator(PongSimulator):
         circle_x = self._get_attr('circle_x') / 640.
         circle_y = self._get_attr('circle_y') / 480.
         return np.array([bar1_y, bar2_y, H1, H2, circle_x, circle_y], dtype=floatX)
-
-
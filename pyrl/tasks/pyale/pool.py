@@ -0,0 +1,203 @@
+# simulators in worker processes, with observations in shared memory.
+from pyrl.common import *
+from pyrl.dtype import floatX
+import multiprocessing
+import os
+import signal
+import tempfile
+import traceback
+
+
+def _shared_arrays(path, num_envs, state_shape):
+    '''
+    (states, rewards, dones) arrays over the shared file at path, which
+    holds them back to back.
+    '''
+    sizes = [num_envs * int(np.prod(state_shape)) * np.dtype(floatX).itemsize,
+             num_envs * np.dtype(floatX).itemsize,
+             num_envs]
+    data = np.memmap(path, dtype=np.uint8, mode='r+', shape=(sum(sizes),))
+    (states, rewards, dones) = np.split(data, np.cumsum(sizes)[:-1])
+    return (states.view(floatX).reshape((num_envs,) + tuple(state_shape)),
+            rewards.view(floatX),
+            dones.view(bool))
+
+
+def _worker(index, make_simulator, conn, auto_reset):
+    try:
+        # workers are forked with the random state of their parent, without a
+        # reseed unseeded simulators would all play the same game.
+        random.seed()
+        npr.seed()
+        simulator = make_simulator()
+        state = simulator.reset()
+        # SDL turns SIGTERM into a quit event, let terminate() stop the worker.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        conn.send(np.shape(state))
+        (path, num_envs) = conn.recv()
+        (states, rewards, dones) = _shared_arrays(path, num_envs, np.shape(state))
+        states[index] = state
+        rewards[index] = 0.
+        dones[index] = False
+        conn.send(None)
+        while True:
+            (command, arg) = conn.recv()
+            if command == 'step':
+                if dones[index] and not auto_reset:
+                    rewards[index] = 0.
+                    conn.send(None)
+                    continue
+                (rewards[index], states[index], dones[index]) = simulator.step(arg)
+                if dones[index] and auto_reset:
+                    states[index] = simulator.reset()
+            elif command == 'reset':
+                states[index] = simulator.reset()
+                dones[index] = False
+            elif command == 'close':
+                simulator.close()
+                conn.send(None)
+                return
+            conn.send(None)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        conn.send(traceback.format_exc())
+
+
+def _forked_worker(template, conn, index, make_simulator, auto_reset):
+    _worker(index, lambda: make_simulator(template), conn, auto_reset)
+
+
+def warm_simulators(simulator_classes, make_learner=None, **template):
+    '''
+    ForkServer prepare function. builds one simulator of each class and
+    resets it once, which initializes pygame, imports the game and loads
+    its assets. returns template with the simulators by class under
+    'simulators', and make_learner() under 'learner' if given, e.g. a
+    DeepQlearn whose theano functions are then compiled once, in the
+    template. other entries are passed through.
+    '''
+    template['simulators'] = {}
+    for simulator_class in simulator_classes:
+        simulator = simulator_class()
+        simulator.reset()
+        simulator.close()
+        template['simulators'][simulator_class] = simulator
+    if make_learner:
+        template['learner'] = make_learner()
+    return template
+
+
+class TemplateSimulator(object):
+    '''
+    make_simulator for a SimulatorPool on a ForkServer prepared by
+    warm_simulators: every worker takes over its copy of the warm
+    simulator.
+    '''
+    def __init__(self, simulator_class):
+        self.simulator_class = simulator_class
+
+    def __call__(self, template):
+        return template['simulators'][self.simulator_class]
+
+
+class SimulatorPool(object):
+    '''
+    runs num_envs simulators in worker processes, one per process, and
+    steps them in lockstep like BatchPygameSimulator.
+
+    make_simulator() builds the simulator in its worker (e.g. a
+    PygameSimulator subclass, in headless mode). it is called after the
+    fork, so it need not be picklable. actions go to the workers over
+    pipes. states, rewards and done flags come back through arrays in a
+    shared memory file that every process maps, so observations are
+    never pickled. games that end are reset if auto_reset.
+
+    with a pyrl.forkserver.ForkServer as server, workers are forked from
+    its template and make_simulator(template) builds the simulator, e.g.
+    returns one the template already warmed up. make_simulator must then
+    pickle (a module-level function).
+    '''
+    def __init__(self, make_simulator, num_envs, auto_reset=True, server=None):
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.conns = []
+        self.workers = []
+        self.pids = []
+        for i in xrange(num_envs):
+            if server:
+                (pid, conn) = server.fork(_forked_worker, i, make_simulator, auto_reset)
+                self.pids.append(pid)
+            else:
+                (conn, worker_conn) = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=_worker, args=(i, make_simulator, worker_conn, auto_reset))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+            self.conns.append(conn)
+
+        shapes = self._gather()
+        assert(len(set(shapes)) == 1)
+        self.state_shape = shapes[0]
+        # the workers map the file before it is unlinked, the mapping outlives it.
+        shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        with tempfile.NamedTemporaryFile(prefix='pyrl-pool-', dir=shm_dir) as f:
+            f.truncate(num_envs * (int(np.prod(self.state_shape)) + 1) * np.dtype(floatX).itemsize
+                       + num_envs)
+            f.flush()
+            (self.states, self.rewards, self.dones) = _shared_arrays(f.name, num_envs, self.state_shape)
+            for conn in self.conns:
+                conn.send((f.name, num_envs))
+            self._gather()
+
+
+    def _gather(self, conns=None):
+        '''
+        wait for the replies of workers, raise if one of them failed.
+        '''
+        replies = [conn.recv() for conn in (self.conns if conns is None else conns)]
+        for reply in replies:
+            if isinstance(reply, str):
+                raise RuntimeError('simulator worker failed:\n' + reply)
+        return replies
+
+
+    def reset(self, mask=None):
+        '''
+        start new episodes for all simulators, or those where mask is True.
+        '''
+        inds = xrange(self.num_envs) if mask is None else np.flatnonzero(mask)
+        conns = [self.conns[i] for i in inds]
+        for conn in conns:
+            conn.send(('reset', None))
+        self._gather(conns)
+
+
+    def step(self, actions):
+        '''
+        actions: action index of each simulator, ignored for ended ones.
+        return (rewards, dones), the states are in curr_state.
+        '''
+        for (conn, action) in zip(self.conns, actions):
+            conn.send(('step', int(action)))
+        self._gather()
+        return (self.rewards.copy(), self.dones.copy())
+
+
+    @property
+    def curr_state(self):
+        '''
+        (num_envs,) + state_shape array in shared memory, overwritten by
+        the next step or reset. copy it to keep it.
+        '''
+        return self.states
+
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(('close', None))
+        self._gather()
+        for worker in self.workers:
+            worker.join()
+        for conn in self.conns:
+            conn.close()
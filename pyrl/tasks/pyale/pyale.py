@@ -1,8 +1,11 @@
 from pyrl.common import *
 from pyrl.tasks.task import Task
+from pyrl.tasks.preprocess import Downsampler, FrameStack
+from pyrl.tasks.pyale.snapshot import ModuleSnapshot, game_modules
+from pyrl.tasks.pyale.coroutine import Coroutine
 from pyrl.utils import rgb2yuv, Timer
 from pyrl.prob import choice
-from pyrl.config import floatX
+from pyrl.dtype import floatX
 from scipy.misc import imresize
 from scipy.ndimage.filters import gaussian_filter
 import sys
@@ -25,9 +28,12 @@ from pygame.locals import *
 import pygame.key
 import pygame.surfarray
 import imp
+import importlib
+import __builtin__
 import os
 import re
-import inspect
+import time
+import weakref
 
 def function_intercept(intercepted_func, intercepting_func, pass_on=False):
     """
@@ -54,36 +60,410 @@ def function_intercept(intercepted_func, intercepting_func, pass_on=False):
     return wrap
 
 
+_asset_cache = {}
+_loaded_images = weakref.WeakSet() # copies handed out, games only blit them.
+
+def cache_assets(load, copy=False):
+    '''
+    memoize an asset loader on its arguments (a path plus options).
+    with copy, every call gets its own copy of the cached asset, for
+    Surfaces the game might draw on.
+    '''
+    def cached_load(*args):
+        if not args or not isinstance(args[0], basestring):
+            return load(*args) # file objects are not cached.
+        key = (load, args)
+        if key not in _asset_cache:
+            _asset_cache[key] = load(*args)
+        asset = _asset_cache[key]
+        if copy:
+            asset = asset.copy()
+            _loaded_images.add(asset)
+        return asset
+    return cached_load
+
+# games are re-run every episode, don't decode assets from disk each time.
+pygame.image.load = cache_assets(pygame.image.load, copy=True)
+pygame.font.Font = cache_assets(pygame.font.Font)
+try:
+    pygame.mixer.Sound = cache_assets(pygame.mixer.Sound)
+except (NotImplementedError, AttributeError): # pygame built without mixer.
+    pass
+
+
+class _NullSound(object):
+    ''' stand-in for pygame.mixer.Sound in headless mode. '''
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def get_length(self):
+        return 0.
+
+
+class _NullMusic(object):
+    ''' stand-in for pygame.mixer.music in headless mode. '''
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def get_busy(self):
+        return False
+
+
+class _NullFont(object):
+    '''
+    stand-in for pygame.font.Font in headless mode.
+
+    text renders to a transparent surface of roughly the right size,
+    so layout code keeps working but no glyphs are rasterized.
+    '''
+    def __init__(self, path=None, size=12, *args, **kwargs):
+        self.height = max(int(size), 1)
+
+    def size(self, text):
+        return (max(len(text) * self.height // 2, 1), self.height)
+
+    def render(self, text, antialias, color, background=None):
+        return pygame.Surface(self.size(text), SRCALPHA, 32)
+
+    def get_height(self):
+        return self.height
+
+    def get_linesize(self):
+        return self.height
+
+    def get_ascent(self):
+        return self.height
+
+    def get_descent(self):
+        return 0
+
+    def __getattr__(self, name):
+        # set_bold, set_italic, ...
+        return lambda *args, **kwargs: None
+
+
+_headless = {'enabled': False, 'screen': None, 'draw': True, 'skipped': []}
+
+
+def _skip_draw(draw_func, surface, args, kwargs):
+    '''
+    record a draw call onto the screen made while drawing is off, so that
+    replay_headless_draw can still draw the frame. rects and point lists
+    are copied, games move them around after drawing.
+    '''
+    args = [pygame.Rect(arg) if isinstance(arg, pygame.Rect)
+            else list(arg) if isinstance(arg, list) else arg for arg in args]
+    _headless['skipped'].append((draw_func, surface, args, kwargs))
+    return pygame.Rect(0, 0, 0, 0)
+
+
+class _HeadlessSurface(pygame.Surface):
+    '''
+    offscreen display surface whose blits and fills can be switched off
+    for frames nobody looks at (see set_headless_draw).
+    '''
+    def blit(self, *args, **kwargs):
+        if _headless['draw']:
+            return pygame.Surface.blit(self, *args, **kwargs)
+        return _skip_draw(pygame.Surface.blit, self, args, kwargs)
+
+    def fill(self, *args, **kwargs):
+        if _headless['draw']:
+            return pygame.Surface.fill(self, *args, **kwargs)
+        return _skip_draw(pygame.Surface.fill, self, args, kwargs)
+
+
+def _skip_screen_draw(draw_func):
+    def wrap(surface, *args, **kwargs):
+        if not _headless['draw'] and surface is _headless['screen']:
+            return _skip_draw(draw_func, surface, args, kwargs)
+        return draw_func(surface, *args, **kwargs)
+    return wrap
+
+
+def set_headless_draw(draw):
+    '''
+    whether drawing onto the headless screen takes effect, from the next
+    frame on. games keep updating their logic either way, only the pixels
+    go stale.
+    '''
+    _headless['draw'] = draw
+    del _headless['skipped'][:]
+
+
+def replay_headless_draw():
+    '''
+    draw the screen of the current frame after all, running the draw calls
+    skipped since the last set_headless_draw.
+    '''
+    skipped = _headless['skipped']
+    for (draw_func, surface, args, kwargs) in skipped:
+        draw_func(surface, *args, **kwargs)
+    del skipped[:]
+
+
+def _headless_init():
+    pygame.display.init()
+    return (1, 0)
+
+
+def _headless_set_mode(size=(0, 0), flags=0, depth=32):
+    # a 1x1 dummy display only fixes the pixel format for Surface.convert(),
+    # the game draws into an ordinary offscreen surface.
+    if _headless['real_get_surface']() is None:
+        _headless['real_set_mode']((1, 1), 0, 32)
+    screen = _headless['screen']
+    if screen is not None and screen.get_size() == tuple(size):
+        # like the real display surface, keep the object across set_mode
+        # calls: game modules that are not re-run still hold it.
+        screen.fill((0, 0, 0))
+    else:
+        _headless['screen'] = _HeadlessSurface(size, 0, 32)
+    return _headless['screen']
+
+
+def init_headless(mixer=True, font=True):
+    '''
+    run pygame games without a display or audio device.
+
+    uses the dummy SDL video driver, replaces the display with an offscreen
+    Surface (flip/update become no-ops) and optionally stubs out the mixer
+    and font subsystems. must be called before the game module initializes
+    pygame, e.g. before the first PygameSimulator.run.
+    '''
+    if _headless['enabled']:
+        return
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        raise RuntimeError('pygame display already initialized, cannot go headless.')
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    _headless['real_set_mode'] = pygame.display.set_mode
+    _headless['real_get_surface'] = pygame.display.get_surface
+    pygame.init = _headless_init
+    pygame.display.set_mode = _headless_set_mode
+    pygame.display.get_surface = lambda: _headless['screen']
+    pygame.display.flip = lambda *args, **kwargs: None
+    pygame.display.update = lambda *args, **kwargs: None
+    for name in ['rect', 'polygon', 'circle', 'ellipse', 'arc', 'line', 'lines', 'aaline', 'aalines']:
+        setattr(pygame.draw, name, _skip_screen_draw(getattr(pygame.draw, name)))
+
+    if mixer:
+        noop = lambda *args, **kwargs: None
+        pygame.mixer.pre_init = noop
+        pygame.mixer.init = noop
+        pygame.mixer.quit = noop
+        pygame.mixer.get_init = noop
+        pygame.mixer.Sound = _NullSound
+        pygame.mixer.music = _NullMusic()
+
+    if font:
+        pygame.font.init = lambda: None
+        pygame.font.Font = _NullFont
+        pygame.font.SysFont = lambda name, size, *args, **kwargs: _NullFont(None, size)
+        if hasattr(pygame.font, '_old_Font'):
+            # games that wrapped Font before going headless call through _old_Font.
+            pygame.font._old_Font = _NullFont
+
+    _headless['enabled'] = True
+
+
+# game modules loaded in this process, by module path. each holds the module,
+# its compiled code, the snapshot of its submodules right after they were
+# imported and the snapshot_env values they were imported with.
+_games = {}
+
+# live simulators by game name and copy index, see _game_module_path.
+_game_copies = {}
+
+# the simulator the intercepted pygame calls go to, and the installed intercepts.
+_intercepts = {'simulator': None}
+
+
+def _static_surfaces():
+    '''
+    Surfaces whose pixels are left out of game snapshots: loaded images,
+    and the screen, which the games redraw on every frame.
+    '''
+    return list(_loaded_images) + [pygame.display.get_surface()]
+
+
+def _game_module_path(name, simulator):
+    '''
+    module path of the game copy for a new simulator. every live simulator
+    of a game gets its own copy of the game modules (pong, pong_1, ...),
+    so episodes suspended in the middle never share state.
+    '''
+    copies = _game_copies.setdefault(name, weakref.WeakValueDictionary())
+    index = 0
+    while index in copies:
+        index += 1
+    copies[index] = simulator
+    return 'pyrl.tasks.pyale.games.' + (name if index == 0 else '%s_%d' % (name, index))
+
+
+_wall_time = time.time # the simulators' own timing, never game time.
+
+
+def _game_clock(real, fixed):
+    '''
+    wrap the clock function real: while a simulator with a fixed frame_ms
+    runs its game, calls go to fixed(simulator, *args) instead.
+    '''
+    def call(*args, **kwargs):
+        simulator = _intercepts['simulator']
+        if simulator is not None and simulator.in_game and simulator.frame_ms is not None:
+            return fixed(simulator, *args, **kwargs)
+        return real(*args, **kwargs)
+    return call
+
+
+class _FixedClock(object):
+    ''' pygame.time.Clock of a fixed-timestep game: every tick takes frame_ms, without waiting. '''
+    def __init__(self, frame_ms):
+        self.frame_ms = frame_ms
+
+    def tick(self, framerate=0):
+        return self.frame_ms
+
+    tick_busy_loop = tick
+
+    def get_time(self):
+        return self.frame_ms
+
+    get_rawtime = get_time
+
+    def get_fps(self):
+        return 1000. / self.frame_ms
+
+
+# clock functions games use, and their fixed-timestep replacements.
+_clocks = [(time, 'time', lambda simulator: simulator.game_ms / 1000.),
+           (pygame.time, 'get_ticks', lambda simulator: simulator.game_ms),
+           (pygame.time, 'wait', lambda simulator, ms: 0),
+           (pygame.time, 'delay', lambda simulator, ms: 0),
+           (pygame.time, 'Clock', lambda simulator: _FixedClock(simulator.frame_ms))]
+
+
+def _dispatch(handler):
+    def on_call(*args, **kwargs):
+        return getattr(_intercepts['simulator'], handler)(*args, **kwargs)
+    return on_call
+
+
+def _install_intercepts():
+    '''
+    route the pygame calls games make to the simulator whose episode runs.
+    every function is wrapped once, again only if it was replaced since
+    (init_headless replaces display.flip and update).
+    '''
+    for (module, name, handler) in [(pygame.display, 'flip', '_on_screen_update'),
+                                    (pygame.display, 'update', '_on_screen_update'),
+                                    (pygame.event, 'get', '_on_event_get'),
+                                    (sys, 'exit', '_on_exit')]: # TODO: exit doesn't work.
+        key = module.__name__ + '.' + name
+        if getattr(module, name) is not _intercepts.get(key):
+            _intercepts[key] = function_intercept(getattr(module, name), _dispatch(handler))
+            setattr(module, name, _intercepts[key])
+    for (module, name, fixed) in _clocks:
+        key = module.__name__ + '.' + name
+        if getattr(module, name) is not _intercepts.get(key):
+            _intercepts[key] = _game_clock(getattr(module, name), fixed)
+            setattr(module, name, _intercepts[key])
+
+
 class PygameSimulator(object):
-    def __init__(self, game_module_name, valid_events, state_type='pixel', frames_per_action=2, pass_event=True):
+    '''
+    runs a pygame game with a learner in the loop.
+
+    the game owns the main loop, every display flip is one frame and
+    every frames_per_action-th frame is a decision step that feeds the
+    observation stack. with pool_frames > 1 (pixel states only) the
+    screens of the last pool_frames frames up to a decision step are
+    max-pooled. in headless mode with skip_draw, frames whose pixels are
+    neither observed nor passed to a callback are not drawn at all. their
+    screen draw calls are recorded instead, and replayed when the episode
+    ends on such a frame, so observations are the same as when drawing.
+
+    the last num_frames observations live in a FrameStack. learners get a
+    copy of it, or with share_state the buffer view itself, which is only
+    valid until the next decision step.
+
+    the first episode imports the game package. later ones restore the
+    game's submodules from a ModuleSnapshot taken right after they were
+    imported and re-execute the game module's code, instead of
+    re-importing. if an environment variable in snapshot_env changed since
+    the snapshot, the game package is imported afresh.
+
+    run(learner) plays one episode with the game calling the learner.
+    alternatively reset() and step(action) drive the game from outside:
+    the game loop runs as a Coroutine that is suspended at every decision
+    step, so simulators can be paused and interleaved, see
+    BatchPygameSimulator. each simulator runs its own copy of the game
+    modules, only pygame itself is shared.
+
+    with frame_ms, game time is fixed-timestep: while the game runs,
+    time.time(), pygame.time.get_ticks() and pygame.time.Clock follow a
+    game clock that advances by frame_ms per frame, and pygame.time.wait
+    and delay return at once. games then run as fast as the cpu allows
+    and independently of load. with seed, episode k of the simulator
+    runs with the random and numpy.random states of seed + k, swapped in
+    only while its game runs, so episodes are reproducible however the
+    learner or other simulators use those generators meanwhile.
+    '''
+    # environment variables read while the game's submodules are imported.
+    snapshot_env = ()
+
+    def __init__(self, game_module_name, valid_events, state_type='pixel', frames_per_action=2, pass_event=True,
+                 headless=None, pool_frames=1, skip_draw=True, share_state=False, frame_ms=None, seed=None):
         self.game_module_name = game_module_name
         self.game_module = None # cached game module
-        self.game_code = None
+        self.game_module_path = _game_module_path(game_module_name, self)
+        self._real_import = None
+        self.coroutine = None # the episode started by reset().
+        self.ended = False
         self.valid_actions = range(len(valid_events))
         self.num_actions = len(self.valid_actions)
         self.valid_events = valid_events
         self.curr_screen_rgb = None
+        self.downsampler = None
         self.learner = None
         self.state_type = state_type
         self.frames_per_action = frames_per_action
         self.num_frames = 4
         self.pass_event = pass_event
+        assert(1 <= pool_frames <= frames_per_action)
+        assert(pool_frames == 1 or state_type == 'pixel')
+        self.pool_frames = pool_frames
+        self.skip_draw = skip_draw
+        self.share_state = share_state
+        self.frames = None # FrameStack, allocated on the first frame.
+        self.frame_ms = frame_ms
+        self.seed = seed
+        self.num_episodes = 0
+        self.in_game = False # whether the game code is running, see _enter_game.
+        self.game_ms = 0
+        self._random_state = None
+        if headless is None:
+            headless = bool(os.environ.get('PYALE_HEADLESS'))
+        self.headless = headless
+        if headless:
+            init_headless()
 
     def _get_attr(self, name):
-        if not self.game_module: # dynamically load library if not found.
-            game_frame = [frame for frame in inspect.stack()
-                          if frame[1].find('pyrl/tasks/pyale/games') != -1][-1][0]
-            self.game_module = inspect.getmodule(game_frame)
         return getattr(self.game_module, name)
 
 
     def _get_frame(self):
         if self.state_type == 'pixel':
-            from scipy.misc import imresize
             img = self.curr_screen_rgb
-            img = rgb2yuv(img)[:, :, 0] # get Y channel, according to Nature paper.
-            img = imresize(img, (84, 84), interp='bicubic')
-            return img / floatX(255.0)
+            if self.downsampler is None or self.downsampler.in_shape != img.shape[:2]:
+                # Y channel, according to Nature paper.
+                self.downsampler = Downsampler(img.shape[:2], (84, 84), normalize='minmax')
+            return self.downsampler(img) # scaled to [0, 1] by the frame stack.
         elif self.state_type == 'ram':
             return self._get_ram_state()
         elif self.state_type == '1hot':
@@ -96,11 +476,20 @@ class PygameSimulator(object):
         raise NotImplementedError()
 
 
+    def _push_frame(self, frame):
+        if self.frames is None or self.frames.frame_shape != np.shape(frame):
+            scale = floatX(1. / 255) if self.state_type == 'pixel' else None
+            self.frames = FrameStack(self.num_frames, np.shape(frame), scale=scale)
+        self.frames.push(frame)
+
+
     def _get_state(self):
-        if self.state_type == '1hot':
-            return np.concatenate(self.frames, axis=0)
-        else:
-            return np.array(self.frames)
+        state = self.frames.stack()
+        if self.state_type == '1hot': # concatenate channels of all frames.
+            state = state.reshape((-1,) + state.shape[2:])
+        if self.share_state:
+            return state
+        return state.copy()
 
 
     @property
@@ -113,11 +502,45 @@ class PygameSimulator(object):
         return (width, height)
 
 
+    def _is_captured(self, frame):
+        ''' whether the screen of (1-based) frame goes into an observation. '''
+        phase = (frame - 1) % self.frames_per_action
+        return phase == 0 or phase > self.frames_per_action - self.pool_frames
+
+
+    def _needs_pixels(self, frame):
+        if self.callback:
+            return True
+        return self.state_type == 'pixel' and self._is_captured(frame)
+
+
+    def _capture_screen(self):
+        screen_rgb = pygame.surfarray.array3d(pygame.display.get_surface())
+        if self.pooled_screen_rgb is not None:
+            np.maximum(screen_rgb, self.pooled_screen_rgb, out=screen_rgb)
+        return screen_rgb
+
+
     def _on_screen_update(self, _, *args, **kwargs):
+        if self.ended: # frames the game draws on its way out.
+            return
+        if self.startup_time is None:
+            self.startup_time = _wall_time() - self.run_start
+            self._stop_snapshot_import()
         self.total_frames += 1
+        if self.frame_ms is not None:
+            self.game_ms += self.frame_ms
         is_end = self.is_end()
+        if is_end and self.state_type == 'pixel':
+            # the episode can end on any frame, draw its observation.
+            replay_headless_draw()
+        if self.skip_draw:
+            set_headless_draw(self._needs_pixels(self.total_frames + 1))
 
         if not is_end and (self.total_frames-1) % self.frames_per_action > 0:
+            if self.state_type == 'pixel' and self._is_captured(self.total_frames):
+                self.pooled_screen_rgb = self._capture_screen()
+
             if self.callback: # TODO: callback on skip steps. now callback is only used for videos.
                 self.callback()
 
@@ -130,27 +553,33 @@ class PygameSimulator(object):
         self.curr_score = score
 
         if self.state_type == 'pixel':
-            self.curr_screen_rgb = pygame.surfarray.array3d(pygame.display.get_surface())
+            self.curr_screen_rgb = self._capture_screen()
+            self.pooled_screen_rgb = None
 
-        frame = self._get_frame()
-        self.frames.append(frame)
+        self._push_frame(self._get_frame())
 
-        if len(self.frames) < self.num_frames:
+        if len(self.frames) < self.num_frames and not is_end:
             action = choice(self.valid_actions, 1)[0]
         else:
-            if len(self.frames) > self.num_frames:
-                self.frames = self.frames[-4:]
-            curr_state = self._get_state()
-
             if self.callback:
                 self.callback()
 
-            if self.last_action != None:
-                self.learner.send_feedback(reward, curr_state, self.valid_actions, is_end)
+            if self.coroutine: # stepped from outside, see step().
+                action = self.coroutine.suspend((reward, is_end))
+            else:
+                curr_state = self._get_state()
+                self._leave_game()
+                try:
+                    if self.last_action != None:
+                        self.learner.send_feedback(reward, curr_state, self.valid_actions, is_end)
+                    if not is_end:
+                        action = self.learner.get_action(curr_state, self.valid_actions)
+                finally:
+                    self._enter_game()
             if is_end:
+                self.ended = True
                 return
-            
-            action = self.learner.get_action(curr_state, self.valid_actions)
+
             self.total_steps += 1
             self.last_action = action
 
@@ -194,16 +623,12 @@ class PygameSimulator(object):
         return result
 
 
-    def _on_time_clock(self, real_clock, *args, **kwargs):
-        pass
-
-
     def _on_exit(self):
         print 'exit event'
         pass
 
 
-    def run(self, learner, max_steps=None, callback=None):
+    def _new_episode(self, learner, callback):
         self.learner = learner
         self.callback = callback
         self._keys_pressed = []
@@ -213,40 +638,247 @@ class PygameSimulator(object):
         self.curr_score = 0
         self.total_frames = 0
         self.total_steps = 0
-        self.frames = []
-        #pygame.time.get_ticks = function_intercept(pygame.time.get_ticks, self.get_game_time_ms)
-        # run game using dynamic importing.
-        ## crude way of writing load.
-        #self.game_module = imp.new_module(self.game_module_name)
-        #
-        #if not self.game_code:
-        #    game_path = os.path.join(os.path.dirname(__file__),
-        #                            'games'
-        #                            self.game_module_name + '.py')
-        #    with open(game_path, 'r') as f:
-        #        self.game_code = compile(f.read(), game_path, 'exec')
-        #        print 'game code', self.game_code
-        #exec(self.game_code, self.game_module.__dict__)
+        self.ended = False
+        if self.frames is not None:
+            self.frames.reset()
+        self.pooled_screen_rgb = None
+        set_headless_draw(True)
+        self.game_ms = 0
+        if self.seed is not None:
+            episode_seed = self.seed + self.num_episodes
+            self._random_state = (random.Random(episode_seed).getstate(),
+                                  npr.RandomState(episode_seed).get_state())
+        self.num_episodes += 1
+        self.run_start = _wall_time()
+        self.startup_time = None # seconds until the game drew its first frame.
+
+
+    def _swap_random_state(self):
+        if self._random_state is not None:
+            state = (random.getstate(), npr.get_state())
+            random.setstate(self._random_state[0])
+            npr.set_state(self._random_state[1])
+            self._random_state = state
+
+
+    def _enter_game(self):
+        '''
+        switch to game time and the episode's random state, for running
+        game code. _leave_game switches back.
+        '''
+        self._swap_random_state()
+        self.in_game = True
+
+
+    def _leave_game(self):
+        self.in_game = False
+        self._swap_random_state()
 
 
+    def run(self, learner, max_steps=None, callback=None):
+        self.close()
+        self._new_episode(learner, callback)
         try:
             if self.game_module:
-                from pyrl.tasks.pyale.reload import reload
-                from pyrl.tasks.pyale.reload_exclude import reload_exclude
-                reload(self.game_module, exclude=reload_exclude)
+                self._play_in_game()
             else:
-                pygame.display.flip = function_intercept(pygame.display.flip, self._on_screen_update)
-                pygame.display.update = function_intercept(pygame.display.update, self._on_screen_update)
-                pygame.event.get = function_intercept(pygame.event.get, self._on_event_get)
-                pygame.time.Clock = function_intercept(pygame.time.Clock, self._on_time_clock)
-                sys.exit = function_intercept(sys.exit, self._on_exit) # TODO: this doesn't work.
                 with Timer('running game ' + self.game_module_name):
-                    exec('''import pyrl.tasks.pyale.games.%s as the_game''' % self.game_module_name)
-                self.game_module = the_game
+                    self._play_in_game()
         except Exception as e:
             print '[Exception]', e.message
             traceback.print_exc()
 
+        self.run_time = _wall_time() - self.run_start
+        set_headless_draw(True)
         return self.cum_reward
 
 
+    def _play_in_game(self):
+        self._enter_game()
+        try:
+            self._play()
+        finally:
+            self._leave_game()
+
+
+    def reset(self, callback=None):
+        '''
+        start a new episode and run it up to the first decision step.
+        return the current state.
+        '''
+        self.close()
+        self._new_episode(None, callback)
+        self.coroutine = Coroutine(self._play)
+        return self._resume(None)[1]
+
+
+    def step(self, action):
+        '''
+        take action at the current decision step and run the game up to the
+        next one. return (reward, next_state, is_end).
+        '''
+        assert(self.coroutine and not self.ended)
+        return self._resume(action)
+
+
+    @property
+    def curr_state(self):
+        return self._get_state()
+
+
+    def close(self):
+        ''' abandon the episode started by reset(), if any. '''
+        if self.coroutine:
+            self.coroutine.close()
+            self.coroutine = None
+        # let the simulator, and with it its game copy, be released.
+        if _intercepts['simulator'] is self:
+            _intercepts['simulator'] = None
+
+
+    def _resume(self, action):
+        _intercepts['simulator'] = self
+        if self.skip_draw:
+            set_headless_draw(self._needs_pixels(self.total_frames + 1))
+        self._enter_game()
+        try:
+            (reward, is_end) = self.coroutine.resume(action)
+        except StopIteration: # the game quit by itself.
+            (reward, is_end) = (0., True)
+        finally:
+            self._leave_game()
+        self.ended = is_end
+        if is_end:
+            self.run_time = _wall_time() - self.run_start
+        return (reward, self._get_state(), is_end)
+
+
+    def _play(self):
+        '''
+        run the game module for one episode: the game package is imported on
+        first use, later episodes restore it and re-execute its code.
+        '''
+        path = self.game_module_path
+        env = [os.environ.get(key) for key in self.snapshot_env]
+        game = _games.get(path)
+        if game and game['env'] != env:
+            for module in [game['module']] + game_modules(path + '.'):
+                del sys.modules[module.__name__]
+            game = None
+        if not game:
+            game = _games[path] = self._load_game()
+            game['env'] = env
+        _intercepts['simulator'] = self
+        self.game_module = game['module']
+        _install_intercepts()
+        try:
+            if game['snapshot'] is not None:
+                game['snapshot'].restore()
+            else:
+                self._start_snapshot_import(game)
+            exec game['code'] in self.game_module.__dict__
+        finally:
+            self._stop_snapshot_import()
+
+
+    def _load_game(self):
+        ''' create the (empty) game module and compile its code. '''
+        games = importlib.import_module('pyrl.tasks.pyale.games')
+        (f, pathname, (_, _, kind)) = imp.find_module(self.game_module_name, games.__path__)
+        if f:
+            f.close()
+        module = imp.new_module(self.game_module_path)
+        if kind == imp.PKG_DIRECTORY:
+            module.__path__ = [pathname]
+            pathname = os.path.join(pathname, '__init__.py')
+        module.__file__ = pathname
+        sys.modules[self.game_module_path] = module
+        setattr(games, self.game_module_path.split('.')[-1], module)
+        with open(pathname) as f:
+            code = compile(f.read(), pathname, 'exec')
+        return {'module': module, 'code': code, 'snapshot': None}
+
+
+    def _start_snapshot_import(self, game):
+        '''
+        every import statement the game module executes before its first
+        frame re-takes the snapshot of its submodules, so the last one sees
+        them fully imported.
+        '''
+        path = self.game_module_path
+        real_import = self._real_import = __builtin__.__import__
+
+        def snapshot_import(name, globals=None, locals=None, fromlist=None, level=-1):
+            module = real_import(name, globals, locals, fromlist, level)
+            if globals and globals.get('__name__') == path:
+                game['snapshot'] = ModuleSnapshot(game_modules(path + '.'), skip=_static_surfaces())
+            return module
+
+        __builtin__.__import__ = snapshot_import
+
+
+    def _stop_snapshot_import(self):
+        if self._real_import:
+            __builtin__.__import__ = self._real_import
+            self._real_import = None
+
+
+    @property
+    def frame_time(self):
+        ''' average wall-clock seconds per frame of the last run, excluding startup. '''
+        if not self.total_frames:
+            return None
+        return (self.run_time - self.startup_time) / self.total_frames
+
+
+
+
+class BatchPygameSimulator(object):
+    '''
+    steps several PygameSimulators in lockstep through their reset/step
+    API, so that the actions of all of them can come from one batched
+    forward pass. games that end are reset if auto_reset.
+
+    simulators are switched between with a thread handoff, the
+    simulators of the same game do not interfere (see PygameSimulator).
+    '''
+    def __init__(self, simulators, auto_reset=True):
+        self.simulators = list(simulators)
+        self.num_envs = len(self.simulators)
+        self.auto_reset = auto_reset
+        self.states = [None] * self.num_envs
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+
+
+    def reset(self, mask=None):
+        '''
+        start new episodes for all simulators, or those where mask is True.
+        '''
+        for i in (xrange(self.num_envs) if mask is None else np.flatnonzero(mask)):
+            self.states[i] = self.simulators[i].reset()
+            self.dones[i] = False
+
+
+    def is_end(self):
+        return self.dones.copy()
+
+
+    def step(self, actions):
+        '''
+        actions: action index of each simulator, ignored for ended ones.
+        return (rewards, dones).
+        '''
+        rewards = np.zeros(self.num_envs, dtype=floatX)
+        for (i, simulator) in enumerate(self.simulators):
+            if self.dones[i]:
+                continue
+            (rewards[i], self.states[i], self.dones[i]) = simulator.step(actions[i])
+        dones = self.dones.copy()
+        if self.auto_reset and dones.any():
+            self.reset(dones)
+        return (rewards, dones)
+
+
+    @property
+    def curr_state(self):
+        return np.array(self.states)
@@ -0,0 +1,133 @@
+# in-place snapshot and restore of module-level game state.
+import collections
+import sys
+import types
+
+import numpy as np
+import pygame
+
+# never walked into: behaviour, not state.
+_OPAQUE = (types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+           staticmethod, classmethod, property, type(len.__call__))
+
+
+def game_modules(prefix):
+    ''' loaded modules whose name starts with prefix. '''
+    names = sorted(name for (name, module) in sys.modules.items()
+                   if module is not None and name.startswith(prefix))
+    return [sys.modules[name] for name in names]
+
+
+class ModuleSnapshot(object):
+    '''
+    records the mutable state reachable from some modules so it can be
+    written back *in place* later. objects keep their identity, so every
+    alias to them (from lib.enemi import enemi, closures, sprite groups)
+    sees the restored state and nothing needs to be re-imported.
+
+    walked: module dicts, classes defined in those modules, lists, dicts,
+    sets, deques, numpy arrays, pygame Rects and Surfaces (pixels) and
+    anything with a __dict__. functions, other C objects and foreign
+    modules or classes are treated as opaque, and so are the objects in
+    skip, e.g. Surfaces known to be read-only or redrawn every frame.
+    objects created after the snapshot are simply dropped from the
+    containers that hold them.
+    '''
+    def __init__(self, modules, skip=()):
+        self.prefixes = tuple(module.__name__ for module in modules)
+        self.records = []
+        seen = set(id(obj) for obj in skip)
+        stack = list(modules)
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            stack.extend(self._record(obj))
+
+
+    def _is_ours(self, obj):
+        return getattr(obj, '__module__', None) in self.prefixes
+
+
+    def _record(self, obj):
+        ''' record the state of obj and return the objects it refers to. '''
+        if isinstance(obj, types.ModuleType):
+            if obj.__name__ not in self.prefixes:
+                return []
+            state = dict((k, v) for (k, v) in obj.__dict__.items() if not k.startswith('__'))
+            self.records.append((obj, 'module', state))
+            return state.values()
+        if isinstance(obj, (type, types.ClassType)):
+            if not self._is_ours(obj):
+                return []
+            state = dict((k, v) for (k, v) in vars(obj).items()
+                         if not k.startswith('__') and not isinstance(v, _OPAQUE))
+            self.records.append((obj, 'class', state))
+            return state.values()
+        if obj is None or isinstance(obj, (basestring, int, long, float, bool, complex) + _OPAQUE):
+            return []
+        if isinstance(obj, tuple):
+            return list(obj)
+        if isinstance(obj, np.ndarray):
+            self.records.append((obj, 'array', obj.copy()))
+            return []
+
+        refs = []
+        if isinstance(obj, list):
+            self.records.append((obj, 'list', list(obj)))
+            refs.extend(obj)
+        elif isinstance(obj, collections.deque):
+            self.records.append((obj, 'deque', list(obj)))
+            refs.extend(obj)
+        elif isinstance(obj, dict):
+            self.records.append((obj, 'dict', dict(obj)))
+            refs.extend(obj.keys())
+            refs.extend(obj.values())
+        elif isinstance(obj, (set, frozenset)):
+            if isinstance(obj, set):
+                self.records.append((obj, 'set', set(obj)))
+            refs.extend(obj)
+        elif isinstance(obj, pygame.Rect):
+            self.records.append((obj, 'rect', tuple(obj)))
+        elif isinstance(obj, pygame.Surface) and obj.get_bytesize() != 3:
+            # 24 bit surfaces have no 2d pixel view, games only load and blit those.
+            # the transposed pixel view is in memory order, copying it is a memcpy.
+            self.records.append((obj, 'surface', pygame.surfarray.pixels2d(obj).T.copy()))
+
+        state = getattr(obj, '__dict__', None)
+        if isinstance(state, dict):
+            state = dict(state)
+            self.records.append((obj, 'attrs', state))
+            refs.extend(state.values())
+        return refs
+
+
+    def restore(self):
+        for (obj, kind, state) in self.records:
+            if kind == 'module':
+                obj.__dict__.update(state)
+            elif kind == 'class':
+                for (name, value) in state.items():
+                    setattr(obj, name, value)
+            elif kind == 'attrs':
+                obj.__dict__.clear()
+                obj.__dict__.update(state)
+            elif kind == 'list':
+                obj[:] = state
+            elif kind in ('dict', 'set'):
+                obj.clear()
+                obj.update(state)
+            elif kind == 'deque':
+                obj.clear()
+                obj.extend(state)
+            elif kind == 'array':
+                obj[...] = state
+            elif kind == 'rect':
+                (obj.x, obj.y, obj.w, obj.h) = state
+            elif kind == 'surface':
+                pygame.surfarray.pixels2d(obj).T[...] = state
+
+
+    def __len__(self):
+        return len(self.records)
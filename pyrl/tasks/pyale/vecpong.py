@@ -0,0 +1,320 @@
+# pong dynamics of games/pong.py in numpy, for many games at once.
+from pyrl.common import *
+from pyrl.dtype import floatX
+from pyrl.tasks.preprocess import LUMA_WEIGHTS, sample_indices
+
+(WIDTH, HEIGHT) = (640, 480)
+W = 20 # paddle width.
+C = 15 # ball size.
+(BAR1_X, BAR2_X) = (2 * W, WIDTH - 3 * W)
+TIME_SEC = 30 / 1000.0 # games/pong.py runs at a fixed 30ms per frame.
+BASE_SPEED = 250.
+MOVE = BASE_SPEED * TIME_SEC # paddle move per frame, for both players.
+
+BACKGROUND_COLOR = (144, 72, 17)
+BAR1_COLOR = (101, 213, 77)
+BAR2_COLOR = (213, 130, 74)
+CIRCLE_COLOR = (255, 255, 255)
+
+# rows of VectorPong.game, one column per game.
+GAME_VARS = ('bar1_y', 'bar2_y', 'circle_x', 'circle_y', 'speed_x', 'speed_y', 'bar1_move',
+             'ai_direction', 'bar1_score', 'bar2_score', 'H1', 'H2', 'VH1', 'VH2')
+
+
+def _luma(color):
+    return sum(w * c for (w, c) in zip(LUMA_WEIGHTS, color))
+
+
+def _coverage(samples, lo, size):
+    '''
+    number of samples (cells, taps) inside [lo, lo + size) of each game.
+    '''
+    (lo, hi) = (lo[:, np.newaxis, np.newaxis], (lo + size)[:, np.newaxis, np.newaxis])
+    return ((samples >= lo) & (samples < hi)).sum(axis=-1)
+
+
+class VectorPong(object):
+    '''
+    num_envs games of pong stepped in lockstep, with the dynamics of
+    games/pong.py and the observations of PongRAMSimulator
+    (state_type='ram') or PongSimulator (state_type='pixel'). the
+    interface follows BatchPygameSimulator: reset(mask), step(actions)
+    -> (rewards, dones), curr_state. action 0 moves the paddle down,
+    1 up.
+
+    H1, H2 are the paddle sizes of the player and the computer, VH1, VH2
+    the drawn ones (default to H1, H2). each is a scalar or one value per
+    game, and self.game rows of the same names can be changed between
+    episodes, e.g. for a curriculum over paddle sizes.
+
+    a game is frame-for-frame the pygame one, including its draws from
+    the random generator: with num_envs=1, VectorPong(seed=s) plays
+    exactly like PongRAMSimulator after np.random.seed(s). pixel frames
+    are rasterized straight to the 84 x 84 sample grid of the
+    Downsampler (axes x, y like pygame.surfarray) and match the frames
+    of PongSimulator. the terminal frame is always drawn, PongSimulator
+    with skip_draw may show the frame before it.
+    '''
+    def __init__(self, num_envs, H1=50, H2=50, VH1=None, VH2=None, state_type='ram',
+                 frames_per_action=2, num_frames=4, winning_score=1, auto_reset=True, seed=None):
+        assert(state_type in ('ram', 'pixel'))
+        self.num_envs = num_envs
+        self.state_type = state_type
+        self.frames_per_action = frames_per_action
+        self.num_frames = num_frames
+        self.winning_score = winning_score
+        self.auto_reset = auto_reset
+        self.valid_actions = range(2)
+        self.num_actions = 2
+        self.rng = npr.RandomState(seed)
+        self.game = np.zeros((len(GAME_VARS), num_envs))
+        for (name, value) in [('H1', H1), ('H2', H2),
+                              ('VH1', H1 if VH1 is None else VH1), ('VH2', H2 if VH2 is None else VH2)]:
+            self.game[GAME_VARS.index(name)] = value
+        if state_type == 'pixel':
+            self.frame_shape = (84, 84)
+            self.taps = 2 # as in the Downsampler of PygameSimulator.
+            self._xs = sample_indices(WIDTH, 84, self.taps).reshape(84, self.taps)
+            self._ys = sample_indices(HEIGHT, 84, self.taps).reshape(84, self.taps)
+            bg = _luma(BACKGROUND_COLOR)
+            # luma over background of bar1, bar2, circle, and circle over each bar.
+            self._deltas = np.array([_luma(BAR1_COLOR) - bg, _luma(BAR2_COLOR) - bg, _luma(CIRCLE_COLOR) - bg,
+                                     bg - _luma(BAR1_COLOR), bg - _luma(BAR2_COLOR)], dtype=floatX)
+            self._background = bg * self.taps ** 2
+        else:
+            self.frame_shape = (6,)
+        # frame stacks, each frame written twice like in the FrameStack.
+        self._buf = np.zeros((num_envs, 2 * num_frames) + self.frame_shape, dtype=floatX)
+        self._pos = num_frames - 1
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+
+    def _new_games(self, game):
+        (bar1_y, bar2_y, circle_x, circle_y, speed_x, speed_y, bar1_move,
+         ai_direction, bar1_score, bar2_score) = game[:10]
+        n = game.shape[1]
+        bar1_y[:] = bar2_y[:] = 215.
+        circle_x[:] = 320.5
+        circle_y[:] = (640 - 60) * self.rng.rand(n) + 30
+        speed_x[:] = BASE_SPEED
+        speed_y[:] = np.sign(self.rng.randn(n)) * BASE_SPEED
+        bar1_move[:] = 0.
+        ai_direction[:] = 1.
+        bar1_score[:] = bar2_score[:] = 0
+
+
+    def _frame(self, game):
+        '''
+        one pass of the game loop over all games in game. return which
+        games the player scored in.
+        '''
+        (bar1_y, bar2_y, circle_x, circle_y, speed_x, speed_y, bar1_move,
+         ai_direction, bar1_score, bar2_score, H1, H2) = game[:12]
+        rng = self.rng
+        bar1_y += bar1_move
+        circle_x += speed_x * TIME_SEC
+        circle_y += speed_y * TIME_SEC
+
+        # the computer follows the ball in its half.
+        ai = circle_x >= 320 - C / 2.
+        # its random moves and noise are switched off, but still drawn.
+        num_ai = np.count_nonzero(ai)
+        if num_ai:
+            rng.rand(num_ai)
+            rng.randn(num_ai)
+        center = bar2_y + H2 / 2.
+        target = circle_y + C / 2.
+        ai_direction[ai & (center < target)] = 1.
+        ai_direction[ai & (center > target)] = -1.
+        bar2_y += ai * ai_direction * MOVE
+
+        bar1_y[:] = np.where(bar1_y >= 480. - H1, 480. - H1, np.maximum(bar1_y, 10.))
+        bar2_y[:] = np.where(bar2_y >= 480. - H2, 480. - H2, np.maximum(bar2_y, 10.))
+
+        hit = np.flatnonzero((circle_x <= BAR1_X + W) & (circle_x >= BAR1_X + W - C)
+                             & (circle_y >= bar1_y - C / 2.) & (circle_y <= bar1_y + H1 - C / 2.))
+        if len(hit):
+            circle_x[hit] = BAR1_X + W
+            speed_x[hit] = BASE_SPEED + rng.randn(len(hit)) * 3
+            speed_y[hit] += np.abs(rng.randn(len(hit))) * 3 * np.sign(bar1_move[hit])
+        hit = np.flatnonzero((circle_x >= BAR2_X - C) & (circle_x <= BAR2_X)
+                             & (circle_y >= bar2_y - C / 2.) & (circle_y <= bar2_y + H2 - C / 2.))
+        if len(hit):
+            circle_x[hit] = BAR2_X - C
+            speed_x[hit] = -BASE_SPEED + rng.randn(len(hit)) * 3
+            speed_y[hit] += np.abs(rng.randn(len(hit))) * 3 * np.sign(ai_direction[hit])
+
+        won = circle_x > 620.
+        lost = circle_x < 5.
+        bar1_score += won
+        bar2_score += lost
+        scored = np.flatnonzero(won | lost)
+        if len(scored):
+            circle_x[scored] = 307.5
+            circle_y[scored] = (640 - 60) * rng.rand(len(scored)) + 30
+            speed_y[scored] = BASE_SPEED * np.sign(rng.randn(len(scored)))
+            speed_x[scored] = BASE_SPEED
+            bar1_y[scored] = bar2_y[scored] = 215.
+
+        top = circle_y <= 10.
+        bottom = ~top & (circle_y >= 457.5)
+        speed_y[top | bottom] *= -1
+        circle_y[top] = 10.
+        circle_y[bottom] = 457.5
+        return won
+
+
+    def _run(self, game, num_frames, alive):
+        '''
+        run num_frames frames of the alive games in game, stopping each
+        at its end. return (rewards, ended, positions), where positions
+        are the bar1_y, bar2_y, circle_x, circle_y rows observed at the
+        last frame of each game: after that frame for ram states, as
+        drawn before it for pixels.
+        '''
+        rewards = np.zeros(game.shape[1])
+        ended = np.zeros(game.shape[1], dtype=bool)
+        positions = game[:4].copy()
+        observed = positions
+        for i in xrange(num_frames):
+            if not alive.any():
+                break
+            drawn = game[:4].copy() if self.state_type == 'pixel' else None
+            won = self._frame(game)
+            rewards += won & alive
+            now_ended = alive & ((game[8] >= self.winning_score) | (game[9] >= self.winning_score))
+            observed = game[:4] if drawn is None else drawn
+            positions[:, now_ended] = observed[:, now_ended]
+            ended |= now_ended
+            alive = alive & ~now_ended
+        positions[:, alive] = observed[:, alive]
+        return (rewards, ended, positions)
+
+
+    def _observe(self, game, positions):
+        '''
+        observation frames of the games, as floats in the frame stack.
+        '''
+        (bar1_y, bar2_y, circle_x, circle_y) = positions
+        if self.state_type == 'ram':
+            (H1, H2) = game[10:12]
+            return np.array([bar1_y / 480., bar2_y / 480., H1 / 480., H2 / 480.,
+                             circle_x / 640., circle_y / 480.], dtype=floatX).T
+        # scaled to [0, 1] like PygameSimulator pixel frames in its FrameStack.
+        return np.multiply(self._rasterize(game, positions), floatX(1. / 255), dtype=floatX)
+
+
+    def _rasterize(self, game, positions):
+        '''
+        84 x 84 luma frames of the games, stretched to 0..255 like the
+        Downsampler with normalize='minmax', as uint8.
+        '''
+        (bar1_y, bar2_y, circle_x, circle_y) = positions.astype(int) # pygame truncates blit positions.
+        (VH1, VH2) = game[12:14]
+        n = len(bar1_y)
+        (xs, ys) = (self._xs, self._ys)
+        bars = [(np.full(n, BAR1_X), bar1_y, VH1), (np.full(n, BAR2_X), bar2_y, VH2)]
+        (cx, cy) = ([], [])
+        for (x, y, w, h) in [(x, y, W, h) for (x, y, h) in bars] + [(circle_x, circle_y, C, C)]:
+            cx.append(_coverage(xs, x, w))
+            cy.append(_coverage(ys, y, h))
+        # the circle is drawn over the bars: count their overlap once, as circle.
+        for (x, y, h) in bars:
+            (x0, y0) = (np.maximum(x, circle_x), np.maximum(y, circle_y))
+            cx.append(_coverage(xs, x0, np.minimum(x + W, circle_x + C) - x0))
+            cy.append(_coverage(ys, y0, np.minimum(y + h, circle_y + C) - y0))
+        # integer luma sums over the taps, exact in floatX.
+        cx = np.array(cx, dtype=floatX) * self._deltas[:, np.newaxis, np.newaxis]
+        small = np.matmul(cx.transpose(1, 2, 0), np.array(cy, dtype=floatX).transpose(1, 0, 2))
+        small += self._background
+        small *= floatX(1. / (256 * self.taps ** 2))
+        lo = small.min(axis=(1, 2))
+        scale = small.max(axis=(1, 2)) - lo
+        scale[scale > 0] = floatX(255.) / scale[scale > 0]
+        scale[scale == 0] = 1.
+        small -= lo[:, np.newaxis, np.newaxis]
+        small *= scale[:, np.newaxis, np.newaxis]
+        small += floatX(0.5)
+        np.clip(small, 0, 255, out=small)
+        return small.astype(np.uint8)
+
+
+    def _set_stacks(self, index, stacks):
+        '''
+        lay stacks (oldest frame first) out in the ring buffer of envs index,
+        so that curr_state shows them.
+        '''
+        ring = np.roll(stacks, self._pos + 1, axis=1)
+        self._buf[index, :self.num_frames] = ring
+        self._buf[index, self.num_frames:] = ring
+
+
+    def _push(self, frames, index):
+        '''
+        push frames onto the stacks of envs index (a slice or a bool mask),
+        the stacks of the other envs are kept as they are.
+        '''
+        kept = None
+        if isinstance(index, np.ndarray) and not index.all():
+            kept = (~index, self.curr_state[~index])
+        self._pos = (self._pos + 1) % self.num_frames
+        self._buf[index, self._pos] = frames
+        self._buf[index, self._pos + self.num_frames] = frames
+        if kept is not None:
+            self._set_stacks(*kept)
+
+
+    def reset(self, mask=None):
+        '''
+        start new games for all envs, or those where mask is True, and
+        play random actions until the frame stack is full.
+        '''
+        idx = np.arange(self.num_envs) if mask is None else np.flatnonzero(mask)
+        game = self.game[:, idx]
+        stacks = np.zeros((len(idx), self.num_frames) + self.frame_shape, dtype=floatX)
+        self._new_games(game)
+        alive = np.ones(len(idx), dtype=bool)
+        num_frames = 1
+        for i in xrange(self.num_frames):
+            if i > 0:
+                actions = self.rng.randint(0, 2, size=alive.sum())
+                game[6, alive] = np.where(actions == 0, MOVE, -MOVE)
+            (_, ended, positions) = self._run(game, num_frames, alive.copy())
+            stacks[alive, :-1] = stacks[alive, 1:]
+            stacks[alive, -1] = self._observe(game[:, alive], positions[:, alive])
+            alive &= ~ended
+            num_frames = self.frames_per_action
+        self.game[:, idx] = game
+        self._set_stacks(idx, stacks)
+        self.dones[idx] = ~alive
+
+
+    def is_end(self):
+        return self.dones.copy()
+
+
+    def step(self, actions):
+        '''
+        actions: action index of each game, ignored for ended ones.
+        return (rewards, dones).
+        '''
+        alive = ~self.dones
+        self.game[6] = np.where(np.asarray(actions) == 0, MOVE, -MOVE)
+        (rewards, ended, positions) = self._run(self.game, self.frames_per_action, alive.copy())
+        index = slice(None) if alive.all() else alive
+        self._push(self._observe(self.game[:, index], positions[:, index]), index)
+        self.dones |= ended
+        dones = self.dones.copy()
+        if self.auto_reset and dones.any():
+            self.reset(dones)
+        return (rewards.astype(floatX), dones)
+
+
+    @property
+    def curr_state(self):
+        '''
+        (num_envs, num_frames) + frame_shape view of the frame stacks,
+        overwritten by the next step or reset. copy it to keep it.
+        '''
+        start = self._pos + 1
+        return self._buf[:, start:start + self.num_frames]
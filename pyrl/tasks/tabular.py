@@ -0,0 +1,254 @@
+# exact tabular transition models of discrete tasks, as sparse matrices.
+from pyrl.common import *
+from pyrl.dtype import floatX
+from pyrl.tasks.task import DiscreteMDP, MDPTask
+from pyrl.utils import LRUCache
+import scipy.sparse as sp
+import hashlib
+import types
+
+# models shared by all tasks with the same fingerprint, the most recent ones.
+_model_cache = LRUCache(16)
+
+# attributes that change within an episode without changing the dynamics.
+_EPISODE_FIELDS = set(['curr_state', 'hit_wall', 'last_action', 'last_state',
+                       'num_steps', 'cum_reward', '_state_snapshot', '_breakpoint'])
+
+
+class TabularModel(object):
+    '''
+    transition model of a discrete task over num_states states.
+
+    states: the state of each row, as a state id or a state_key.
+    index: dict from state to row.
+    P: per action, a (num_states, num_states) CSR matrix with
+       P[a][s, s'] the probability of moving from s to s' under a.
+    R: (num_actions, num_states) expected reward of taking a in s.
+    allowed: (num_actions, num_states) mask of the actions allowed in s.
+             states without allowed actions are terminal, their value is 0.
+    '''
+    def __init__(self, states, P, R, allowed):
+        self.states = states
+        self.index = {state: i for (i, state) in enumerate(states)}
+        self.P = P
+        self.R = R
+        self.allowed = allowed
+        (self.num_actions, self.num_states) = R.shape
+
+
+    def backup(self, V, gamma):
+        '''
+        (num_actions, num_states) Q values R + gamma P V.
+        '''
+        Q = np.array(self.R)
+        for (a, P) in enumerate(self.P):
+            Q[a] += gamma * P.dot(V)
+        return Q
+
+
+    def value_iteration(self, gamma, tol=1e-4, V=None):
+        '''
+        optimal values, iterating Bellman backups from V (default 0) until
+        no value changes by tol or more.
+        '''
+        V = np.zeros(self.num_states, dtype=floatX) if V is None else np.array(V, dtype=floatX)
+        live = self.allowed.any(axis=0)
+        while True:
+            Q = self.backup(V, gamma)
+            Q[~self.allowed] = -np.inf
+            new_V = np.where(live, Q.max(axis=0), 0.).astype(floatX)
+            diff = np.abs(new_V - V).max() if self.num_states else 0.
+            V = new_V
+            if diff < tol:
+                return V
+
+
+    def evaluate(self, pi, gamma, tol=1e-4, V=None):
+        '''
+        values of the policy pi, a (num_states, num_actions) matrix of action
+        probabilities, iterated from V (default 0) until no value changes by
+        tol or more. the policy is followed in every state, allowed or not.
+        '''
+        pi = np.asarray(pi, dtype=floatX)
+        reward = (pi.T * self.R).sum(axis=0)
+        P_pi = sum(sp.diags(pi[:, a]).dot(P) for (a, P) in enumerate(self.P)).tocsr()
+        V = np.zeros(self.num_states, dtype=floatX) if V is None else np.array(V, dtype=floatX)
+        while True:
+            new_V = (reward + gamma * P_pi.dot(V)).astype(floatX)
+            diff = np.abs(new_V - V).max() if self.num_states else 0.
+            V = new_V
+            if diff < tol:
+                return V
+
+
+class _Builder(object):
+    ''' collects transitions (s, a, s', p, r) into a TabularModel. '''
+    def __init__(self, num_actions):
+        self.num_actions = num_actions
+        self.states = []
+        self.index = {}
+        self.entries = [([], [], []) for a in xrange(num_actions)]
+        self.rewards = [[] for a in xrange(num_actions)]
+        self.allowed = [[] for a in xrange(num_actions)]
+
+
+    def add_state(self, state):
+        if state not in self.index:
+            self.index[state] = len(self.states)
+            self.states.append(state)
+        return self.index[state]
+
+
+    def add(self, s, a, ns, prob, reward):
+        (rows, cols, vals) = self.entries[a]
+        rows.append(s)
+        cols.append(ns)
+        vals.append(prob)
+        self.rewards[a].append((s, prob * reward))
+
+
+    def allow(self, s, a):
+        self.allowed[a].append(s)
+
+
+    def build(self):
+        n = len(self.states)
+        P = [sp.csr_matrix((vals, (rows, cols)), shape=(n, n), dtype=floatX)
+             for (rows, cols, vals) in self.entries]
+        R = np.zeros((self.num_actions, n), dtype=floatX)
+        allowed = np.zeros((self.num_actions, n), dtype=bool)
+        for a in xrange(self.num_actions):
+            if self.rewards[a]:
+                (s, r) = zip(*self.rewards[a])
+                np.add.at(R[a], list(s), r)
+            allowed[a, self.allowed[a]] = True
+        return TabularModel(self.states, P, R, allowed)
+
+
+def _valid_states(task):
+    if hasattr(task, 'get_valid_states'):
+        return task.get_valid_states()
+    return task.env.get_valid_states()
+
+
+def _build_distribution_model(task):
+    '''
+    model of a task exposing next_state_distribution and get_reward over
+    integer state ids, such as the pyrl.gridworld tasks.
+    '''
+    builder = _Builder(task.get_num_actions())
+    for state in xrange(task.get_num_states()):
+        builder.add_state(state)
+    for state in _valid_states(task):
+        for action in task.get_allowed_actions(state):
+            builder.allow(state, action)
+        for action in xrange(builder.num_actions):
+            for (ns, prob) in task.next_state_distribution(state, action):
+                builder.add(state, action, ns, prob, task.get_reward(state, action, ns))
+    return builder.build()
+
+
+def _build_explored_model(task):
+    '''
+    model of the states reachable from the current state of a Task, found
+    by stepping copies of it through every outcome of step_outcomes.
+    '''
+    builder = _Builder(task.num_actions)
+    frontier = [task.copy()]
+    builder.add_state(task.state_key)
+    while frontier:
+        task = frontier.pop()
+        s = builder.index[task.state_key]
+        if task.is_end():
+            continue
+        for action in task.valid_actions:
+            builder.allow(s, action)
+            for (prob, choice) in task.step_outcomes(action):
+                next_task = task.copy()
+                reward = next_task.step(action, **choice)
+                key = next_task.state_key
+                if key not in builder.index:
+                    frontier.append(next_task)
+                builder.add(s, action, builder.add_state(key), prob, reward)
+    return builder.build()
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _digest(h, value, seen):
+    if isinstance(value, np.ndarray):
+        h.update(repr((value.shape, value.dtype.str)))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update('{')
+        for key in sorted(value, key=repr):
+            _digest(h, key, seen)
+            _digest(h, value[key], seen)
+        h.update('}')
+    elif isinstance(value, (list, tuple)):
+        h.update('[')
+        for item in value:
+            _digest(h, item, seen)
+        h.update(']')
+    elif isinstance(value, (type, types.ClassType, types.ModuleType)):
+        h.update(getattr(value, '__module__', '') + '.' + value.__name__)
+    elif callable(value):
+        # the code of functions and callable objects is not digested.
+        raise _Unhashable(value)
+    elif hasattr(value, '__dict__'):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        h.update(value.__class__.__name__ + '(')
+        for name in sorted(vars(value)):
+            if name not in _EPISODE_FIELDS:
+                h.update(name)
+                _digest(h, vars(value)[name], seen)
+        h.update(')')
+    else:
+        h.update(repr(value))
+
+
+def task_fingerprint(task):
+    '''
+    digest of everything that determines the tabular model of task: its
+    class, attributes and those of the objects it holds, except for the
+    episode state of tasks modeled over all their states. None if task
+    holds functions or callable objects, whose effect cannot be digested.
+    '''
+    h = hashlib.sha1()
+    try:
+        _digest(h, task, set())
+    except _Unhashable:
+        return None
+    if hasattr(task, 'state_key'):
+        h.update(repr(task.state_key))
+    return h.hexdigest()
+
+
+def tabular_model(task):
+    '''
+    the TabularModel of task, built once per task fingerprint. the models
+    of the last 16 fingerprints are kept, tasks without a fingerprint are
+    modeled on every call.
+
+    tasks with next_state_distribution (pyrl.gridworld) are modeled over
+    all their state ids. a DiscreteMDP is modeled over the states reachable
+    from its start state, and a Task with state_key and step_outcomes
+    (GridWorld, Playroom, CliffWalk, UnlockRoom) over those reachable from
+    its current state, keyed by state_key.
+    '''
+    if isinstance(task, DiscreteMDP):
+        task = MDPTask(task)
+    key = task_fingerprint(task)
+    model = _model_cache.get(key) if key is not None else None
+    if model is None:
+        if hasattr(task, 'next_state_distribution'):
+            model = _build_distribution_model(task)
+        else:
+            model = _build_explored_model(task)
+        if key is not None:
+            _model_cache[key] = model
+    return model
@@ -1,3 +1,6 @@
+import copy
+
+
 class _MDP(object):
     '''
     Shared MDP behavior.
@@ -83,6 +86,14 @@ class Task:
         # returns reward.
         raise NotImplementedError()
 
+    def step_outcomes(self, action):
+        '''
+        (probability, choice) pairs of the random outcomes of step(action),
+        where step(action, **choice) takes that outcome deterministically.
+        used with state_key to build exact tabular models (pyrl.tasks.tabular).
+        '''
+        return [(1., {})]
+
     @property
     def state_shape(self):
         return self.mdp.state_shape
@@ -113,6 +124,17 @@ class MDPTask(Task):
         self._curr_state = next_state
         return reward
 
+    def copy(self):
+        # the mdp is shared, states are replaced (not mutated) by mdp.step.
+        return shallow_copy(self)
+
+    def set_to(self, task):
+        self._curr_state = task._curr_state
+
+    @property
+    def state_key(self):
+        return self._curr_state
+
     @property
     def num_states(self):
         return self.mdp.num_states
@@ -123,9 +145,29 @@ class MDPTask(Task):
 
 
 
+def shallow_copy(task):
+    '''
+    copy a task sharing all attributes with the original, for task.copy()
+    implementations that then duplicate their mutable episode state.
+    a copy of a breakpoint still rewinds to the same breakpoint.
+    '''
+    new_task = copy.copy(task)
+    if '_breakpoint' in task.__dict__:
+        _rewind_on_reset(new_task)
+    return new_task
+
+
+def _rewind_on_reset(task):
+    task.reset = lambda: task.set_to(task._breakpoint)
+
+
 def task_breakpoint(task):
-    task_bp = task.copy()
+    '''
+    return a copy of task whose reset() rewinds to the current state of task.
+    the breakpoint is only read by set_to, so copies of the new task share it.
+    '''
     new_task = task.copy()
-    new_task.reset = lambda: new_task.set_to(task_bp)
+    new_task._breakpoint = task.copy()
+    _rewind_on_reset(new_task)
     return new_task
 
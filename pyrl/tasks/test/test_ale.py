@@ -0,0 +1,33 @@
+from pyrl.common import np
+from pyrl.dtype import floatX
+from pyrl.tasks.atari import AtariGame, ScriptedALE
+from pyrl.tasks.preprocess import Downsampler
+
+
+def test_atari_game_observes_max_of_skipped_frames():
+    game = AtariGame('scripted', frames_per_action=4, ale=ScriptedALE())
+    state = game.curr_state
+    assert state.shape == (4, 84, 84) and state.dtype == floatX
+
+    # replay the same step on a second scripted game, fetching every frame.
+    ale = ScriptedALE()
+    ale.frame = game.ale.frame
+    ale.paddle = game.ale.paddle
+    screens = []
+    for frame_i in range(4):
+        ale.act(5)
+        screens.append(ale.getScreenRGB())
+    game.step(5)
+    expected = Downsampler(screens[-1].shape, (84, 84), normalize='minmax')(np.maximum(*screens[-2:]))
+    assert game._curr_frame.tolist() == expected.tolist()
+    assert np.allclose(game.curr_state[-1], expected / 255.)
+    assert np.allclose(game.curr_state[:-1], state[1:])
+
+
+def test_atari_game_small_mode():
+    game = AtariGame('scripted', mode='small', ale=ScriptedALE(reward_every=3))
+    assert game.state_shape == (4, 16, 16)
+    rewards = [game.step(0) for step in range(3)]
+    assert rewards == [0, 0, 1] and game.is_end()
+    frame = game._curr_frame
+    assert (frame.min(), frame.max()) == (0, 255)
@@ -0,0 +1,43 @@
+from pyrl.tasks.pyale.coroutine import Coroutine
+
+
+def _counting_coroutine(log):
+    def count():
+        total = 0
+        while total < 10:
+            total += coroutine.suspend(total)
+            log.append(total)
+        return total
+    coroutine = Coroutine(count)
+    return coroutine
+
+
+def test_coroutine_interleaves():
+    logs = ([], [])
+    coroutines = [_counting_coroutine(log) for log in logs]
+    for coroutine in coroutines:
+        assert coroutine.resume() == 0
+    for step in [1, 2]:
+        for coroutine in coroutines:
+            assert coroutine.resume(step) == [1, 3][step - 1]
+    assert logs == ([1, 3], [1, 3])
+
+    try:
+        coroutines[0].resume(7)
+        assert False, 'finished coroutine did not stop'
+    except StopIteration:
+        pass
+    assert coroutines[0].finished and logs[0] == [1, 3, 10]
+
+    coroutines[1].close()
+    assert coroutines[1].finished and logs[1] == [1, 3]
+
+
+def test_coroutine_raises_in_resumer():
+    def fail():
+        raise ValueError('in coroutine')
+    try:
+        Coroutine(fail).resume()
+        assert False, 'exception was swallowed'
+    except ValueError as e:
+        assert str(e) == 'in coroutine'
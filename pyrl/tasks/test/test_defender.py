@@ -0,0 +1,109 @@
+import os
+os.environ.setdefault('PYALE_HEADLESS', '1')
+import sys
+
+import pygame
+from pyrl.common import np
+from pyrl.tasks.pyale.defender import DefenderRAMSimulator, Defender1HotSimulator
+
+
+def _game_lib(simulator, name):
+    # the game modules only import inside a running game, take them from its copy.
+    return sys.modules[simulator.game_module_path + '.lib.' + name]
+
+
+class _Sprite(pygame.Rect):
+    ''' a rect with a random collision mask, like the ships and bullets of the game. '''
+    def __init__(self, rng, left, top, width, height):
+        pygame.Rect.__init__(self, left, top, width, height)
+        self.msk = pygame.mask.Mask((width, height))
+        for (x, y) in zip(*np.nonzero(rng.rand(width, height) < 0.7)):
+            self.msk.set_at((x, y), 1)
+
+
+def _random_sprite(rng):
+    # on cell boundaries half of the time, negative coordinates included.
+    (left, top) = rng.randint(-3, 5, size=2) * 64 if rng.rand() < 0.5 else rng.randint(-200, 300, size=2)
+    return _Sprite(rng, left, top, *rng.randint(1, 80, size=2))
+
+
+def test_grid_collisions_match_linear_scan():
+    simulator = DefenderRAMSimulator(seed=0)
+    simulator.reset()
+    try:
+        (collidelist, Grid) = (_game_lib(simulator, 'shotami').collidelist, _game_lib(simulator, 'grid').Grid)
+    finally:
+        simulator.close()
+    rng = np.random.RandomState(0)
+    hits = 0
+    for trial in xrange(20):
+        enemies = [_random_sprite(rng) for e in xrange(30)]
+        grid = Grid(enemies)
+        bullets = [_random_sprite(rng) for b in xrange(50)]
+        # bullets touching an enemy edge, which do not collide.
+        for enemy in enemies[:10]:
+            bullets.append(_Sprite(rng, enemy.right, enemy.top, 10, enemy.height))
+            bullets.append(_Sprite(rng, enemy.left, enemy.top - 10, enemy.width, 10))
+        for bullet in bullets:
+            expected = collidelist(bullet, enemies)
+            assert collidelist(bullet, enemies, grid) == expected
+            hits += expected > -1
+    assert hits > 100
+
+
+def _episode(simulator, linear):
+    shotami = _game_lib(simulator, 'shotami')
+    Grid = shotami.Grid
+    if linear:
+        shotami.Grid = lambda rects: None
+    try:
+        actions = np.random.RandomState(1).randint(simulator.num_actions, size=400)
+        steps = []
+        for action in actions:
+            (reward, state, end) = simulator.step(action)
+            steps.append((reward, state))
+            if end:
+                break
+    finally:
+        shotami.Grid = Grid
+        simulator.close()
+    return steps
+
+
+def test_seeded_episodes_do_not_depend_on_the_grid():
+    trajectories = []
+    for linear in [False, True]:
+        simulator = DefenderRAMSimulator(seed=4)
+        simulator.reset()
+        trajectories.append(_episode(simulator, linear))
+    assert len(trajectories[0]) == len(trajectories[1])
+    for ((reward, state), (linear_reward, linear_state)) in zip(*trajectories):
+        assert reward == linear_reward and np.array_equal(state, linear_state)
+
+
+class _Ship(pygame.Rect):
+    @property
+    def rect(self):
+        return self
+
+
+def test_1hot_state_of_a_known_layout():
+    simulator = Defender1HotSimulator(seed=0)
+    simulator.reset()
+    module = simulator.game_module
+    saved = [getattr(module, name) for name in ['ship', 'enemi', 'shotami', 'shotenemi']]
+    try:
+        # the 400 x 600 screen is scaled to 84 x 84, boxes cover every cell they touch.
+        module.ship = _Ship(201, 503, 40, 60)
+        module.enemi = [pygame.Rect(1, -31, 20, 60)] # partly above the screen.
+        module.shotami = []
+        module.shotenemi = [pygame.Rect(391, 591, 20, 20)] # over the bottom right corner.
+        state = simulator._get_1hot_state()
+    finally:
+        (module.ship, module.enemi, module.shotami, module.shotenemi) = saved
+        simulator.close()
+    expected = np.zeros((4, 84, 84))
+    expected[0, 70:79, 42:51] = 1.
+    expected[1, 0:5, 0:5] = 1.
+    expected[3, 82:84, 82:84] = 1.
+    assert np.array_equal(state, expected)
@@ -18,3 +18,108 @@ def test_gridworld_multigoal():
     assert task.is_end()
 
 
+
+def test_gridworld_state_dtype():
+    from pyrl.dtype import floatX
+    grid = np.zeros((3, 3))
+    task = GridWorldMultiGoal(start_pos=(1, 0),
+                             start_phase=0,
+                             grid=grid,
+                             action_stoch=0.,
+                             goals=[(0, 0), (2, 2)])
+    assert task.curr_state.dtype == floatX
+    task.step(0)
+    assert task.curr_state.dtype == floatX
+
+def test_batch_gridworld_matches_gridworld():
+    from pyrl.tasks.gridworld import GridWorldFixedStart, BatchGridWorld
+    grid = np.zeros((4, 4))
+    grid[1, 1] = grid[2, 1] = 1.
+    tasks = [
+        GridWorldFixedStart(start_pos=(0, 0), grid=grid, action_stoch=0.,
+                            goal={(3, 3): 1., (0, 3): 2.}, rewards={(3, 3): 1., (0, 3): 2.},
+                            wall_penalty=0., state_type=np.ndarray, time_penalty=-0.01),
+        GridWorldFixedStart(start_pos=(1, 0), grid=grid, action_stoch=0.,
+                            goal={(3, 0): 1.}, rewards={(3, 0): 1.},
+                            wall_penalty='death', state_type=np.ndarray),
+        GridWorldMultiGoal(start_pos=(3, 3), start_phase=0, grid=grid, action_stoch=0.,
+                           goals=[(0, 0), (3, 1), (2, 3)]),
+    ]
+    batch = BatchGridWorld([task.copy() for task in tasks])
+    assert (batch.curr_state == np.array([task.curr_state for task in tasks])).all()
+    for it in range(200):
+        actions = np.random.randint(4, size=len(tasks))
+        (states, rewards, dones) = batch.step(actions)
+        for (ti, task) in enumerate(tasks):
+            reward = task.step(actions[ti])
+            assert np.allclose(reward, rewards[ti])
+            assert task.is_end() == dones[ti]
+            if task.is_end():
+                task.reset()
+            assert (task.curr_state == states[ti]).all()
+            assert task.curr_state_id == batch.curr_state_id[ti]
+
+def test_gridworld_all_states():
+    from pyrl.tasks.gridworld import GridWorld
+    grid = np.zeros((3, 4))
+    grid[1, 2] = 1.
+    task = GridWorld(grid, action_stoch=0., goal={(2, 3): 1.}, rewards={(2, 3): 1.},
+                     wall_penalty=0.)
+    (positions, states) = task.all_states()
+    assert len(states) == len(task.free_pos) == 10
+    for (pos, state, (ypos, ystate)) in zip(positions, states, task.yield_all_states(batch_size=3)):
+        assert tuple(pos) == ypos
+        assert (state == ystate).all()
+        expected = np.zeros((3, 3, 4))
+        expected[0, pos[0], pos[1]] = 1.
+        expected[1, 2, 3] = 1.
+        expected[2] = grid
+        assert (state == expected).all()
+    # tasks on the same layout share the wall plane.
+    other = GridWorld(grid.copy(), action_stoch=0., goal={(0, 0): 1.}, rewards={(0, 0): 1.},
+                      wall_penalty=0.)
+    assert other.layout['wall_plane'] is task.layout['wall_plane']
+
+def test_gridworld_copy_and_breakpoint():
+    from pyrl.tasks.gridworld import GridWorldFixedStart
+    from pyrl.tasks.task import task_breakpoint
+    grid = np.zeros((3, 3))
+    grid[1, 1] = 1.
+    task = GridWorldFixedStart(start_pos=(0, 0), grid=grid, action_stoch=0.,
+                               goal={(2, 2): 1., (0, 2): 1.}, rewards={(2, 2): 1., (0, 2): 1.},
+                               wall_penalty=0., state_type=np.ndarray)
+    task.step(0)
+    task.step(0) # reaches (0, 2).
+    copied = task.copy()
+    assert copied.layout is task.layout
+    assert (copied.curr_state == task.curr_state).all()
+    copied.step(1)
+    assert task.curr_pos == (0, 2) and copied.curr_pos == (1, 2)
+
+    sub_task = task_breakpoint(task)
+    state = task.curr_state
+    for it in range(2):
+        sub_task.step(1)
+        sub_task.step(1)
+        assert sub_task.is_end()
+        sub_task.reset()
+        assert sub_task.curr_pos == (0, 2) and sub_task.goal == {(2, 2): 1.}
+        assert (sub_task.curr_state == state).all()
+    # copies of a breakpoint rewind to it too.
+    sub_copy = sub_task.copy()
+    sub_copy.step(1)
+    sub_copy.reset()
+    assert sub_copy.curr_pos == (0, 2) and sub_task.curr_pos == (0, 2)
+    assert task.curr_pos == (0, 2) and task.goal == {(2, 2): 1.}
+
+
+def test_grid_layouts_are_shared_and_bounded():
+    from pyrl.tasks.gridworld import grid_layout, _layout_cache
+    grid = np.zeros((3, 3))
+    grid[1, 1] = 1.
+    layout = grid_layout(grid)
+    assert grid_layout(grid.copy()) is layout
+    assert layout['wall_indices'].tolist() == [4]
+    for n in xrange(2 * _layout_cache.maxsize):
+        grid_layout(np.zeros((1, n + 1)))
+    assert len(_layout_cache) == _layout_cache.maxsize
@@ -0,0 +1,55 @@
+import os
+import sys
+import subprocess
+os.environ.setdefault('PYALE_HEADLESS', '1')
+
+from pyrl.common import np
+from pyrl.tasks.pyale.pong import PongSimulator
+
+
+def _episode(simulator, max_steps=2000):
+    actions = np.random.RandomState(0).randint(simulator.num_actions, size=max_steps)
+    states = [simulator.reset()]
+    for action in actions:
+        (reward, state, end) = simulator.step(action)
+        states.append(state)
+        if end:
+            break
+    simulator.close()
+    return (np.array(states), end)
+
+
+def test_skip_draw_observes_the_same_frames():
+    for pool_frames in [1, 2]:
+        (drawn, end) = _episode(PongSimulator(seed=5, pool_frames=pool_frames, skip_draw=False))
+        (skipped, _) = _episode(PongSimulator(seed=5, pool_frames=pool_frames, skip_draw=True))
+        assert end # the terminal frame is compared too.
+        assert np.array_equal(drawn, skipped)
+
+
+# run in a fresh process: going headless patches pygame for the whole process.
+_RENDER_HEADLESS = '''
+import pygame
+from pyrl.tasks.pyale import pyale
+from pyrl.tasks.pyale.pong import PongSimulator
+simulator = PongSimulator(headless=True, skip_draw=False)
+state = simulator.reset()
+for step in range(5):
+    (reward, state, end) = simulator.step(0)
+assert isinstance(pygame.display.get_surface(), pyale._HeadlessSurface)
+assert pygame.mixer.Sound is pyale._NullSound and pygame.font.Font is pyale._NullFont
+# the paddles are drawn in the first and last columns, on the background.
+frame = state[-1]
+assert (frame[:12] > 0.1).any() and (frame[-12:] > 0.1).any()
+assert (frame[12:-12] < 0.1).mean() > 0.9
+simulator.close()
+'''
+
+
+def test_headless_simulator_renders_without_display():
+    env = dict(os.environ)
+    for name in ['DISPLAY', 'PYALE_HEADLESS', 'SDL_VIDEODRIVER', 'SDL_AUDIODRIVER']:
+        env.pop(name, None)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env['PYTHONPATH'] = os.pathsep.join([root] + filter(None, [env.get('PYTHONPATH')]))
+    subprocess.check_call([sys.executable, '-c', _RENDER_HEADLESS], env=env)
@@ -0,0 +1,156 @@
+import os
+import random
+import numpy.random as npr
+from pyrl.common import np
+from pyrl.tasks.pacman import layout
+from pyrl.tasks.pacman.game_mdp import PacmanTask
+from pyrl.tasks.pacman.ghostAgents import RandomGhost, DirectionalGhost
+from pyrl.tasks.pacman.textDisplay import NullGraphics
+
+def _load_layout(name):
+    return layout.getLayout(os.path.join(os.path.dirname(layout.__file__), 'layouts', name + '.lay'))
+
+def _rollout(fast_step, seed, num_steps=300):
+    random.seed(seed)
+    rng = np.random.RandomState(seed)
+    task = PacmanTask(_load_layout('smallClassic'),
+                      [DirectionalGhost(1), RandomGhost(2)], NullGraphics(),
+                      fast_step=fast_step)
+    trace = []
+    for it in range(num_steps):
+        if task.is_end():
+            task.reset()
+        action = task.valid_actions[rng.randint(len(task.valid_actions))]
+        reward = task.step(action)
+        trace.append((action, reward, task.is_end(), str(task.game.state), task.curr_state))
+    return trace
+
+def test_pacman_fast_step_matches_run_one():
+    for seed in range(3):
+        slow = _rollout(False, seed)
+        fast = _rollout(True, seed)
+        for (step_slow, step_fast) in zip(slow, fast):
+            assert step_slow[:4] == step_fast[:4]
+            assert (step_slow[4] == step_fast[4]).all()
+
+def test_pacman_incremental_stack_state():
+    random.seed(0)
+    rng = np.random.RandomState(0)
+    task = PacmanTask(_load_layout('capsuleClassic'),
+                      [DirectionalGhost(1), RandomGhost(2), RandomGhost(3)], NullGraphics())
+    for it in range(500):
+        if task.is_end():
+            task.reset()
+        data = task.curr_state_dict
+        ghosts = np.sum(data['ghosts'], axis=0)
+        expected = np.concatenate([[data['food'], data['wall']],
+                                   np.rollaxis(data['pacman'], 2), np.rollaxis(ghosts, 2)])
+        assert (task.curr_state == expected).all()
+        task.step(task.valid_actions[rng.randint(len(task.valid_actions))])
+
+def test_pacman_lazy_neighbors():
+    from pyrl.tasks.pacman.game_mdp import GameEditor, PacmanTaskShifter
+    task = PacmanTask(_load_layout('smallClassic'), [DirectionalGhost(1), RandomGhost(2)], NullGraphics())
+    base = str(task.init_game.state)
+    edits = list(PacmanTaskShifter.neighbor_edits(task, ['move_pacman', 'del_ghost', 'del_food']))
+    tasks = PacmanTaskShifter.iter_neighbors(task, ['move_pacman', 'del_ghost', 'del_food'])
+    for (edit, new_task) in zip(edits, tasks):
+        assert str(new_task.init_game.state) == str(edit.apply(task.init_game).state)
+        assert str(new_task.game.state) == str(new_task.init_game.state)
+    assert str(task.init_game.state) == base
+    # ghosts are moved on the copies only.
+    ghost = task.init_game.state.data.agentStates[1].configuration
+    games = GameEditor.move_ghost(task.init_game, 1)
+    assert task.init_game.state.data.agentStates[1].configuration == ghost
+    assert set([game.state.data.agentStates[1].getPosition() for game in games]) == \
+        set(GameEditor._find_free_pos(task.init_game.state.data))
+
+def test_pacman_compiled_layout_distances():
+    from pyrl.tasks.pacman.game import Actions
+    from pyrl.tasks.pacman.featureExtractors import closestFood
+    lay = _load_layout('mediumClassic')
+    compiled = lay.compiled()
+    assert lay.deepCopy().compiled() is compiled
+    start = tuple(compiled.cells[0])
+    # breadth first search reference.
+    dist = {start: 0}
+    fringe = [start]
+    for pos in fringe:
+        for nbr in Actions.getLegalNeighbors(pos, lay.walls):
+            if nbr not in dist:
+                dist[nbr] = dist[pos] + 1
+                fringe.append(nbr)
+    for cell in compiled.cells:
+        assert compiled.getDistance(start, tuple(cell)) == dist.get(tuple(cell))
+    food = min([(d, pos) for (pos, d) in dist.items() if lay.food[pos[0]][pos[1]]])[0]
+    assert closestFood(start, lay.food, lay.walls) == food
+
+def test_pacman_make_unmake_move():
+    random.seed(0)
+    rng = np.random.RandomState(0)
+    for state_repr in ['stack', '2-frames']:
+        task = PacmanTask(_load_layout('capsuleClassic'),
+                          [DirectionalGhost(1), RandomGhost(2)], NullGraphics(), state_repr=state_repr)
+        snapshot = lambda: (str(task.game.state), task.game.state.data.score, task.is_end(),
+                            task.valid_actions, task.curr_state.tolist(), len(task.game.moveHistory))
+
+        def search(depth):
+            # explore a few continuations, and check each one is rewound.
+            before = snapshot()
+            for branch in range(2):
+                if task.is_end():
+                    break
+                action = task.valid_actions[rng.randint(len(task.valid_actions))]
+                (reward, undo) = task.make_move(action)
+                if depth > 1:
+                    search(depth - 1)
+                task.unmake_move(undo)
+                assert snapshot() == before
+
+        for it in range(40):
+            if task.is_end():
+                task.reset()
+            search(4)
+            task.step(task.valid_actions[rng.randint(len(task.valid_actions))])
+
+def test_batch_pacman_matches_pacman_task():
+    from pyrl.tasks.pacman.game_mdp import BatchPacmanTask
+    random.seed(0)
+    rng = np.random.RandomState(0)
+    ghosts = lambda: [DirectionalGhost(1), RandomGhost(2), DirectionalGhost(3, prob_attack=0.5)]
+    tasks = [PacmanTask(_load_layout('capsuleClassic'), ghosts(), NullGraphics()) for i in range(4)]
+    batch = BatchPacmanTask(tasks[0], len(tasks), auto_reset=False)
+    for it in range(300):
+        # ghosts move as in the reference games, and follow the same policies.
+        for (i, task) in enumerate(tasks):
+            for (gi, agent) in enumerate(task.game.agents[1:]):
+                dist = agent.getDistribution(task.game.state)
+                expected = [dist[direction] for direction in batch.directions]
+                assert np.allclose(batch.ghost_distribution(gi)[i], expected)
+        actions = rng.randint(batch.num_actions, size=len(tasks))
+        ghost_actions = np.zeros((len(tasks), batch.num_ghosts), dtype=int)
+        rewards = []
+        for (i, task) in enumerate(tasks):
+            num_moves = len(task.game.moveHistory)
+            rewards.append(task.step(actions[i]))
+            for (agent_index, direction) in task.game.moveHistory[num_moves:]:
+                if agent_index > 0:
+                    ghost_actions[i, agent_index - 1] = batch.directions.index(direction)
+        (batch_rewards, dones) = batch.step(actions, ghost_actions)
+        assert (batch_rewards == rewards).all()
+        assert (dones == [task.is_end() for task in tasks]).all()
+        assert (batch.curr_state == np.array([task.curr_state for task in tasks])).all()
+        for task in tasks:
+            if task.is_end():
+                task.reset()
+        batch.reset(dones)
+
+def test_batch_pacman_ghost_sampling():
+    from pyrl.tasks.pacman.game_mdp import BatchPacmanTask
+    npr.seed(0)
+    task = PacmanTask(_load_layout('smallClassic'), [DirectionalGhost(1), RandomGhost(2)], NullGraphics())
+    batch = BatchPacmanTask(task, 20000)
+    probs = batch.ghost_distribution(0)[0]
+    batch.step(np.zeros(batch.num_envs, dtype=int) + batch.stop)
+    freq = np.bincount(batch.ghost_dir[:, 0], minlength=batch.num_actions) / float(batch.num_envs)
+    assert np.abs(freq - probs).max() < 0.02
@@ -0,0 +1,111 @@
+import os
+os.environ.setdefault('PYALE_HEADLESS', '1')
+
+from pyrl.common import np, npr, random
+from pyrl.forkserver import ForkServer
+from pyrl.tasks.pyale.pool import SimulatorPool, TemplateSimulator, warm_simulators
+
+
+class _DrawingSimulator(object):
+    ''' state is a draw from the global random generators. '''
+    def reset(self):
+        return np.array([random.random(), npr.rand()])
+
+    def step(self, action):
+        return (0., self.reset(), False)
+
+    def close(self):
+        pass
+
+
+class _CountingSimulator(object):
+    ''' state is the sum of actions so far, episodes last 3 steps. '''
+    def reset(self):
+        self.total = 0
+        self.steps = 0
+        return np.zeros((2, 2))
+
+    def step(self, action):
+        self.total += action
+        self.steps += 1
+        return (float(action), np.full((2, 2), self.total), self.steps == 3)
+
+    def close(self):
+        pass
+
+
+def test_simulator_pool_steps_workers_in_lockstep():
+    pool = SimulatorPool(_CountingSimulator, 3)
+    try:
+        assert pool.curr_state.shape == (3, 2, 2)
+        (rewards, dones) = pool.step([1, 2, 3])
+        assert rewards.tolist() == [1., 2., 3.]
+        assert pool.curr_state[:, 0, 0].tolist() == [1., 2., 3.]
+        pool.reset([False, True, False])
+        pool.step([1, 1, 1])
+        assert pool.curr_state[:, 0, 0].tolist() == [2., 1., 4.]
+        (rewards, dones) = pool.step([1, 1, 1])
+        # the first and last episodes ended and were reset.
+        assert dones.tolist() == [True, False, True]
+        assert pool.curr_state[:, 0, 0].tolist() == [0., 2., 0.]
+    finally:
+        pool.close()
+
+
+def _make_learner():
+    from pyrl.common import T
+    from pyrl.agents.agent import DQN
+    from pyrl.agents.arch import two_layer
+    from pyrl.algorithms.valueiter import DeepQlearn
+
+    def arch_func():
+        states = T.tensor3('states')
+        (action_values, model) = two_layer(states.flatten(2), 4 * 6, 8, 2)
+        return (states, action_values, model)
+
+    return DeepQlearn(DQN(2, arch_func), exploration_kwargs={'method': 'eps-greedy', 'epsilon': 0.})
+
+
+def _act_and_learn(template, conn):
+    from pyrl.tasks.pyale.pong import PongRAMSimulator
+    (simulator, learner) = (template['simulators'][PongRAMSimulator], template['learner'])
+    state = simulator.reset()
+    action = learner.get_action(state, simulator.valid_actions)
+    (reward, next_state, is_end) = simulator.step(action)
+    td_error = learner.bprop([state, next_state], [action, action], [reward, 1.])
+    conn.send((action, float(td_error), learner.dqn.fprop([next_state]).shape))
+    simulator.close()
+
+
+def test_simulator_pool_forks_warm_simulators():
+    from pyrl.tasks.pyale.pong import PongRAMSimulator
+    server = ForkServer(warm_simulators, [PongRAMSimulator, _DrawingSimulator],
+                        make_learner=_make_learner)
+    try:
+        pool = SimulatorPool(TemplateSimulator(PongRAMSimulator), 3, server=server)
+        try:
+            assert pool.curr_state.shape == (3, 4, 6)
+            assert len(set(pool.pids)) == 3
+            start = pool.curr_state.copy()
+            for step in xrange(50):
+                (rewards, dones) = pool.step([step % 2] * 3)
+                assert ((pool.curr_state >= 0.) & (pool.curr_state <= 1.)).all()
+            assert not np.array_equal(pool.curr_state, start)
+        finally:
+            pool.close()
+
+        # workers start with the random state of the template, and reseed it.
+        pool = SimulatorPool(TemplateSimulator(_DrawingSimulator), 3, server=server)
+        try:
+            draws = pool.curr_state
+            assert len(set(draws[:, 0])) == 3 and len(set(draws[:, 1])) == 3
+        finally:
+            pool.close()
+
+        # the learner was compiled in the template, workers use it as is.
+        for worker in xrange(2):
+            (pid, conn) = server.fork(_act_and_learn)
+            (action, td_error, shape) = conn.recv()
+            assert action in (0, 1) and np.isfinite(td_error) and shape == (1, 2)
+    finally:
+        server.close()
@@ -0,0 +1,94 @@
+from pyrl.common import np, npr
+from pyrl.tasks.preprocess import luma, Downsampler, BlockMax
+
+
+def _pong_like_frame(rows=640, cols=480):
+    frame = np.zeros((rows, cols, 3), dtype=np.uint8)
+    frame[:, :] = (144, 72, 17)
+    frame[40:60, 215:265] = (101, 213, 77)
+    frame[580:600, 100:150] = (213, 130, 74)
+    frame[300:315, 200:215] = (255, 255, 255)
+    return frame
+
+
+def test_luma_matches_rgb2yuv():
+    from pyrl.utils import rgb2yuv
+    rgb = npr.randint(0, 256, size=(37, 23, 3)).astype(np.uint8)
+    y = luma(rgb)
+    assert y.dtype == np.uint8
+    assert np.abs(y - rgb2yuv(rgb)[:, :, 0]).max() <= 1.
+
+
+def test_downsampler_block_average():
+    # integer factor: both modes reduce to the mean of each 4x4 block.
+    rgb = npr.randint(0, 256, size=(32, 16, 3)).astype(np.uint8)
+    y = luma(rgb).astype(float)
+    expected = y.reshape(8, 4, 4, 4).mean(axis=(1, 3))
+    area = Downsampler((32, 16), (8, 4), taps=None)
+    assert np.abs(area(rgb) - expected).max() <= 1.
+    taps = Downsampler((32, 16), (8, 4), taps=4)(rgb).astype(float)
+    assert np.abs(taps - expected).max() <= 1.
+
+
+def test_downsampler_out_buffer():
+    frame = _pong_like_frame()
+    ds = Downsampler(frame.shape, (84, 84), taps=2)
+    out = np.zeros((84, 84), dtype=np.uint8)
+    res = ds(frame, out=out)
+    assert res is out
+    assert ds(frame) is ds.out
+    assert out.tolist() == ds.out.tolist()
+
+
+def test_downsampler_minmax_matches_imresize():
+    from scipy.misc import imresize
+    from pyrl.utils import rgb2yuv
+    frame = _pong_like_frame()
+    old = imresize(rgb2yuv(frame)[:, :, 0], (84, 84), interp='bicubic').astype(float)
+    for taps in [None, 2]:
+        new = Downsampler(frame.shape, (84, 84), taps=taps, normalize='minmax')(frame)
+        assert new.min() == 0 and new.max() == 255
+        assert np.abs(new - old).mean() < 4.
+
+
+def test_block_max_pools_uneven_blocks():
+    img = npr.randint(0, 200, size=(21, 16)).astype(np.uint8)
+    pool = BlockMax(img.shape, (4, 3))
+    # rows split 0:5 5:10 10:15 15:21, columns 0:5 5:10 10:16.
+    expected = [[img[r0:r1, c0:c1].max() for (c0, c1) in [(0, 5), (5, 10), (10, 16)]]
+                for (r0, r1) in [(0, 5), (5, 10), (10, 15), (15, 21)]]
+    assert pool(img).tolist() == expected
+    stretched = BlockMax(img.shape, (4, 3), normalize='minmax')(img)
+    assert (stretched.min(), stretched.max()) == (0, 255)
+    assert BlockMax(img.shape, (4, 3), normalize='minmax')(np.full_like(img, 9)).max() == 0
+
+
+def test_frame_stack_rolls_in_place():
+    from pyrl.tasks.preprocess import FrameStack
+    stack = FrameStack(3, (2,), dtype=np.float32, scale=0.5)
+    buf = stack.buf
+    history = []
+    for t in range(7):
+        stack.push([t, -t])
+        history.append([t / 2., -t / 2.])
+        assert len(stack) == min(t + 1, 3)
+        if t >= 2:
+            assert stack.stack().tolist() == history[-3:]
+    assert stack.buf is buf
+    stack.reset()
+    assert len(stack) == 0
+    stack.push([1, 1])
+    assert stack.stack()[-1].tolist() == [0.5, 0.5]
+
+
+def test_rasterize_boxes_matches_slicing():
+    from pyrl.tasks.preprocess import rasterize_boxes
+    boxes = npr.randint(-5, 30, size=(40, 5))
+    boxes[:, 0] = npr.randint(0, 3, size=40)
+    boxes[:, 3:] += boxes[:, 1:3] # mostly non-empty boxes, some hanging off the image.
+    boxes[:3, 3:] = boxes[:3, 1:3] # and empty ones.
+    expected = np.zeros((3, 20, 25))
+    for (c, r0, c0, r1, c1) in boxes:
+        expected[c, max(r0, 0):max(r1, 0), max(c0, 0):max(c1, 0)] = 1.
+    assert np.array_equal(rasterize_boxes((3, 20, 25), boxes), expected)
+    assert not rasterize_boxes((3, 20, 25), np.zeros((0, 5))).any()
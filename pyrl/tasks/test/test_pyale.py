@@ -0,0 +1,59 @@
+import os
+os.environ.setdefault('PYALE_HEADLESS', '1')
+import gc
+
+from pyrl.common import np
+from pyrl.tasks.pyale.pyale import BatchPygameSimulator
+from pyrl.tasks.pyale.pong import PongRAMSimulator
+
+
+def _solo(seed, actions, reset_at):
+    ''' (rewards, dones, states) of one simulator, reset when done and before step reset_at. '''
+    simulator = PongRAMSimulator(seed=seed)
+    simulator.reset()
+    (rewards, dones, states) = ([], [], [])
+    for (step, action) in enumerate(actions):
+        if step == reset_at:
+            simulator.reset()
+        (reward, state, done) = simulator.step(action)
+        if done:
+            state = simulator.reset()
+        rewards.append(reward)
+        dones.append(done)
+        states.append(state)
+    simulator.close()
+    return (rewards, dones, states)
+
+
+def test_batch_steps_like_solo_simulators():
+    seeds = [10, 20]
+    actions = np.random.RandomState(0).randint(2, size=(len(seeds), 600))
+    reset_at = [None, 200]
+    solos = [_solo(seed, actions[i], reset_at[i]) for (i, seed) in enumerate(seeds)]
+
+    batch = BatchPygameSimulator([PongRAMSimulator(seed=seed) for seed in seeds])
+    batch.reset()
+    for step in xrange(actions.shape[1]):
+        if step == reset_at[1]:
+            batch.reset([False, True])
+        (rewards, dones) = batch.step(actions[:, step])
+        for (i, (solo_rewards, solo_dones, solo_states)) in enumerate(solos):
+            assert (rewards[i], dones[i]) == (solo_rewards[step], solo_dones[step])
+            assert np.array_equal(batch.curr_state[i], solo_states[step])
+    for simulator in batch.simulators:
+        simulator.close()
+    # both played past the end of an episode, reset automatically.
+    assert all(any(solo_dones) for (_, solo_dones, _) in solos)
+
+
+def test_closed_simulators_release_their_game_copy():
+    paths = []
+    for seed in xrange(3):
+        simulator = PongRAMSimulator(seed=seed)
+        simulator.reset()
+        simulator.step(0)
+        simulator.close()
+        paths.append(simulator.game_module_path)
+        del simulator
+        gc.collect()
+    assert len(set(paths)) == 1
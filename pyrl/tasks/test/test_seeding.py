@@ -0,0 +1,40 @@
+import os
+os.environ.setdefault('PYALE_HEADLESS', '1')
+
+from pyrl.common import np, random
+from pyrl.tasks.pyale.defender import DefenderRAMSimulator
+from pyrl.tasks.pyale.pong import PongRAMSimulator
+
+
+def _trajectory(simulator, num_steps):
+    actions = np.random.RandomState(0).randint(simulator.num_actions, size=num_steps)
+    states = [simulator.reset()]
+    for action in actions:
+        # the learner drawing from the global generators must not leak into the game.
+        np.random.rand()
+        random.random()
+        (reward, state, end) = simulator.step(action)
+        states.append(state)
+        if end:
+            break
+    return np.array(states)
+
+
+def _replays_the_same_episode(simulator_class):
+    trajectories = []
+    for k in range(2):
+        simulator = simulator_class(seed=3)
+        try:
+            trajectories.append(_trajectory(simulator, 60))
+        finally:
+            simulator.close()
+    assert np.array_equal(trajectories[0], trajectories[1])
+    assert not np.array_equal(trajectories[0][0], trajectories[0][-1])
+
+
+def test_seeded_simulators_replay_the_same_episode():
+    _replays_the_same_episode(DefenderRAMSimulator)
+
+
+def test_seeded_pong_replays_the_same_episode():
+    _replays_the_same_episode(PongRAMSimulator)
@@ -0,0 +1,57 @@
+import sys
+import types
+
+import pygame
+
+from pyrl.common import np
+from pyrl.tasks.pyale.snapshot import ModuleSnapshot, game_modules
+
+
+def _fake_game():
+    module = types.ModuleType('fake_game.lib')
+    module.Rect = pygame.Rect
+    exec '''
+class Enemy(object):
+    count = 0
+    def __init__(self, x):
+        self.rect = Rect(x, 0, 4, 4)
+        self.hits = [0]
+        Enemy.count += 1
+''' in module.__dict__
+    module.enemies = [module.Enemy(1), module.Enemy(2)]
+    module.score = {'shot': 0}
+    module.grid = np.zeros(3)
+    module.layer = pygame.Surface((2, 2), pygame.SRCALPHA, 32)
+    return module
+
+
+def test_module_snapshot_restores_in_place():
+    module = _fake_game()
+    sys.modules[module.__name__] = module
+    try:
+        snapshot = ModuleSnapshot(game_modules('fake_game.'))
+    finally:
+        del sys.modules[module.__name__]
+    enemies = module.enemies
+    (first, second) = enemies
+
+    # play a bit.
+    first.rect.x += 10
+    first.hits.append(1)
+    first.dead = True
+    enemies.remove(second)
+    enemies.append(module.Enemy(3))
+    module.score['shot'] += 1
+    module.grid[1] = 5.
+    module.layer.fill((255, 0, 0, 255))
+    module.score = None
+
+    snapshot.restore()
+    assert module.enemies is enemies
+    assert enemies == [first, second]
+    assert first.rect.x == 1 and first.hits == [0]
+    assert not hasattr(first, 'dead')
+    assert module.Enemy.count == 2
+    assert module.score == {'shot': 0}
+    assert module.grid.tolist() == [0., 0., 0.]
+    assert module.layer.get_at((0, 0)) == (0, 0, 0, 0)
@@ -0,0 +1,134 @@
+from pyrl.common import np
+from pyrl.tasks.tabular import tabular_model
+
+
+def _legacy_gridworld():
+    from pyrl.gridworld import Grid, GridWorldMDP
+    grid = np.zeros((4, 5))
+    grid[1, 1:4] = 1.
+    return GridWorldMDP(Grid(grid, action_stoch=0.2), rewards={(3, 4): 1., (0, 4): -1.},
+                        wall_penalty=-0.1, gamma=0.9)
+
+
+def _loop_value_iteration(task, tol):
+    V = np.zeros(task.get_num_states())
+    while True:
+        max_diff = 0.
+        for state in task.env.get_valid_states():
+            best_val = 0.
+            for idx, action in enumerate(task.get_allowed_actions(state)):
+                val = sum(prob * (task.get_reward(state, action, ns) + task.gamma * V[ns])
+                          for ns, prob in task.next_state_distribution(state, action))
+                if idx == 0 or val > best_val:
+                    best_val = val
+            max_diff = max(max_diff, abs(V[state] - best_val))
+            V[state] = best_val
+        if max_diff < tol:
+            return V
+
+
+def test_distribution_model_matches_loops():
+    from pyrl.algorithms.valueiter import compute_tabular_value
+    task = _legacy_gridworld()
+    model = tabular_model(task)
+    assert model.num_states == task.get_num_states()
+    assert np.allclose(model.P[2].dot(np.ones(model.num_states)), 1.)
+    V = compute_tabular_value(task, tol=1e-6)
+    assert np.abs(np.array(V) - _loop_value_iteration(task, tol=1e-6)).max() < 1e-4
+    # the model is compiled once, whatever the position of the agent.
+    task.env.reset()
+    assert tabular_model(task) is model
+
+
+def test_explored_gridworld_model():
+    from pyrl.tasks.gridworld import GridWorldFixedStart
+    grid = np.zeros((3, 3))
+    grid[1, 1] = 1.
+    task = GridWorldFixedStart(start_pos=(0, 0), grid=grid, action_stoch=0.2,
+                               goal={(2, 2): 1., (0, 2): 1.}, rewards={(2, 2): 1., (0, 2): 1.},
+                               wall_penalty=0., state_type=np.ndarray, time_penalty=0.)
+    model = tabular_model(task)
+    assert model.index[task.state_key] == 0
+    # agent positions with both goals left (not on a goal, nor between them),
+    # with one left (not on it), and on the last goal reached.
+    assert model.num_states == 5 + 7 + 7 + 2
+    live = model.allowed.any(axis=0)
+    for P in model.P:
+        assert np.allclose(P.dot(np.ones(model.num_states)), live)
+    assert tabular_model(task.copy()) is model
+
+    # deterministic moves: the values follow from the shortest paths.
+    task = GridWorldFixedStart(start_pos=(0, 0), grid=grid, action_stoch=0.,
+                               goal={(2, 2): 1.}, rewards={(2, 2): 1.},
+                               wall_penalty=0., state_type=np.ndarray, time_penalty=-0.1)
+    model = tabular_model(task)
+    V = model.value_iteration(0.5, tol=1e-6)
+    assert np.allclose(V[0], -0.1 * (1 + .5 + .25) + .125 * 0.9)
+
+
+def test_explored_cliffwalk_model():
+    from pyrl.tasks.cliffwalk import CliffWalk
+    task = CliffWalk(start_pos=1, size=5)
+    model = tabular_model(task)
+    # positions 1..4, and falling off the cliff from 1..3.
+    assert model.num_states == 7
+    V = model.value_iteration(0.9, tol=1e-6)
+    assert np.allclose(V[model.index[(1, False)]], 0.9 ** 2)
+    pi = np.zeros((model.num_states, 2))
+    pi[:, 1] = 1.
+    assert np.allclose(model.evaluate(pi, 0.9, tol=1e-6), V)
+
+
+def test_explored_playroom_model():
+    from pyrl.tasks.playroom import Playroom
+    task = Playroom(size=2, hand_pos=(0, 0), eye_pos=(0, 1), mark_pos=(1, 1),
+                    red_button_pos=(0, 0), blue_button_pos=(0, 1), monkey_pos=(1, 0),
+                    bell_pos=(1, 0), ball_pos=(1, 1), switch_pos=(1, 1))
+    model = tabular_model(task)
+    assert tabular_model(task.copy()) is model
+    # the playroom never ends, touching is only allowed on objects.
+    assert model.allowed.any(axis=0).all()
+    for (a, P) in enumerate(model.P):
+        assert np.allclose(P.dot(np.ones(model.num_states)), model.allowed[a])
+    # the eye lands on each of the 6 objects with probability 1/6, objects may share a cell.
+    action = task.ACTIONS.index('move eye to a random object')
+    s = model.index[task.state_key]
+    for pos in set(task.object_pos):
+        next_task = task.copy()
+        next_task.step(action, eye_target=pos)
+        prob = task.object_pos.count(pos) / 6.
+        assert np.allclose(model.P[action][s, model.index[next_task.state_key]], prob)
+    # sampled steps stay in the model.
+    for step in xrange(200):
+        s = model.index[task.state_key]
+        action = task.valid_actions[step % len(task.valid_actions)]
+        task.step(action)
+        assert model.P[action][s, model.index[task.state_key]] > 0.
+
+
+def _unlockroom(**kwargs):
+    from pyrl.tasks.unlockroom import UnlockRoom
+    return UnlockRoom(start_pos=(0, 0), key_pos=(0, 2), door_pos=(2, 2), grid=np.zeros((3, 3)),
+                      wall_penalty=0., **kwargs)
+
+
+def test_explored_unlockroom_model():
+    model = tabular_model(_unlockroom(action_stoch=0.))
+    # every cell but the key before picking it up, every cell after.
+    assert model.num_states == 8 + 9
+    V = model.value_iteration(0.9, tol=1e-6)
+    assert np.allclose(V[model.index[((0, 0), False)]], 0.9 ** 3)
+    assert np.allclose(V[model.index[((2, 2), False)]], 0.9 ** 3)
+    assert np.allclose(V[model.index[((0, 2), True)]], 0.9)
+    assert V[model.index[((2, 2), True)]] == 0.
+
+    # tasks that differ in a function are not confused.
+    (task, other) = (_unlockroom(action_stoch=0.2), _unlockroom(action_stoch=0.2))
+    task.describe = lambda: 'left'
+    other.describe = lambda: 'right'
+    model = tabular_model(task)
+    assert tabular_model(other) is not model
+    assert tabular_model(task) is not model
+    live = model.allowed.any(axis=0)
+    for P in model.P:
+        assert np.allclose(P.dot(np.ones(model.num_states)), live)
@@ -0,0 +1,50 @@
+import os
+os.environ.setdefault('PYALE_HEADLESS', '1')
+
+from pyrl.common import np
+from pyrl.tasks.pyale.vecpong import VectorPong
+from pyrl.tasks.pyale.pong import PongSimulator, PongRAMSimulator
+
+
+def _plays_like(simulator, state_type):
+    np.random.seed(3)
+    state = simulator.reset()
+    pong = VectorPong(1, state_type=state_type, seed=3, auto_reset=False)
+    pong.reset()
+    assert np.array_equal(pong.curr_state[0], state)
+    is_end = False
+    while not is_end:
+        # follow the ball, so that rallies include hits.
+        action = 0 if pong.game[3, 0] > pong.game[0, 0] + 20 else 1
+        (reward, state, is_end) = simulator.step(action)
+        (rewards, dones) = pong.step([action])
+        assert np.array_equal(pong.curr_state[0], state)
+        assert (rewards[0], dones[0]) == (reward, is_end)
+    simulator.close()
+
+
+def test_vector_pong_plays_like_pygame_pong():
+    _plays_like(PongRAMSimulator(), 'ram')
+
+
+def test_vector_pong_draws_like_pygame_pong():
+    _plays_like(PongSimulator(skip_draw=False), 'pixel')
+
+
+def test_vector_pong_keeps_ended_games():
+    pong = VectorPong(3, H1=[20, 50, 80], state_type='pixel', auto_reset=False, seed=0)
+    pong.reset()
+    assert pong.curr_state.shape == (3, 4, 84, 84)
+    # the smallest paddle covers the fewest pixels.
+    paddles = (pong.curr_state[:, -1, :12] > 0.1).sum(axis=(1, 2))
+    assert paddles[0] < paddles[1] < paddles[2]
+    dones = pong.is_end()
+    while not dones.all():
+        before = pong.curr_state.copy()
+        (rewards, dones_now) = pong.step([1, 1, 1])
+        # games that ended before this step keep their last state.
+        assert np.array_equal(pong.curr_state[dones], before[dones])
+        assert not (rewards[dones] != 0).any()
+        dones = dones_now
+    pong.reset([True, False, False])
+    assert pong.is_end().tolist() == [False, True, True]
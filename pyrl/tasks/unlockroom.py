@@ -1,4 +1,5 @@
-from pyrl.tasks.task import Task
+from pyrl.tasks.task import Task, shallow_copy
+from pyrl.dtype import floatX
 
 import random
 import numpy as np
@@ -61,11 +62,21 @@ class UnlockRoom(Task):
         self.hit_wall = False
         self.curr_pos = self.start_pos
         (h, w) = self.grid.shape
-        self.state_3d = np.zeros((3, h, w))
+        self.state_3d = np.zeros((3, h, w), dtype=floatX)
         self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 1.
         self.state_3d[1, self.door_pos[0], self.door_pos[1]] = 1.
         self.state_3d[2, self.key_pos[0], self.key_pos[1]] = 1.
 
+    def copy(self):
+        task = shallow_copy(self)
+        task.state_3d = np.array(self.state_3d)
+        return task
+
+    @property
+    def state_key(self):
+        # position, and whether the key was picked up.
+        return (self.curr_pos, bool(self.state_3d[2, self.key_pos[0], self.key_pos[1]] == 0.))
+
     @property
     def curr_state(self):
         '''
@@ -102,17 +113,30 @@ class UnlockRoom(Task):
         return state[0] < 0 or state[0] >= self.grid.shape[0] or state[1] < 0 \
             or state[1] >= self.grid.shape[1] or self.grid[state[0], state[1]]
 
-    def step(self, action):
+    def step_outcomes(self, action):
+        # the intended move, or with probability action_stoch a random one.
+        outcomes = [(1. - self.action_stoch, {'move': self.actions[action]})]
+        if self.action_stoch > 0:
+            prob = self.action_stoch / len(self.actions)
+            outcomes.extend([(prob, {'move': move}) for move in self.actions])
+        return outcomes
+
+    def step(self, action, move=None):
+        '''
+        move: the move made, sampled according to action_stoch by default.
+        '''
         reward = 0.
 
         # update state_3d matrix
         self.state_3d[0, self.curr_pos[0], self.curr_pos[1]] = 0.
 
         # compute new coordinate.
-        if random.random() < self.action_stoch:
-            tmp = self._move(self.curr_pos, random.choice(self.actions))
-        else:
-            tmp = self._move(self.curr_pos, self.actions[action])
+        if move is None:
+            if random.random() < self.action_stoch:
+                move = random.choice(self.actions)
+            else:
+                move = self.actions[action]
+        tmp = self._move(self.curr_pos, move)
         if self._out_of_bounds(tmp):
             self.hit_wall = True
         else:
@@ -0,0 +1,25 @@
+import os
+from pyrl.forkserver import ForkServer
+
+
+def _prepare(value):
+    return {'value': value, 'pid': os.getpid()}
+
+
+def _echo(template, conn, offset):
+    conn.send((template['value'] + offset, template['pid'], os.getpid()))
+
+
+def test_fork_server_workers_share_template():
+    server = ForkServer(_prepare, 40)
+    try:
+        replies = []
+        for offset in [1, 2]:
+            (pid, conn) = server.fork(_echo, offset)
+            replies.append(conn.recv())
+            assert replies[-1][2] == pid
+        assert [reply[0] for reply in replies] == [41, 42]
+        # both workers were forked from the same template process.
+        assert replies[0][1] == replies[1][1] != os.getpid()
+    finally:
+        server.close()
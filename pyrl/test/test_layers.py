@@ -0,0 +1,70 @@
+from pyrl.common import *
+from pyrl.config import floatX
+import pyrl.layers as layers
+
+def test_rnn_scan_matches_steps():
+    rnn = layers.RNNLayer(3, 4, 2, hidden_activation='tanh')
+    x = T.matrix('x')
+    h = T.matrix('h')
+    step = theano.function([x, h], rnn(x, h))
+
+    xs = T.tensor3('xs')
+    scan = theano.function([xs, h], rnn.scan(xs, h))
+
+    seq = npr.randn(5, 2, 3).astype(floatX)
+    h0 = npr.randn(2, 4).astype(floatX)
+    hs, outputs = scan(seq, h0)
+    ht = h0
+    for t in range(5):
+        ht, output = step(seq[t], ht)
+        assert np.allclose(hs[t], ht, atol=1e-5)
+        assert np.allclose(outputs[t], output, atol=1e-5)
+
+
+def test_lstm_scan_matches_steps():
+    lstm = layers.LSTMLayer(3, 4)
+    x = T.matrix('x')
+    h = T.matrix('h')
+    cell = T.matrix('cell')
+    step = theano.function([x, h, cell], lstm(x, h, cell))
+
+    xs = T.tensor3('xs')
+    scan = theano.function([xs, h, cell], lstm.scan(xs, h, cell, truncate_gradient=2))
+
+    seq = npr.randn(5, 2, 3).astype(floatX)
+    h0 = npr.randn(2, 4).astype(floatX)
+    cell0 = npr.randn(2, 4).astype(floatX)
+    cells, hs = scan(seq, h0, cell0)
+    (ct, ht) = (cell0, h0)
+    for t in range(5):
+        ct, ht = step(seq[t], ht, ct)
+        assert np.allclose(cells[t], ct, atol=1e-5)
+        assert np.allclose(hs[t], ht, atol=1e-5)
+
+
+def test_embedding_matches_dense():
+    from pyrl.tasks.gridworld import GridWorld
+    grid = np.zeros((4, 5))
+    grid[1, 1:3] = 1.
+    task = GridWorld(grid, action_stoch=0., goal={(3, 4): 1.}, rewards={(3, 4): 1.},
+                     wall_penalty=0.)
+    states = []
+    indices = []
+    for action in [0, 1, 1, 3]:
+        states.append(task.curr_state.reshape(-1))
+        indices.append(task.curr_state_indices)
+        task.step(action)
+    states = np.array(states, dtype=floatX)
+    assert (layers.dense_to_indices(states) == layers.pad_indices(indices)).all()
+
+    dense = layers.FullyConnected(states.shape[1], 6)
+    sparse = layers.Embedding(states.shape[1], 6)
+    sparse.set_params(dense.get_params())
+    x = T.matrix('x')
+    inds = T.lmatrix('inds')
+    dense_out = dense(x)
+    sparse_out = sparse(inds)
+    f_dense = theano.function([x], [dense_out] + T.grad(dense_out.sum(), dense.params))
+    f_sparse = theano.function([inds], [sparse_out] + T.grad(sparse_out.sum(), sparse.params))
+    for (a, b) in zip(f_dense(states), f_sparse(layers.pad_indices(indices))):
+        assert np.allclose(a, b, atol=1e-5)
@@ -7,6 +7,9 @@ from datetime import datetime
 
 from StringIO import StringIO
 from pprint import pprint
+from collections import OrderedDict
+
+from pyrl.dtype import floatX, debug_dtype_flag
 
 def make_minibatch_x(data, batch_size, num_iter):
     '''
@@ -15,7 +18,7 @@ def make_minibatch_x(data, batch_size, num_iter):
     '''
     N = data.shape[0]
     D = data.shape[1]
-    mini_batch = np.zeros((batch_size, D))
+    mini_batch = np.zeros((batch_size, D), dtype=floatX)
     assert batch_size <= N
     for it in range(num_iter):
         ind = npr.choice(range(N), size=batch_size, replace=True)
@@ -33,8 +36,8 @@ def make_minibatch_x_y(data, targets, batch_size, num_iter):
     Dp = targets.shape[1]
     batch_shape = list(data.shape)
     batch_shape[0] = batch_size
-    mini_batch = np.zeros(batch_shape)
-    mini_batch_targets = np.zeros((batch_size, Dp))
+    mini_batch = np.zeros(batch_shape, dtype=floatX)
+    mini_batch_targets = np.zeros((batch_size, Dp), dtype=floatX)
     assert N == Np
     assert batch_size <= N
     for it in range(num_iter):
@@ -150,7 +153,7 @@ def to_string(obj):
 
 
 def rgb2yuv(pic):
-    pic = pic.astype(np.float32)
+    pic = pic.astype(floatX)
     res = np.zeros_like(pic)
     res[:, :, 0] = 0.299 * pic[:, :, 0] + 0.587 * pic[:, :, 1] + 0.114 * pic[:, :, 2]
     res[:, :, 1] = -0.14713 * pic[:, :, 0] -0.28886 * pic[:, :, 1] + 0.436 * pic[:, :, 2]
@@ -158,8 +161,67 @@ def rgb2yuv(pic):
     return res
 
 
+def report_casts(func, name=None):
+    '''
+    wrap a compiled theano function so that, when the debug_dtype environment
+    variable is set, every call reports inputs whose dtype differs from the one
+    the function was compiled for. such inputs are silently converted (and
+    copied) on each call when allow_input_downcast is on.
+    without debug_dtype, the function is returned unchanged.
+    '''
+    if not debug_dtype_flag:
+        return func
+    name = name if name else func.name
+    expected = [inp.variable.type.dtype for inp in func.maker.inputs if not inp.implicit]
+
+    def wrap(*args, **kwargs):
+        for (ai, (arg, dtype)) in enumerate(zip(args, expected)):
+            arg_dtype = getattr(arg, 'dtype', type(arg).__name__)
+            if str(arg_dtype) != dtype:
+                print colorize('[dtype] %s: input %d is %s, expected %s' % (name, ai, arg_dtype, dtype), 'red')
+        return func(*args, **kwargs)
+
+    return wrap
+
+
 def get_val(dic, key, default):
     val = dic.get(key)
     if val is None:
         return default
     return val
+
+
+class LRUCache(object):
+    '''
+    a dict that keeps only its maxsize most recently used entries.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+
+    def __setitem__(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def clear(self):
+        self.entries.clear()